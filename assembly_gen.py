@@ -1,303 +1,546 @@
+from tac import Op, is_constant, is_temporary, parse_tac
+from regalloc import LinearScan
+from peephole import Peephole, REGISTER
+from isel import select_operands
+
+
+REGISTERS = ('eax', 'ebx', 'ecx', 'edx', 'esi', 'edi')
+REGISTERS_64 = REGISTERS + tuple(f"r{n}d" for n in range(8, 16))
+
+
+class Target:
+    # What the generated code depends on besides the instructions: the
+    # registers the allocator may use, the register spill slots are
+    # addressed from, the full-width name of each register for pushes and
+    # addresses, and how the program starts and exits. int is 32 bits on
+    # every target, so arithmetic always uses the 32-bit registers.
+
+    def __init__(self, name, registers, wide, frame_pointer, stack_pointer, header, exit):
+        self.name = name
+        self.registers = registers
+        self.wide = wide
+        self.frame_pointer = frame_pointer
+        self.stack_pointer = stack_pointer
+        self.header = header
+        self.exit = exit
+
+
+X86 = Target(
+    'x86', REGISTERS, {reg: reg for reg in REGISTERS}, 'ebp', 'esp',
+    header=(),
+    exit=("mov eax, 1", "xor ebx, ebx", "int 0x80"),
+)
+
+# rsp and rbp stay the stack and frame pointers, which leaves fourteen of
+# the sixteen registers to the allocator. Addresses use the 64-bit names:
+# the stack lives above 4 GB, and variables are addressed relative to rip.
+X86_64 = Target(
+    'x86-64', REGISTERS_64,
+    {reg: 'r' + reg[1:] if reg[0] == 'e' else reg[:-1] for reg in REGISTERS_64}, 'rbp', 'rsp',
+    header=("default rel",),
+    exit=("mov eax, 60", "xor edi, edi", "syscall"),
+)
+
+TARGETS = {target.name: target for target in (X86, X86_64)}
+
+JUMPS = {
+    '<': 'jl',
+    '<=': 'jle',
+    '>': 'jg',
+    '>=': 'jge',
+    '==': 'je',
+    '!=': 'jne',
+}
+
+MNEMONICS = {Op.ADD: 'add', Op.SUB: 'sub', Op.MUL: 'imul'}
+
+# Multiplications lea can do: index * scale, or index + index * scale.
+LEA_SCALES = (2, 4, 8)
+LEA_FACTORS = {3: 2, 5: 4, 9: 8}
+
+# Relation that holds after swapping the operands of a comparison.
+SWAPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '==': '==', '!=': '!='}
+
+
+def division_magic(divisor):
+    # The multiplier and shift that turn signed 32-bit division by a
+    # constant into a multiplication: the high half of dividend * magic,
+    # shifted right, is the quotient or one less than it (Hacker's Delight,
+    # figure 10-1). The magic number is returned as a signed 32-bit value.
+    two31 = 2 ** 31
+    mask = 2 ** 32 - 1
+    magnitude = abs(divisor)
+    t = two31 + (divisor < 0)
+    anc = t - 1 - t % magnitude
+    p = 31
+    q1, r1 = divmod(two31, anc)
+    q2, r2 = divmod(two31, magnitude)
+    while True:
+        p += 1
+        q1, r1 = 2 * q1 & mask, 2 * r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1 & mask, r1 - anc
+        q2, r2 = 2 * q2 & mask, 2 * r2
+        if r2 >= magnitude:
+            q2, r2 = q2 + 1 & mask, r2 - magnitude
+        delta = magnitude - r2
+        if q1 > delta or (q1 == delta and r1 != 0):
+            break
+    magic = q2 + 1 & mask
+    if divisor < 0:
+        magic = -magic & mask
+    if magic >= two31:
+        magic -= 2 ** 32
+    return magic, p - 32
+
+
+def is_register(operand):
+    return operand in REGISTERS_64
+
+
+def is_memory(operand):
+    return operand.startswith('[')
+
+
+def is_displacement(value, sign=1):
+    # A constant that fits the signed 32-bit displacement of an address.
+    return type(value) is int and -2 ** 31 <= sign * value < 2 ** 31
+
+
+def address(base, offset):
+    if isinstance(offset, int) or offset.lstrip('-').isdigit():
+        offset = int(offset)
+        if offset < 0:
+            return f"{base} - {-offset}"
+        return f"{base} + {offset}"
+    return f"{base} + {offset}"
+
+
 class AssemblyGenerator:
-    
-    def __init__(self):
+
+    def __init__(self, trace=None, peephole=False, target=X86):
+        # peephole runs the peephole rules over the finished listing. target
+        # is X86 or X86_64.
+        self.trace = trace
+        self.peephole = Peephole(trace=trace) if peephole else None
+        self.target = target
         self.assembly_code = []
         self.data_section = []
+        self.available_registers = list(target.registers)
+        self.allocator = LinearScan(self.available_registers, trace)
         self.register_map = {}
-        self.available_registers = ['eax', 'ebx', 'ecx', 'edx', 'esi', 'edi']
-        self.register_pool = self.available_registers.copy()
+        self.spill_slots = {}
         self.stack_offset = 0
         self.variables = set()
-        self.spill_index = 0
+        self.position = 0
+        self.live_temps = set()
+        self.instructions = []
+        self.scaled = None
 
     def is_temporary(self, name):
-        return name.startswith('t') and name[1:].isdigit()
-    
-    def get_register(self, temp):
-        if temp in self.register_map:
-            return self.register_map[temp]
-        
-        if self.register_pool:
-            reg = self.register_pool.pop(0)
-            self.register_map[temp] = reg
-            print(f"Assembly: Allocating register {reg} for {temp}")
-            return reg
-        
-        # Reuse a register. Simple strategy: pick the first one from the original list.
-        reg_to_reuse = self.available_registers[self.spill_index]
-        self.spill_index = (self.spill_index + 1) % len(self.available_registers)
-        
-        # Evict any temporary currently using this register
-        for t, r in list(self.register_map.items()):
-            if r == reg_to_reuse:
-                del self.register_map[t]
-                print(f"Assembly: Spilling {t} from {r} for {temp}")
-
-        self.register_map[temp] = reg_to_reuse
-        print(f"Assembly: Reusing register {reg_to_reuse} for {temp}")
-        return reg_to_reuse
-    
-    def free_register(self, temp):
-        if temp in self.register_map:
-            reg = self.register_map[temp]
-            print(f"Assembly: Freeing register {reg} from {temp}")
-            if reg not in self.register_pool:
-                self.register_pool.append(reg)
-            del self.register_map[temp]
-    
+        return is_temporary(name)
+
+    def operand(self, value):
+        # Where a TAC operand lives: the register or stack slot assigned to
+        # a temporary, the memory of a variable, or an immediate constant.
+        if is_temporary(value):
+            if value in self.register_map:
+                return self.register_map[value]
+            return f"[{self.target.frame_pointer}-{self.spill_slots[value]}]"
+        if is_constant(value):
+            return str(value)
+        self.add_variable(value)
+        return f"[{value}]"
+
+    def dies_here(self, temp):
+        return self.allocator.intervals[temp][1] == self.position
+
+    def busy_registers(self):
+        return {self.register_map[t] for t in self.live_temps if t in self.register_map}
+
+    def acquire_scratch(self, exclude=()):
+        # A register that holds no live temporary at this instruction. When
+        # every register is taken, one is saved on the stack around the use.
+        busy = self.busy_registers()
+        for reg in self.available_registers:
+            if reg not in busy and reg not in exclude:
+                return reg, False
+        for reg in self.available_registers:
+            if reg not in exclude:
+                self.emit_push(reg)
+                return reg, True
+
+    def release_scratch(self, reg, saved):
+        if saved:
+            self.emit_pop(reg)
+
+    def emit_push(self, reg):
+        self.emit(f"push {self.target.wide[reg]}")
+
+    def emit_pop(self, reg):
+        self.emit(f"pop {self.target.wide[reg]}")
+
     def emit(self, instruction):
+        if self.trace is not None:
+            self.trace.event('assembly', "Assembly: {}", instruction)
         self.assembly_code.append(f"    {instruction}")
-    
+
     def emit_label(self, label):
         self.assembly_code.append(f"{label}:")
-    
+
+    def emit_binary(self, mnemonic, dest, src):
+        # Memory operands need an explicit size when no register fixes it.
+        if is_memory(dest) and not is_register(src):
+            dest = f"dword {dest}"
+        self.emit(f"{mnemonic} {dest}, {src}")
+
+    def emit_move(self, dest, src):
+        if dest == src:
+            return
+        if is_memory(dest) and is_memory(src):
+            if self.target is X86:
+                self.emit(f"push dword {src}")
+                self.emit(f"pop dword {dest}")
+                return
+            # Pushes are 8 bytes wide in 64-bit mode.
+            scratch, saved = self.acquire_scratch()
+            self.emit(f"mov {scratch}, {src}")
+            self.emit(f"mov {dest}, {scratch}")
+            self.release_scratch(scratch, saved)
+            return
+        self.emit_binary('mov', dest, src)
+
     def add_variable(self, var):
         if var not in self.variables:
             self.variables.add(var)
             self.data_section.append(f"{var} dd 0")
-    
+
     def generate_from_tac(self, tac_code):
-        print("\n" + "=" * 50)
-        print("ASSEMBLY CODE GENERATION")
-        print("=" * 50)
-        
-        lines = tac_code.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            print(f"Processing TAC: {line}")
-            
-            if line.startswith('ADD'):
-                self.handle_add(line)
-            elif line.startswith('SUB'):
-                self.handle_sub(line)
-            elif '=' in line and not any(op in line for op in ['<', '>', '==', '!=', '<=', '>=']):
-                self.handle_assignment(line)
-            
-            elif line.startswith('MOV'):
-                self.handle_mov(line)
-            
-            elif line.startswith('IF'):
-                self.handle_if(line)
-            
-            elif line.startswith('GOTO'):
-                self.handle_goto(line)
-            
-            elif line.endswith(':'):
-                label = line[:-1]
-                print(f"Assembly: Label {label}")
-                self.emit_label(label)
-        
+        return self.generate(parse_tac(tac_code))
+
+    def generate(self, instructions):
+        if self.trace is not None:
+            self.trace.event('assembly', "\n" + "=" * 50)
+            self.trace.event('assembly', "ASSEMBLY CODE GENERATION")
+            self.trace.event('assembly', "=" * 50)
+
+        self.instructions = instructions = select_operands(instructions)
+        self.allocator.allocate(instructions)
+        self.register_map = self.allocator.register_map
+        self.spill_slots = self.allocator.spill_slots
+        self.stack_offset = self.allocator.frame_size
+
+        intervals = self.allocator.intervals
+        starts = {}
+        ends = {}
+        for temp, (start, end) in intervals.items():
+            starts.setdefault(start, []).append(temp)
+            ends.setdefault(end, []).append(temp)
+
+        handlers = {
+            Op.ASSIGN: self.handle_assignment,
+            Op.ADD: self.handle_assignment,
+            Op.SUB: self.handle_assignment,
+            Op.MUL: self.handle_assignment,
+            Op.DIV: self.handle_division,
+            Op.MOD: self.handle_division,
+            Op.MOV: self.handle_mov,
+            Op.INC: self.handle_add,
+            Op.DEC: self.handle_sub,
+            Op.IF: self.handle_if,
+            Op.GOTO: self.handle_goto,
+            Op.LABEL: self.handle_label,
+        }
+
+        self.live_temps = set()
+        for position, instr in enumerate(instructions):
+            if self.trace is not None:
+                self.trace.event('assembly', "Processing TAC: {}", instr)
+            self.position = position
+            self.live_temps.update(starts.get(position, ()))
+            handlers[instr.op](instr)
+            self.live_temps.difference_update(ends.get(position, ()))
+
+        if self.peephole is not None:
+            self.assembly_code = self.peephole.optimize(self.assembly_code)
         return self.get_assembly_code()
-    
-    def handle_assignment(self, line):
-        parts = line.split('=')
-        dest = parts[0].strip()
-        expr = parts[1].strip()
-
-        op_map = {'+': 'add', '-': 'sub', '*': 'imul'}
-
-        # Check for binary operations
-        for op_char in op_map:
-            if op_char in expr:
-                op_instr = op_map[op_char]
-                left, right = expr.split(op_char, 1)
-                left = left.strip()
-                right = right.strip()
-
-                # Use left operand's register as the destination for the result
-                if self.is_temporary(left):
-                    dest_reg = self.get_register(left)
-                else:
-                    # If left is not a temp, get a new register for the destination
-                    dest_reg = self.get_register(dest)
-                    if left.isdigit():
-                        self.emit(f"mov {dest_reg}, {left}")
-                    else:
-                        self.add_variable(left)
-                        self.emit(f"mov {dest_reg}, [{left}]")
-                
-                # Perform operation with right operand
-                if self.is_temporary(right):
-                    right_reg = self.get_register(right)
-                    self.emit(f"{op_instr} {dest_reg}, {right_reg}")
-                    self.free_register(right)
-                elif right.isdigit():
-                    self.emit(f"{op_instr} {dest_reg}, {right}")
-                else:
-                    self.add_variable(right)
-                    self.emit(f"{op_instr} {dest_reg}, [{right}]")
-
-                # The result is in dest_reg. Update mapping for the destination temporary.
-                if self.is_temporary(left) and dest != left:
-                    self.register_map.pop(left, None)
-                self.register_map[dest] = dest_reg
-                return
 
-        # Handle division and modulo
-        if '/' in expr or '%' in expr:
-            op = '/' if '/' in expr else '%'
-            left, right = expr.split(op, 1)
-            left = left.strip()
-            right = right.strip()
-
-            if self.is_temporary(left):
-                left_reg = self.get_register(left)
-                self.emit(f"mov eax, {left_reg}")
-                self.free_register(left)
-            elif left.isdigit():
-                self.emit(f"mov eax, {left}")
-            else:
-                self.add_variable(left)
-                self.emit(f"mov eax, [{left}]")
-            
-            self.emit("xor edx, edx")
-
-            if self.is_temporary(right):
-                right_reg = self.get_register(right)
-                self.emit(f"idiv {right_reg}")
-                self.free_register(right)
-            elif right.isdigit():
-                self.emit(f"mov ebx, {right}")
-                self.emit(f"idiv ebx")
-            else:
-                self.add_variable(right)
-                self.emit(f"idiv dword [{right}]")
-
-            result_reg_name = 'eax' if op == '/' else 'edx'
-            dest_reg = self.get_register(dest)
-            if dest_reg != result_reg_name:
-                self.emit(f"mov {dest_reg}, {result_reg_name}")
+    def handle_label(self, instr):
+        if self.trace is not None:
+            self.trace.event('assembly', "Assembly: Label {}", instr.dest)
+        self.emit_label(instr.dest)
+
+    def handle_assignment(self, instr):
+        dest = self.operand(instr.dest)
+        left = self.operand(instr.a)
+        if instr.b is None:
+            self.emit_move(dest, left)
             return
 
-        # Simple assignment
-        else:
-            value = expr.strip()
-            dest_reg = self.get_register(dest)
-            if self.is_temporary(value):
-                src_reg = self.get_register(value)
-                self.emit(f"mov {dest_reg}, {src_reg}")
-                self.free_register(value)
-            elif value.isdigit():
-                self.emit(f"mov {dest_reg}, {value}")
-            else:
-                self.add_variable(value)
-                self.emit(f"mov {dest_reg}, [{value}]")
-    
-    def handle_mov(self, line):
-        parts = line.replace('MOV', '').strip().split(',')
-        dest = parts[0].strip()
-        src = parts[1].strip()
-        
-        self.add_variable(dest)
-        
-        if self.is_temporary(src):
-            src_reg = self.get_register(src)
-            print(f"Assembly: mov [{dest}], {src_reg}")
-            self.emit(f"mov [{dest}], {src_reg}")
-            self.free_register(src)
-        elif src.isdigit():
-            print(f"Assembly: mov [{dest}], {src}")
-            self.emit(f"mov [{dest}], {src}")
+        right = self.operand(instr.b)
+        op_instr = MNEMONICS[instr.op]
+
+        if is_register(dest):
+            if self.emit_address(instr, dest, left, right):
+                return
+            if dest == right and dest != left:
+                if op_instr == 'sub':
+                    # dest = left - dest
+                    self.emit(f"neg {dest}")
+                    self.emit(f"add {dest}, {left}")
+                    return
+                left, right = right, left
+            self.emit_move(dest, left)
+            self.emit(f"{op_instr} {dest}, {right}")
+            return
+
+        # The destination was spilled; compute in the register of a left
+        # operand that dies here, or else in a scratch register.
+        if is_register(left) and left != right and self.dies_here(instr.a):
+            scratch, saved = left, False
         else:
-            print(f"Assembly: mov eax, [{src}]")
-            self.emit(f"mov eax, [{src}]")
-            print(f"Assembly: mov [{dest}], eax")
-            self.emit(f"mov [{dest}], eax")
-            self.add_variable(src)
-    
-    def handle_if(self, line):
-        parts = line.replace('IF', '').replace('GOTO', '').strip().split()
-        left = parts[0]
-        op = parts[1]
-        right = parts[2]
-        label = parts[3]
-        
-        if self.is_temporary(left):
-            left_reg = self.get_register(left)
+            exclude = [reg for reg in (left, right) if is_register(reg)]
+            scratch, saved = self.acquire_scratch(exclude)
+        self.emit_move(scratch, left)
+        self.emit(f"{op_instr} {scratch}, {right}")
+        self.emit_move(dest, scratch)
+        self.release_scratch(scratch, saved)
+
+    def emit_address(self, instr, dest, left, right):
+        # lea does a sum of up to two registers, one of them scaled, and a
+        # constant into a third register, which takes one instruction where
+        # mov and add or imul take two, or a shift and an add would.
+        op = instr.op
+        if self.scaled is not None:
+            product, index, scale = self.scaled
+            self.scaled = None
+            base = right if instr.a == product else left
+            self.emit_lea(dest, address(base, f"{index}*{scale}"))
+            return True
+        if op == Op.MUL:
+            if not is_register(left) or type(instr.b) is not int:
+                return False
+            if instr.b in LEA_FACTORS:
+                self.emit_lea(dest, f"{left} + {left}*{LEA_FACTORS[instr.b]}")
+                return True
+            if instr.b in LEA_SCALES and self.scales_next(instr, left):
+                self.scaled = (instr.dest, left, instr.b)
+                return True
+            if instr.b in LEA_SCALES and left != dest:
+                self.emit_lea(dest, f"{left}*{instr.b}")
+                return True
+            return False
+        if op == Op.SUB:
+            if is_register(left) and left != dest and is_displacement(instr.b, -1):
+                self.emit_lea(dest, address(left, -instr.b))
+                return True
+            return False
+        if op == Op.ADD and dest != left and dest != right:
+            if is_register(left) and (is_register(right) or is_displacement(instr.b)):
+                self.emit_lea(dest, address(left, right))
+                return True
+            if is_register(right) and is_displacement(instr.a):
+                self.emit_lea(dest, address(right, left))
+                return True
+        return False
+
+    def emit_lea(self, dest, terms):
+        wide = self.target.wide
+        terms = REGISTER.sub(lambda match: wide.get(match.group(), match.group()), terms)
+        self.emit(f"lea {dest}, [{terms}]")
+
+    def scales_next(self, instr, index):
+        # t2 = t1 * 4; t3 = x + t2  ->  lea t3, [x + t1*4]
+        # The multiplication is left out and folded into the addition that
+        # follows when that is the product's only use. Nothing is emitted in
+        # between, so the index register still holds its value there.
+        position = self.position + 1
+        if self.allocator.intervals[instr.dest] != [position - 1, position]:
+            return False
+        if position >= len(self.instructions):
+            return False
+        user = self.instructions[position]
+        if user.op != Op.ADD or (user.a == instr.dest) == (user.b == instr.dest):
+            return False
+        if not is_register(self.operand(user.dest)):
+            return False
+        base = user.b if user.a == instr.dest else user.a
+        return is_register(self.operand(base)) or is_displacement(base)
+
+    def handle_division(self, instr):
+        # idiv divides edx:eax by its operand, leaving the quotient in eax and
+        # the remainder in edx. Division by a constant avoids idiv and leaves
+        # either result in eax. Live values held in eax or edx are preserved.
+        dest = self.operand(instr.dest)
+        left = self.operand(instr.a)
+        right = self.operand(instr.b)
+        intervals = self.allocator.intervals
+
+        saved = []
+        for reg in ('eax', 'edx'):
+            for temp in self.live_temps:
+                if (self.register_map.get(temp) == reg and temp != instr.dest
+                        and intervals[temp][1] > self.position):
+                    saved.append(reg)
+                    break
+        for reg in saved:
+            self.emit_push(reg)
+
+        if type(instr.b) is int and instr.b != 0:
+            self.emit_move(dest, self.divide_by_constant(instr.op, left, instr.b))
+            for reg in reversed(saved):
+                self.emit_pop(reg)
+            return
+
+        scratch = None
+        if is_register(right) and right not in ('eax', 'edx'):
+            divisor = right
+        elif is_memory(right):
+            divisor = f"dword {right}"
         else:
-            left_reg = 'eax'
-            print(f"Assembly: mov {left_reg}, [{left}]")
-            self.emit(f"mov {left_reg}, [{left}]")
-            self.add_variable(left)
-        
-        if self.is_temporary(right):
-            right_reg = self.get_register(right)
-            print(f"Assembly: cmp {left_reg}, {right_reg}")
-            self.emit(f"cmp {left_reg}, {right_reg}")
-        elif right.isdigit():
-            print(f"Assembly: cmp {left_reg}, {right}")
-            self.emit(f"cmp {left_reg}, {right}")
+            exclude = ['eax', 'edx'] + ([left] if is_register(left) else [])
+            scratch, scratch_saved = self.acquire_scratch(exclude)
+            self.emit(f"mov {scratch}, {right}")
+            divisor = scratch
+
+        if left != 'eax':
+            self.emit(f"mov eax, {left}")
+        self.emit("cdq")
+        self.emit(f"idiv {divisor}")
+        if scratch is not None:
+            self.release_scratch(scratch, scratch_saved)
+
+        result = 'edx' if instr.op == Op.MOD else 'eax'
+        self.emit_move(dest, result)
+        for reg in reversed(saved):
+            self.emit_pop(reg)
+
+    def divide_by_constant(self, op, dividend, divisor):
+        # Signed division truncates toward zero, so a power of two is a shift
+        # of the dividend after adding divisor - 1 to it when it is negative;
+        # cdq gives the sign mask for that bias. Other divisors multiply by a
+        # magic number and correct the estimate by its sign bit. A remainder
+        # is the dividend minus quotient * divisor. Returns eax.
+        magnitude = abs(divisor)
+        if magnitude == 1:
+            if op == Op.MOD:
+                self.emit("xor eax, eax")
+                return 'eax'
+            self.emit_move('eax', dividend)
+            if divisor < 0:
+                self.emit("neg eax")
+            return 'eax'
+
+        if magnitude & (magnitude - 1) == 0:
+            shift = magnitude.bit_length() - 1
+            self.emit_move('eax', dividend)
+            self.emit("cdq")
+            self.emit(f"and edx, {magnitude - 1}")
+            self.emit("add eax, edx")
+            if op == Op.MOD:
+                self.emit(f"and eax, {magnitude - 1}")
+                self.emit("sub eax, edx")
+                return 'eax'
+            self.emit(f"sar eax, {shift}")
+            if divisor < 0:
+                self.emit("neg eax")
+            return 'eax'
+
+        # The dividend is read again after the multiplication has taken eax
+        # and edx, and one-operand imul needs it in a register or memory.
+        scratch = None
+        if dividend in ('eax', 'edx') or not (is_register(dividend) or is_memory(dividend)):
+            scratch, saved = self.acquire_scratch(['eax', 'edx'])
+            self.emit(f"mov {scratch}, {dividend}")
+            dividend = scratch
+        magic, shift = division_magic(divisor)
+        self.emit(f"mov eax, {magic}")
+        self.emit(f"imul {'dword ' + dividend if is_memory(dividend) else dividend}")
+        if divisor > 0 and magic < 0:
+            self.emit(f"add edx, {dividend}")
+        elif divisor < 0 and magic > 0:
+            self.emit(f"sub edx, {dividend}")
+        if shift:
+            self.emit(f"sar edx, {shift}")
+        self.emit("mov eax, edx")
+        self.emit("shr eax, 31")
+        self.emit("add eax, edx")
+        if op == Op.MOD:
+            self.emit(f"imul eax, eax, {-divisor}")
+            self.emit(f"add eax, {dividend}")
+        if scratch is not None:
+            self.release_scratch(scratch, saved)
+        return 'eax'
+
+    def handle_mov(self, instr):
+        self.emit_move(self.operand(instr.dest), self.operand(instr.a))
+
+    def handle_if(self, instr):
+        left = self.operand(instr.a)
+        right = self.operand(instr.b)
+        op = instr.rel
+
+        if is_constant(instr.a) and not is_constant(instr.b):
+            left, right = right, left
+            op = SWAPPED[op]
+
+        scratch = None
+        if is_constant(instr.a) and is_constant(instr.b) or is_memory(left) and is_memory(right):
+            exclude = [right] if is_register(right) else []
+            scratch, saved = self.acquire_scratch(exclude)
+            self.emit(f"mov {scratch}, {left}")
+            left = scratch
+
+        self.emit_binary('cmp', left, right)
+        if scratch is not None:
+            self.release_scratch(scratch, saved)
+        self.emit(f"{JUMPS.get(op, 'jmp')} {instr.dest}")
+
+    def handle_goto(self, instr):
+        self.emit(f"jmp {instr.dest}")
+
+    def emit_update(self, mnemonic, instr):
+        # ADD/SUB dest, a, b updates a variable in place.
+        dest = self.operand(instr.dest)
+        self.emit_move(dest, self.operand(instr.a))
+        src = self.operand(instr.b)
+        if is_memory(src):
+            scratch, saved = self.acquire_scratch()
+            self.emit(f"mov {scratch}, {src}")
+            self.emit_binary(mnemonic, dest, scratch)
+            self.release_scratch(scratch, saved)
         else:
-            print(f"Assembly: cmp {left_reg}, [{right}]")
-            self.emit(f"cmp {left_reg}, [{right}]")
-            self.add_variable(right)
-        
-        jump_map = {
-            '<': 'jl',
-            '<=': 'jle',
-            '>': 'jg',
-            '>=': 'jge',
-            '==': 'je',
-            '!=': 'jne'
-        }
-        
-        jump_instr = jump_map.get(op, 'jmp')
-        print(f"Assembly: {jump_instr} {label}")
-        self.emit(f"{jump_instr} {label}")
-    
-    def handle_goto(self, line):
-        label = line.replace('GOTO', '').strip()
-        print(f"Assembly: jmp {label}")
-        self.emit(f"jmp {label}")
-
-    def handle_add(self, line):
-        parts = line.replace('ADD', '').strip().split(',')
-        dest = parts[0].strip()
-        src1 = parts[1].strip()
-        src2 = parts[2].strip()
-
-        self.add_variable(dest)
-        if dest == src1:
-            if src2.isdigit():
-                self.emit(f"add dword [{dest}], {src2}")
-            else:
-                self.add_variable(src2)
-                self.emit(f"mov eax, [{src2}]")
-                self.emit(f"add dword [{dest}], eax")
-
-    def handle_sub(self, line):
-        parts = line.replace('SUB', '').strip().split(',')
-        dest = parts[0].strip()
-        src1 = parts[1].strip()
-        src2 = parts[2].strip()
-
-        self.add_variable(dest)
-        if dest == src1:
-            if src2.isdigit():
-                self.emit(f"sub dword [{dest}], {src2}")
-            else:
-                self.add_variable(src2)
-                self.emit(f"mov eax, [{src2}]")
-                self.emit(f"sub dword [{dest}], eax")
-    
+            self.emit_binary(mnemonic, dest, src)
+
+    def handle_add(self, instr):
+        self.emit_update('add', instr)
+
+    def handle_sub(self, instr):
+        self.emit_update('sub', instr)
+
     def get_assembly_code(self):
-        full_code = []
-        full_code.append("section .data")
-        full_code.extend(self.data_section)
-        full_code.append("")
-        full_code.append("section .text")
-        full_code.append("    global _start")
-        full_code.append("")
-        full_code.append("_start:")
-        full_code.extend(self.assembly_code)
-        full_code.append("")
-        full_code.append("    ; Exit program")
-        full_code.append("    mov eax, 1")
-        full_code.append("    xor ebx, ebx")
-        full_code.append("    int 0x80")
-        
-        return '\n'.join(full_code)
+        return program_listing(self.target, self.data_section, self.assembly_code, self.stack_offset)
+
+
+def program_listing(target, data_section, code, frame_size):
+    # The complete program around the generated instructions: the data
+    # section, the entry point with its stack frame, and the exit.
+    full_code = list(target.header)
+    full_code.append("section .data")
+    full_code.extend(data_section)
+    full_code.append("")
+    full_code.append("section .text")
+    full_code.append("    global _start")
+    full_code.append("")
+    full_code.append("_start:")
+    if frame_size:
+        # Stack slots for spilled temporaries, addressed from the frame
+        # pointer.
+        full_code.append(f"    mov {target.frame_pointer}, {target.stack_pointer}")
+        full_code.append(f"    sub {target.stack_pointer}, {frame_size}")
+    full_code.extend(code)
+    full_code.append("")
+    full_code.append("    ; Exit program")
+    full_code.extend(f"    {instruction}" for instruction in target.exit)
+
+    return '\n'.join(full_code)
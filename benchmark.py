@@ -0,0 +1,343 @@
+import gc
+import itertools
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from assembly_gen import TARGETS
+from cache import CompileCache
+from cfg import ControlFlowGraph
+from codegen import CodeGen
+from compiler import Compiler, compile_many
+from incremental import IncrementalCompiler
+from semantic import SemanticAnalyzer
+from streaming import StreamingCompiler
+from tac import parse_tac
+from test_cases import test_suite
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure(func, repeat):
+    timings = []
+    gc.collect()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+COLD_START_SCRIPT = """
+import time
+start = time.perf_counter()
+from cfg import ControlFlowGraph
+from codegen import CodeGen
+from compiler import Compiler
+from semantic import SemanticAnalyzer
+from streaming import StreamingCompiler
+from test_cases import test_suite
+imported = time.perf_counter()
+Compiler(fast_startup={fast_startup})
+built = time.perf_counter()
+print(imported - start, built - imported)
+"""
+
+
+def bench_cold_start(repeat=15):
+    print("=" * 50)
+    print("COLD START (new process: import + first Compiler())")
+    print("=" * 50)
+    for fast_startup in (False, True):
+        script = COLD_START_SCRIPT.format(fast_startup=fast_startup)
+        imports = []
+        builds = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-c', script], cwd=HERE, check=True,
+                                    capture_output=True, text=True).stdout
+            imported, built = map(float, output.split())
+            imports.append(imported)
+            builds.append(built)
+        label = f"fast_startup={fast_startup}"
+        print(f"{label:<24}import {statistics.median(imports) * 1000:6.1f} ms"
+              f"   first Compiler() {statistics.median(builds) * 1000:6.2f} ms")
+    print()
+
+
+def bench_construction(repeat=200):
+    print("=" * 50)
+    print("WARM CONSTRUCTION (Compiler() in a running process)")
+    print("=" * 50)
+    for fast_startup in (False, True):
+        elapsed = measure(lambda: Compiler(fast_startup=fast_startup), repeat)
+        label = f"fast_startup={fast_startup}"
+        print(f"{label:<24}{elapsed * 1e6:8.1f} us")
+    print()
+
+
+def flat_program(statements):
+    lines = ["int x;"]
+    lines.extend("x = x + 1;" for _ in range(statements - 1))
+    return "\n".join(lines)
+
+
+def bench_parse_scaling(sizes=(10000, 20000, 40000, 80000)):
+    print("=" * 50)
+    print("PARSE SCALING (flat statement list)")
+    print("=" * 50)
+    compiler = Compiler(fast_startup=True)
+    previous = None
+    for size in sizes:
+        text = flat_program(size)
+        elapsed = measure(lambda: compiler.parser.parse(text, lexer=compiler.lexer), 3)
+        per_statement = elapsed / size * 1e6
+        line = f"{size:>8} statements {elapsed * 1000:9.1f} ms  {per_statement:6.2f} us/statement"
+        if previous is not None:
+            exponent = math.log(elapsed / previous) / math.log(size / previous_size)
+            line += f"  growth exponent {exponent:.2f}"
+        print(line)
+        previous, previous_size = elapsed, size
+    print()
+
+
+def bench_semantic_walk(size=40000):
+    print("=" * 50)
+    print("SEMANTIC ANALYSIS + TAC GENERATION")
+    print("=" * 50)
+    compiler = Compiler(fast_startup=True)
+    ast = compiler.parser.parse(flat_program(size), lexer=compiler.lexer)
+    for fused in (False, True):
+        def walk():
+            analyzer = SemanticAnalyzer(CodeGen(), fused=fused)
+            analyzer.analyze(ast)
+        elapsed = measure(walk, 3)
+        label = "fused" if fused else "two-pass"
+        print(f"{label:<12}{size:>8} statements {elapsed * 1000:9.1f} ms")
+    print()
+
+
+DEEP_PROGRAMS = {
+    'expression chain': lambda depth: "int x; x = " + " + ".join(["x"] * depth) + ";",
+    'nested parentheses': lambda depth: "int x; x = " + "(" * depth + "x" + " + 1)" * depth + ";",
+    'nested if': lambda depth: "int x; " + "if (x < 1) " * depth + "x = 1;",
+    'nested blocks': lambda depth: "int x; " + "{ " * depth + "x = 1;" + " }" * depth,
+    'nested for': lambda depth: "int x; " + "for (x = 0; x < 2; x++) " * depth + "x = 1;",
+}
+
+
+def bench_deep_programs(depths=(10000, 20000, 50000)):
+    print("=" * 50)
+    print("DEEPLY NESTED PROGRAMS (full compile)")
+    print("=" * 50)
+    compiler = Compiler(fast_startup=True)
+    for name, make in DEEP_PROGRAMS.items():
+        for depth in depths:
+            text = make(depth)
+            elapsed = measure(lambda: compiler.compile(text), 1)
+            result = compiler.compile(text)
+            status = "ok" if result.ok else f"failed: {result.error}"
+            print(f"{name:<20}depth {depth:>6} {elapsed * 1000:9.1f} ms  {status}")
+    print()
+
+
+def bench_cfg(depths=(5000, 10000, 20000, 40000)):
+    print("=" * 50)
+    print("CONTROL-FLOW GRAPH (blocks + dominators)")
+    print("=" * 50)
+    compiler = Compiler(fast_startup=True)
+    for name in ('nested if', 'nested for'):
+        for depth in depths:
+            code = parse_tac(compiler.compile(DEEP_PROGRAMS[name](depth)).tac)
+
+            def build():
+                ControlFlowGraph(code).compute_dominators()
+            elapsed = measure(build, 3)
+            per_instruction = elapsed / len(code) * 1e6
+            print(f"{name:<12}{len(code):>8} instructions {elapsed * 1000:8.1f} ms"
+                  f"  {per_instruction:5.2f} us/instruction")
+    print()
+
+
+def count_asm_instructions(asm):
+    text = asm.split("section .text", 1)[1]
+    lines = [line.strip() for line in text.split('\n') if line.startswith('    ') and 'global' not in line]
+    jumps = sum(1 for line in lines if line.startswith('j'))
+    return len(lines), jumps
+
+
+def report_optimization(levels=(0, 1, 2)):
+    print("=" * 50)
+    print("OPTIMIZATION (instruction counts over the test suite)")
+    print("=" * 50)
+    compilers = {level: Compiler(fast_startup=True, opt_level=level) for level in levels}
+    totals = {level: [0, 0, 0] for level in levels}
+    for name, code in test_suite:
+        results = {level: compiler.compile(code) for level, compiler in compilers.items()}
+        if not all(result.ok for result in results.values()):
+            continue
+        for level, result in results.items():
+            asm, jumps = count_asm_instructions(result.asm)
+            totals[level][0] += len(result.tac.split('\n')) if result.tac else 0
+            totals[level][1] += asm
+            totals[level][2] += jumps
+    base_tac, base_asm, base_jumps = totals[levels[0]]
+    for level in levels:
+        tac, asm, jumps = totals[level]
+        print(f"-O{level}   TAC {tac:6}  ({(1 - tac / base_tac) * 100:5.1f}% fewer)"
+              f"   x86 {asm:6}  ({(1 - asm / base_asm) * 100:5.1f}% fewer)"
+              f"   jumps {jumps:5}  ({(1 - jumps / base_jumps) * 100:5.1f}% fewer)")
+    print()
+
+
+def bench_compile_many(units=2000):
+    # Batch throughput for 1, 2, 4, ... workers up to the number of CPUs.
+    # The pool is started inside the measurement, as a build would.
+    print("=" * 50)
+    print("BATCH COMPILATION (compile_many)")
+    print("=" * 50)
+    sources = [code for name, code in test_suite] * (units // len(test_suite) + 1)
+    sources = sources[:units]
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    base = None
+    for workers in counts:
+        elapsed = measure(lambda: compile_many(sources, workers, opt_level=2), 1)
+        base = base or elapsed
+        print(f"{workers:>3} workers {units:>6} units {elapsed * 1000:9.1f} ms"
+              f"  {base / elapsed:5.2f}x")
+    print()
+
+
+def bench_cache(size=20000):
+    # A compilation that misses the cache and the same one hitting the
+    # memory and the disk tier.
+    print("=" * 50)
+    print("COMPILE CACHE")
+    print("=" * 50)
+    text = flat_program(size)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CompileCache(directory=directory)
+        compiler = Compiler(fast_startup=True, opt_level=2, cache=cache)
+        miss = measure(lambda: compiler.compile(text), 1)
+        memory = measure(lambda: compiler.compile(text), 3)
+        disk = measure(lambda: (cache.clear(), compiler.compile(text)), 3)
+    print(f"miss        {size:>8} statements {miss * 1000:9.1f} ms")
+    print(f"memory hit  {size:>8} statements {memory * 1000:9.1f} ms")
+    print(f"disk hit    {size:>8} statements {disk * 1000:9.1f} ms")
+    print(f"stats {cache.stats}")
+    print()
+
+
+def bench_incremental(size=50000):
+    # Recompiling after a one-statement edit, against compiling the edited
+    # text from scratch. The edit alternates between two versions so every
+    # compile has something to redo.
+    print("=" * 50)
+    print("INCREMENTAL RECOMPILATION")
+    print("=" * 50)
+    text = flat_program(size)
+    middle = text.index("x = x + 1;", len(text) // 2)
+    edited = text[:middle] + "x = x + 2;" + text[middle + len("x = x + 1;"):]
+    compiler = Compiler(fast_startup=True)
+    incremental = IncrementalCompiler()
+    initial = measure(lambda: incremental.compile(text), 1)
+    versions = itertools.cycle([edited, text])
+    edit = measure(lambda: incremental.compile(next(versions)), 5)
+    full = measure(lambda: compiler.compile(edited), 1)
+    print(f"full compile     {size:>8} statements {full * 1000:9.1f} ms")
+    print(f"first compile    {size:>8} statements {initial * 1000:9.1f} ms")
+    print(f"one-line edit    {size:>8} statements {edit * 1000:9.1f} ms  "
+          f"(reparsed {incremental.reparsed}, reanalyzed {incremental.reanalyzed})")
+    print()
+
+
+def source_lines(statements):
+    yield "int x;\n"
+    for _ in range(statements - 1):
+        yield "x = x + 1;\n"
+
+
+def peak_memory(func):
+    # Time and the most memory allocated at once while func runs.
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_streaming(sizes=(5000, 20000)):
+    # Peak memory of a streaming compile, reading the source a line at a
+    # time and writing to a file, against compiling the whole text. Times
+    # are inflated by the memory tracing.
+    print("=" * 50)
+    print("STREAMING COMPILATION (peak memory)")
+    print("=" * 50)
+    streaming = StreamingCompiler(opt_level=2)
+    compiler = Compiler(fast_startup=True, opt_level=2)
+    with open(os.devnull, 'w') as output:
+        for size in sizes:
+            stream_time, stream_peak = peak_memory(lambda: streaming.compile(source_lines(size), output))
+            full_time, full_peak = peak_memory(lambda: compiler.compile(''.join(source_lines(size))))
+            print(f"{size:>8} statements  stream {stream_peak / 2 ** 20:7.2f} MiB {stream_time:7.2f} s"
+                  f"  whole text {full_peak / 2 ** 20:7.2f} MiB {full_time:7.2f} s")
+    print()
+
+
+def pressure_programs(width=12):
+    # Programs that keep more values live than the 32-bit target has
+    # registers: a loop updating width variables from each other, and a
+    # sum of width products nested to the right.
+    names = [f"v{i}" for i in range(width)]
+    declarations = " ".join(f"int {name} = {i + 1};" for i, name in enumerate(names))
+    updates = " ".join(f"{name} = {name} + {other};" for name, other in zip(names, names[1:] + ["i"]))
+    loop = f"{declarations} int i; for (i = 0; i < 100; i++) {{ {updates} }}"
+    products = " + (".join(f"{name} * {name}" for name in names) + ")" * (width - 1)
+    return [("pressure loop", loop), ("pressure expression", f"{declarations} int x; x = {products};")]
+
+
+def report_targets(levels=(0, 2)):
+    # Spill slot accesses and other memory operands in the code for each
+    # target, over the test suite and programs with many live values.
+    print("=" * 50)
+    print("TARGETS (memory operands in the generated code)")
+    print("=" * 50)
+    programs = list(test_suite) + pressure_programs()
+    for level in levels:
+        for target in TARGETS:
+            compiler = Compiler(fast_startup=True, opt_level=level, target=target)
+            spills = memory = 0
+            for name, code in programs:
+                result = compiler.compile(code)
+                if not result.ok:
+                    continue
+                text = result.asm.split("section .text", 1)[1]
+                spills += text.count("bp-")
+                memory += text.count("[")
+            print(f"-O{level}   {target:<8} spill accesses {spills:5}   memory operands {memory:5}")
+    print()
+
+
+if __name__ == "__main__":
+    bench_cold_start()
+    bench_construction()
+    bench_parse_scaling()
+    bench_semantic_walk()
+    bench_deep_programs()
+    bench_cfg()
+    bench_compile_many()
+    bench_cache()
+    bench_incremental()
+    bench_streaming()
+    report_optimization()
+    report_targets()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+# The modules whose code decides what a compilation produces. Their text is
+# part of every key, so changing the compiler invalidates what it cached.
+PIPELINE = ('lexer', 'parser', 'nodes', 'semantic', 'codegen', 'tac', 'cfg', 'optimizer',
+            'regalloc', 'isel', 'peephole', 'assembly_gen', 'compiler')
+
+_version = None
+
+
+def compiler_version():
+    global _version
+    if _version is None:
+        here = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+        for name in PIPELINE:
+            with open(os.path.join(here, name + '.py'), 'rb') as f:
+                digest.update(f.read())
+        _version = digest.hexdigest()
+    return _version
+
+
+class CompileCache:
+    # Results of earlier compilations, addressed by a hash of the source,
+    # the options that change the output and the compiler version. The
+    # memory tier keeps the most recently used results up to max_bytes of
+    # TAC and assembly text. When directory is given, results are also
+    # written there, one file per key, and read back on a memory miss, so
+    # they outlive the process and are shared by processes using the same
+    # directory. A cached result is a (tac, asm, error) tuple.
+
+    def __init__(self, max_bytes=64 * 2 ** 20, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self):
+        # A copy sent to another process shares the disk tier, not the
+        # memory tier or the counters.
+        return {'max_bytes': self.max_bytes, 'directory': self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_bytes'], state['directory'])
+
+    @staticmethod
+    def key(text, options):
+        digest = hashlib.sha256(compiler_version().encode())
+        digest.update(repr(sorted(options.items())).encode())
+        digest.update(text.encode())
+        return digest.hexdigest()
+
+    @property
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk hits': self.disk_hits,
+                'misses': self.misses,
+                'hit rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'evictions': self.evictions,
+            }
+
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return result
+        result = self.read(key)
+        with self.lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.remember(key, result)
+        return result
+
+    def put(self, key, result):
+        with self.lock:
+            self.remember(key, result)
+        self.write(key, result)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def remember(self, key, result):
+        # Called with the lock held. A result larger than the whole memory
+        # tier is only kept on disk.
+        size = cost(result)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= cost(self.entries.pop(key))
+        self.entries[key] = result
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= cost(evicted)
+            self.evictions += 1
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def read(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key)) as f:
+                return tuple(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def write(self, key, result):
+        # Written to a temporary file and renamed into place, so a reader
+        # never sees half a file.
+        if self.directory is None:
+            return
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(result, f)
+            os.replace(temporary, path)
+        except OSError:
+            pass
+
+
+def cost(result):
+    return sum(len(text) for text in result if text is not None)
@@ -0,0 +1,307 @@
+from tac import Instr, IF, GOTO, LABEL
+
+
+JUMPS = frozenset((GOTO, IF))
+
+class BasicBlock:
+    # A maximal run of TAC instructions entered only at the top and left
+    # only at the bottom. The first instruction is the block's label, if it
+    # has one; the last may be a GOTO or an IF. succs lists the jump target
+    # before the fallthrough block.
+    __slots__ = ('index', 'instructions', 'preds', 'succs', 'order', 'idom', 'dom_pre', 'dom_post')
+
+    def __init__(self, index):
+        self.index = index
+        self.instructions = []
+        self.preds = []
+        self.succs = []
+        self.order = None
+        self.idom = None
+        self.dom_pre = None
+        self.dom_post = None
+
+    @property
+    def label(self):
+        if self.instructions and self.instructions[0].op == LABEL:
+            return self.instructions[0].dest
+        return None
+
+    @property
+    def terminator(self):
+        if self.instructions and self.instructions[-1].op in JUMPS:
+            return self.instructions[-1]
+        return None
+
+    @property
+    def falls_through(self):
+        last = self.terminator
+        return last is None or last.op == IF
+
+    def __repr__(self):
+        return f"BasicBlock({self.index}, {self.label!r}, {len(self.instructions)} instructions)"
+
+
+class Loop:
+    # A natural loop laid out as a contiguous run of blocks, from its header
+    # to the last block that jumps back to it (the latch). parent is the
+    # innermost loop enclosing this one.
+    __slots__ = ('header', 'latch', 'parent')
+
+    def __init__(self, header, latch):
+        self.header = header
+        self.latch = latch
+        self.parent = None
+
+    def contains(self, block):
+        return self.header.index <= block.index <= self.latch.index
+
+    def __repr__(self):
+        return f"Loop({self.header.label!r}, blocks {self.header.index}-{self.latch.index})"
+
+
+class ControlFlowGraph:
+
+    def __init__(self, code):
+        self.blocks = []
+        self.labels = {}
+        self.exit = None
+        self.build(code)
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+    def build(self, code):
+        # A label starts a block and a jump ends one. An empty exit block
+        # follows the last one, so running off the end of the code is an
+        # edge like any other.
+        block = None
+        for instr in code:
+            op = instr.op
+            if block is None or op == LABEL and block.instructions:
+                block = BasicBlock(len(self.blocks))
+                self.blocks.append(block)
+            if op == LABEL:
+                self.labels[instr.dest] = block
+            block.instructions.append(instr)
+            if op in JUMPS:
+                block = None
+
+        self.exit = BasicBlock(len(self.blocks))
+        self.blocks.append(self.exit)
+
+        blocks = self.blocks
+        for i, block in enumerate(blocks[:-1]):
+            last = block.terminator
+            if last is not None:
+                self.add_edge(block, self.labels[last.dest])
+            if block.falls_through:
+                self.add_edge(block, blocks[i + 1])
+
+    def add_edge(self, source, target):
+        source.succs.append(target)
+        target.preds.append(source)
+
+    def reverse_postorder(self):
+        # Blocks reachable from the entry, each after all of its
+        # predecessors except along back edges.
+        postorder = []
+        visited = {self.entry.index}
+        stack = [(self.entry, iter(self.entry.succs))]
+        while stack:
+            block, successors = stack[-1]
+            for succ in successors:
+                if succ.index not in visited:
+                    visited.add(succ.index)
+                    stack.append((succ, iter(succ.succs)))
+                    break
+            else:
+                stack.pop()
+                postorder.append(block)
+        postorder.reverse()
+        return postorder
+
+    def compute_dominators(self):
+        # Cooper, Harvey and Kennedy, "A Simple, Fast Dominance Algorithm".
+        # Unreachable blocks keep idom None; the entry is its own idom while
+        # the sets converge and None afterwards.
+        for block in self.blocks:
+            block.order = block.idom = block.dom_pre = block.dom_post = None
+        rpo = self.reverse_postorder()
+        for i, block in enumerate(rpo):
+            block.order = i
+        entry = rpo[0]
+        entry.idom = entry
+
+        changed = True
+        while changed:
+            changed = False
+            for block in rpo[1:]:
+                new_idom = None
+                for pred in block.preds:
+                    if pred.idom is None:
+                        continue
+                    if new_idom is None:
+                        new_idom = pred
+                        continue
+                    finger = pred
+                    while finger is not new_idom:
+                        while finger.order > new_idom.order:
+                            finger = finger.idom
+                        while new_idom.order > finger.order:
+                            new_idom = new_idom.idom
+                    new_idom = finger
+                if block.idom is not new_idom:
+                    block.idom = new_idom
+                    changed = True
+        entry.idom = None
+
+        # Number the dominator tree so dominates() is a range check.
+        children = {block.index: [] for block in rpo}
+        for block in rpo[1:]:
+            children[block.idom.index].append(block)
+        counter = 0
+        entry.dom_pre = counter
+        stack = [(entry, iter(children[entry.index]))]
+        while stack:
+            block, kids = stack[-1]
+            child = next(kids, None)
+            counter += 1
+            if child is None:
+                stack.pop()
+                block.dom_post = counter
+            else:
+                child.dom_pre = counter
+                stack.append((child, iter(children[child.index])))
+        return rpo
+
+    def liveness(self, live_at_exit=()):
+        # Names (variables and temporaries) live on entry to and exit from
+        # each block, keyed by block index. Reached by iterating the blocks
+        # in postorder until nothing changes.
+        uses = {}
+        defs = {}
+        for block in self.blocks:
+            used = set()
+            defined = set()
+            for instr in block.instructions:
+                if instr.op in (LABEL, GOTO):
+                    continue
+                for operand in (instr.a, instr.b):
+                    if isinstance(operand, str) and operand not in defined:
+                        used.add(operand)
+                if instr.op != IF:
+                    defined.add(instr.dest)
+            uses[block.index] = used
+            defs[block.index] = defined
+
+        live_in = {block.index: set(uses[block.index]) for block in self.blocks}
+        live_out = {block.index: set() for block in self.blocks}
+        live_in[self.exit.index] = set(live_at_exit)
+        order = self.reverse_postorder()
+        order.reverse()
+        changed = True
+        while changed:
+            changed = False
+            for block in order:
+                if block is self.exit:
+                    continue
+                out = set()
+                for succ in block.succs:
+                    out |= live_in[succ.index]
+                if out != live_out[block.index]:
+                    live_out[block.index] = out
+                    live_in[block.index] = uses[block.index] | (out - defs[block.index])
+                    changed = True
+        return live_in, live_out
+
+    def find_loops(self):
+        # Loops in the shape the if/for lowering produces: a block jumps
+        # back to a header, every block between the two is entered only
+        # from within them, and the header is entered from outside only by
+        # falling through from the block laid out before it. The header
+        # then dominates the loop, and code placed between that block and
+        # the header runs once on the way into the loop. Returned outermost
+        # first.
+        latches = {}
+        for block in self.blocks:
+            last = block.terminator
+            if last is None:
+                continue
+            header = self.labels[last.dest]
+            if header.index <= block.index:
+                latches[header.index] = block
+
+        # One sweep over the layout collects, for each loop, the lowest and
+        # highest predecessor of the blocks after its header. A header's own
+        # predecessors count towards the loop around it.
+        loops = []
+        stack = []
+        for block in self.blocks:
+            while stack and stack[-1][0].latch.index < block.index:
+                self.close_loop(stack, loops)
+            bounds = stack[-1] if stack else None
+            latch = latches.get(block.index)
+            if latch is not None and (bounds is None or latch.index <= bounds[0].latch.index):
+                outside = [pred for pred in block.preds
+                           if not block.index <= pred.index <= latch.index]
+                entered = all(pred.index == block.index - 1 and pred.falls_through
+                              and (pred.terminator is None or pred.terminator.dest != block.label)
+                              for pred in outside)
+                stack.append([Loop(block, latch), block.index, block.index, entered])
+            if bounds is not None:
+                for pred in block.preds:
+                    bounds[1] = min(bounds[1], pred.index)
+                    bounds[2] = max(bounds[2], pred.index)
+        while stack:
+            self.close_loop(stack, loops)
+
+        loops.sort(key=lambda loop: loop.header.index)
+        enclosing = []
+        for loop in loops:
+            while enclosing and not enclosing[-1].contains(loop.header):
+                enclosing.pop()
+            loop.parent = enclosing[-1] if enclosing else None
+            enclosing.append(loop)
+        return loops
+
+    def close_loop(self, stack, loops):
+        loop, lowest, highest, entered = stack.pop()
+        if entered and lowest >= loop.header.index and highest <= loop.latch.index:
+            loops.append(loop)
+        if stack:
+            stack[-1][1] = min(stack[-1][1], lowest)
+            stack[-1][2] = max(stack[-1][2], highest)
+
+    def dominates(self, a, b):
+        if a.dom_pre is None or b.dom_pre is None:
+            return False
+        return a.dom_pre <= b.dom_pre and b.dom_post <= a.dom_post
+
+    def to_tac(self, order=None, new_label=None):
+        # Render the blocks back to a TAC list in the given order (the
+        # original one by default); the exit block always comes last. A
+        # block whose fallthrough successor no longer follows it gets an
+        # explicit GOTO, and new_label names blocks that need a label for it.
+        if order is None:
+            order = self.blocks
+        order = [block for block in order if block is not self.exit] + [self.exit]
+        jumps = {}
+        for i, block in enumerate(order):
+            if not block.succs or not block.falls_through:
+                continue
+            target = block.succs[-1]
+            if i + 1 < len(order) and order[i + 1] is target:
+                continue
+            if target.label is None:
+                label = new_label()
+                target.instructions.insert(0, Instr(LABEL, label))
+                self.labels[label] = target
+            jumps[block.index] = Instr(GOTO, target.label)
+
+        code = []
+        for block in order:
+            code.extend(block.instructions)
+            if block.index in jumps:
+                code.append(jumps[block.index])
+        return code
@@ -1,3 +1,6 @@
+from tac import format_tac
+
+
 class CodeGen:
     
     def __init__(self):
@@ -16,10 +19,15 @@ class CodeGen:
     def emit(self, instruction):
         self.code.append(instruction)
     
+    def get_instructions(self):
+        return self.code
+    
     def get_code(self):
-        return '\n'.join(self.code)
+        return format_tac(self.code)
     
-    def reset(self):
-        self.temp_count = 0
-        self.label_count = 0
+    def reset(self, temp_count=0, label_count=0):
+        # The counters can start past names already used elsewhere, so code
+        # generated separately can be put together without renaming.
+        self.temp_count = temp_count
+        self.label_count = label_count
         self.code = []
\ No newline at end of file
@@ -1,26 +1,138 @@
-from lexer import Lexer
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from lexer import Lexer, TokenStream
 from codegen import CodeGen
 from parser import Parser, SyntaxErrorFound
-from assembly_gen import AssemblyGenerator
+from assembly_gen import AssemblyGenerator, TARGETS
 from semantic import SemanticAnalyzer, SemanticError
+from optimizer import Optimizer
+from tac import format_tac
+from tracing import QUIET, REPORT, TRACE, PrintSink
 
 
-class Compiler:
+class CompilationResult:
+    # The TAC is given either as text or as the instructions it is formatted
+    # from when first read, so a caller that only wants the assembly never
+    # has the text built.
+    
+    def __init__(self, tac=None, asm=None, error=None, code=None):
+        self.tac_text = tac
+        self.code = code
+        self.asm = asm
+        self.error = error
     
-    def __init__(self):
-        self.lexer = Lexer().build()
+    @property
+    def tac(self):
+        if self.tac_text is None and self.code is not None:
+            self.tac_text = format_tac(self.code)
+            self.code = None
+        return self.tac_text
+    
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class CompilationContext:
+    # Everything a compilation writes to: the lexer's position and line
+    # count, the parser's stacks, the temporary and label counters, the
+    # symbol table, the optimizer's statistics and the assembly buffers.
+    # Each call to Compiler.compile has one to itself, so concurrent calls
+    # only share what Compiler holds, which nothing changes after it is
+    # built: the lexer's compiled rules and the grammar tables.
+
+    def __init__(self, compiler):
+        self.compiler = compiler
+        self.lexer = compiler.lexer.clone()
+        self.parser = copy.copy(compiler.parser)
         self.codegen = CodeGen()
-        self.parser = Parser(self.codegen).build()
-        self.asm_gen = AssemblyGenerator()
-        self.semantic_analyzer = SemanticAnalyzer(self.codegen)
+        self.semantic_analyzer = SemanticAnalyzer(self.codegen, compiler.trace, compiler.fused)
+        self.optimizer = Optimizer(compiler.opt_level, self.codegen, compiler.trace,
+                                   compiler.live_at_exit, len(compiler.target.registers))
+        self.reset()
+
+    def reset(self):
+        compiler = self.compiler
+        self.lexer.input('')
+        self.lexer.lineno = 1
+        self.codegen.reset()
+        self.semantic_analyzer.reset()
+        self.asm_gen = AssemblyGenerator(compiler.trace, peephole=compiler.opt_level >= 1,
+                                         target=compiler.target)
+
+
+class Compiler:
+    
+    def __init__(self, verbosity=QUIET, trace=None, fast_startup=False, fused=True, opt_level=0,
+                 live_at_exit=None, report_optimizations=False, target='x86', cache=None):
+        # verbosity: QUIET compiles silently, REPORT prints the tokenization,
+        # TAC and assembly listings, TRACE additionally prints every event
+        # from the pipeline. A custom trace sink overrides the TRACE printer.
+        # fast_startup loads the cached lexer and parser tables and shares
+        # them with every other Compiler in the process. fused runs semantic
+        # analysis and TAC generation as a single tree walk. opt_level selects
+        # the TAC optimizations, like -O: 0 keeps the TAC as generated, 1
+        # runs the local passes (constant folding, algebraic identities,
+        # branch layout) and 2 adds the dataflow and loop passes (dead code
+        # and dead store elimination, invariant code motion, strength
+        # reduction, register promotion). live_at_exit names the variables the dead
+        # store elimination must treat as observed when the program ends;
+        # by default all of them are. report_optimizations prints what the
+        # optimizer did and how many instructions it removed. target is
+        # 'x86' for 32-bit code or 'x86-64' for 64-bit code with sixteen
+        # registers. cache is a CompileCache that compile consults before
+        # running the pipeline; it is bypassed when the compilation prints
+        # or traces, since a cached result has no events to replay.
+        #
+        # One Compiler can serve any number of threads at once: each call to
+        # compile works in its own CompilationContext. The trace sink is the
+        # one thing the calls share, so it must accept events from several
+        # threads.
+        if trace is None and verbosity >= TRACE:
+            trace = PrintSink()
+        self.verbosity = verbosity
+        self.trace = trace
+        self.fused = fused
+        self.opt_level = opt_level
+        self.live_at_exit = live_at_exit
+        self.target = TARGETS[target]
+        self.lexer = Lexer(trace).build(optimize=fast_startup)
+        self.parser = Parser(None, trace).build(optimize=fast_startup)
+        self.report_optimizations = report_optimizations
+        self.contexts = []
+        self.cache = cache
+        if cache is not None and (verbosity >= REPORT or report_optimizations or trace is not None):
+            self.cache = None
+        # Everything besides the source that changes the output.
+        self.cache_options = {
+            'fused': fused,
+            'opt_level': opt_level,
+            'live_at_exit': None if live_at_exit is None else sorted(live_at_exit),
+            'target': target,
+        }
     
-    def tokenize(self, text):
+    def acquire_context(self):
+        # Contexts are reset and reused once their compilation is over.
+        # list.pop and list.append are atomic, so two threads never get the
+        # same one.
+        try:
+            return self.contexts.pop()
+        except IndexError:
+            return CompilationContext(self)
+
+    def release_context(self, context):
+        context.reset()
+        self.contexts.append(context)
+
+    def tokenize(self, lexer, text):
         print("=" * 50)
         print("TOKENIZATION")
         print("=" * 50)
-        self.lexer.input(text)
+        tokens = TokenStream(lexer, text)
         
-        for tok in self.lexer:
+        for tok in tokens:
             if tok.type in ['PLUS', 'MINUS', 'TIMES', 'DIVIDE', 'MODULO']:
                 print(f"Arithmetic Operator: {tok.value}")
             elif tok.type in ['SEMICOLON', 'COMMA']:
@@ -30,43 +142,133 @@ class Compiler:
             elif tok.type in ['ASSIGN', 'LT', 'LE', 'GT', 'GE', 'EQ', 'NE']:
                 print(f"Relational/Assignment Operator: {tok.value}")
         print()
+        return tokens
     
-    def compile(self, text):
-        self.codegen.reset()
-        self.semantic_analyzer.reset()
-        self.tokenize(text)
-        
+    def print_optimization_report(self, context, generated):
+        optimizer = context.optimizer
         print("=" * 50)
-        print("PARSING AND SEMANTIC ANALYSIS")
+        print(f"OPTIMIZATION REPORT (-O{optimizer.level})")
         print("=" * 50)
+        for name, amount in optimizer.stats.items():
+            print(f"{name}: {amount}")
+        print(f"Removed {optimizer.removed} of {generated} TAC instructions")
+        peephole = context.asm_gen.peephole
+        if peephole is not None:
+            for name, amount in peephole.stats.items():
+                print(f"peephole: {name}: {amount}")
+            print(f"Peephole rules fired {sum(peephole.stats.values())} times")
+        print()
+    
+    def compile(self, text):
+        if self.cache is None:
+            return self.compile_uncached(text)
+        key = self.cache.key(text, self.cache_options)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return CompilationResult(*cached)
+        result = self.compile_uncached(text)
+        self.cache.put(key, (result.tac, result.asm, result.error))
+        return result
+
+    def compile_uncached(self, text):
+        context = self.acquire_context()
+        try:
+            return self.run(context, text)
+        finally:
+            self.release_context(context)
+
+    def run(self, context, text):
+        report = self.verbosity >= REPORT
+        tokens = None
+        if report:
+            # The report needs every token before parsing starts; the
+            # buffered stream is handed to the parser so the text is only
+            # lexed once.
+            tokens = self.tokenize(context.lexer, text)
+            
+            print("=" * 50)
+            print("PARSING AND SEMANTIC ANALYSIS")
+            print("=" * 50)
         
-        self.lexer.lineno = 1
         try:
-            ast = self.parser.parse(text, lexer=self.lexer)
-            self.semantic_analyzer.analyze(ast)
-        except SyntaxErrorFound:
-            print("\n" + "=" * 50)
-            print("COMPILATION FAILED DUE TO SYNTAX ERROR.")
-            print("=" * 50 + "\n")
-            return
+            if tokens is not None:
+                ast = context.parser.parse(lexer=context.lexer, tokenfunc=tokens.token)
+            else:
+                ast = context.parser.parse(text, lexer=context.lexer)
+            context.semantic_analyzer.analyze(ast)
+        except SyntaxErrorFound as e:
+            if report:
+                print(e)
+                print("\n" + "=" * 50)
+                print("COMPILATION FAILED DUE TO SYNTAX ERROR.")
+                print("=" * 50 + "\n")
+            return CompilationResult(error=str(e))
         except Exception as e:
-            print("\n" + "=" * 50)
-            print(f"COMPILATION FAILED DUE TO SEMANTIC ERROR: {e}")
-            print("=" * 50 + "\n")
-            return
+            if report:
+                print("\n" + "=" * 50)
+                print(f"COMPILATION FAILED DUE TO SEMANTIC ERROR: {e}")
+                print("=" * 50 + "\n")
+            return CompilationResult(error=str(e))
         
-        print("\n" + "=" * 50)
-        print("GENERATED INTERMEDIATE CODE (TAC)")
-        print("=" * 50)
-        tac_code = self.codegen.get_code()
-        print(tac_code)
-        print()
+        generated = context.codegen.get_instructions()
+        code = context.optimizer.optimize(generated)
+        if report:
+            print("\n" + "=" * 50)
+            print("GENERATED INTERMEDIATE CODE (TAC)")
+            print("=" * 50)
+            print(format_tac(code))
+            print()
         
-        self.asm_gen = AssemblyGenerator()
-        asm_code = self.asm_gen.generate_from_tac(tac_code)
+        asm_code = context.asm_gen.generate(code)
+        if self.report_optimizations:
+            self.print_optimization_report(context, len(generated))
         
-        print("\n" + "=" * 50)
-        print("GENERATED ASSEMBLY CODE (x86)")
-        print("=" * 50)
-        print(asm_code)
-        print()
+        if report:
+            print("\n" + "=" * 50)
+            print(f"GENERATED ASSEMBLY CODE ({self.target.name})")
+            print("=" * 50)
+            print(asm_code)
+            print()
+        return CompilationResult(asm=asm_code, code=code)
+
+
+# The Compiler of a compile_many worker process, built once when the worker
+# starts so every unit it compiles reuses the loaded lexer and parser tables.
+_worker = None
+
+
+def start_worker(options):
+    global _worker
+    _worker = Compiler(**options)
+
+
+def compile_in_worker(text):
+    return compile_unit(_worker, text)
+
+
+def compile_unit(compiler, text):
+    # A unit that fails to compile returns its error as its result instead
+    # of failing the whole batch, even when the compiler raises.
+    try:
+        return compiler.compile(text)
+    except Exception as e:
+        return CompilationResult(error=f"{type(e).__name__}: {e}")
+
+
+def compile_many(sources, workers=None, **options):
+    # Compiles independent source texts on a pool of worker processes and
+    # returns their CompilationResults in the order of sources. workers
+    # defaults to the number of CPUs; a batch that only needs one is
+    # compiled in this process. options are passed to every Compiler, with
+    # fast_startup on unless given.
+    sources = list(sources)
+    options.setdefault('fast_startup', True)
+    workers = min(workers or os.cpu_count() or 1, len(sources))
+    if workers <= 1:
+        compiler = Compiler(**options)
+        return [compile_unit(compiler, text) for text in sources]
+    # Several units per task keep the cost of sending them to the workers
+    # low, and several tasks per worker keep the load even.
+    chunksize = max(1, len(sources) // (workers * 4))
+    with ProcessPoolExecutor(workers, initializer=start_worker, initargs=(options,)) as pool:
+        return list(pool.map(compile_in_worker, sources, chunksize=chunksize))
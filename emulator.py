@@ -0,0 +1,207 @@
+import re
+
+
+# An interpreter for the subset of NASM that AssemblyGenerator emits, on
+# either target. The tests run the generated listings with it to check the
+# values a program computes rather than the text of the listing.
+
+MASK = 0xffffffff
+
+REGISTERS_64 = ('rax', 'rbx', 'rcx', 'rdx', 'rsi', 'rdi', 'rbp', 'rsp') + tuple(f'r{i}' for i in range(8, 16))
+REGISTERS_32 = {'eax': 'rax', 'ebx': 'rbx', 'ecx': 'rcx', 'edx': 'rdx',
+                'esi': 'rsi', 'edi': 'rdi', 'ebp': 'rbp', 'esp': 'rsp'}
+REGISTERS_32.update((f'r{i}d', f'r{i}') for i in range(8, 16))
+
+TERM = re.compile(r'([+-]?)\s*([^+-]+)')
+SYMBOL = re.compile(r'[A-Za-z_][\w@.]*')
+
+CONDITIONS = {
+    'je': lambda a, b: a == b, 'jz': lambda a, b: a == b,
+    'jne': lambda a, b: a != b, 'jnz': lambda a, b: a != b,
+    'jl': lambda a, b: a < b, 'jle': lambda a, b: a <= b,
+    'jg': lambda a, b: a > b, 'jge': lambda a, b: a >= b,
+}
+
+ARITHMETIC = {
+    'add': lambda a, b: a + b,
+    'sub': lambda a, b: a - b,
+    'imul': lambda a, b: a * b,
+    'and': lambda a, b: a & b,
+    'or': lambda a, b: a | b,
+    'xor': lambda a, b: a ^ b,
+    'shl': lambda a, b: a << b,
+    'sal': lambda a, b: a << b,
+    'sar': lambda a, b: a >> b,
+    'shr': lambda a, b: (a & MASK) >> b,
+}
+
+
+class StepLimitExceeded(Exception):
+    pass
+
+
+def signed(value):
+    value &= MASK
+    return value - (1 << 32) if value & 0x80000000 else value
+
+
+def parse(listing):
+    # The data section as a dict of initial values, and the instructions
+    # as (mnemonic, operands) pairs with the index of every label.
+    data = {}
+    code = []
+    labels = {}
+    section = None
+    for line in listing.split('\n'):
+        line = line.split(';')[0].strip()
+        if not line or line.startswith(('global', 'default')):
+            continue
+        if line.startswith('section'):
+            section = line.split()[1]
+        elif section == '.data':
+            name, _, value = line.split(None, 2)
+            data[name] = int(value)
+        elif line.endswith(':'):
+            labels[line[:-1]] = len(code)
+        else:
+            mnemonic, _, operands = line.partition(' ')
+            code.append((mnemonic, [operand.strip() for operand in operands.split(',')] if operands else []))
+    return data, code, labels
+
+
+class Machine:
+
+    def __init__(self, listing):
+        self.data, self.code, self.labels = parse(listing)
+        self.registers = dict.fromkeys(REGISTERS_64, 0)
+        self.registers['rsp'] = self.registers['rbp'] = 1 << 20
+        self.stack = {}
+        # The operands of the last comparison, or the result and 0 after
+        # an arithmetic instruction.
+        self.flags = (0, 0)
+
+    def register(self, name):
+        if name in REGISTERS_32:
+            return signed(self.registers[REGISTERS_32[name]])
+        return self.registers[name]
+
+    def set_register(self, name, value):
+        if name in REGISTERS_32:
+            self.registers[REGISTERS_32[name]] = signed(value)
+        else:
+            self.registers[name] = value
+
+    def address(self, operand):
+        # A variable's name, or the stack address as a number.
+        inner = operand.replace('dword', '').replace('qword', '').strip()[1:-1]
+        inner = inner.replace('rel ', '').strip()
+        if SYMBOL.fullmatch(inner) and inner not in REGISTERS_64 and inner not in REGISTERS_32:
+            return inner
+        total = 0
+        for sign, term in TERM.findall(inner):
+            term = term.strip()
+            if '*' in term:
+                name, scale = term.split('*')
+                value = self.register(name.strip()) * int(scale)
+            elif term in REGISTERS_64 or term in REGISTERS_32:
+                value = self.register(term)
+            else:
+                value = int(term, 0)
+            total += -value if sign == '-' else value
+        return total
+
+    def read(self, operand):
+        if '[' in operand:
+            where = self.address(operand)
+            if type(where) is str:
+                return self.data[where]
+            return self.stack.get(where, 0)
+        if operand in REGISTERS_64 or operand in REGISTERS_32:
+            return self.register(operand)
+        return int(operand.replace('dword', ''), 0)
+
+    def write(self, operand, value):
+        if '[' in operand:
+            where = self.address(operand)
+            if type(where) is str:
+                self.data[where] = signed(value)
+            else:
+                self.stack[where] = signed(value)
+        else:
+            self.set_register(operand, value)
+
+    def arithmetic(self, operand, value):
+        self.write(operand, value)
+        self.flags = (signed(value), 0)
+
+    def run(self, limit):
+        code = self.code
+        pc = 0
+        steps = 0
+        while pc < len(code):
+            steps += 1
+            if steps > limit:
+                raise StepLimitExceeded(f"still running after {limit} instructions")
+            mnemonic, operands = code[pc]
+            pc += 1
+            if mnemonic in ('mov', 'movsx', 'movsxd'):
+                self.write(operands[0], self.read(operands[1]))
+            elif mnemonic == 'lea':
+                self.write(operands[0], self.address(operands[1]))
+            elif mnemonic == 'imul' and len(operands) == 1:
+                product = signed(self.registers['rax']) * signed(self.read(operands[0]))
+                self.set_register('eax', product & MASK)
+                self.set_register('edx', (product >> 32) & MASK)
+                self.flags = (signed(product), 0)
+            elif mnemonic == 'imul' and len(operands) == 3:
+                self.arithmetic(operands[0], self.read(operands[1]) * self.read(operands[2]))
+            elif mnemonic in ARITHMETIC:
+                a = self.read(operands[0])
+                if mnemonic == 'sar':
+                    a = signed(a)
+                self.arithmetic(operands[0], ARITHMETIC[mnemonic](a, self.read(operands[1])))
+            elif mnemonic == 'neg':
+                self.arithmetic(operands[0], -self.read(operands[0]))
+            elif mnemonic == 'inc':
+                self.arithmetic(operands[0], self.read(operands[0]) + 1)
+            elif mnemonic == 'dec':
+                self.arithmetic(operands[0], self.read(operands[0]) - 1)
+            elif mnemonic in ('cdq', 'cqo'):
+                self.registers['rdx'] = -1 if signed(self.registers['rax']) < 0 else 0
+            elif mnemonic == 'idiv':
+                divisor = signed(self.read(operands[0]))
+                if divisor == 0:
+                    raise ZeroDivisionError("idiv by zero")
+                dividend = (signed(self.registers['rdx']) << 32) | (self.registers['rax'] & MASK)
+                quotient = abs(dividend) // abs(divisor)
+                if (dividend < 0) != (divisor < 0):
+                    quotient = -quotient
+                self.set_register('eax', quotient)
+                self.set_register('edx', dividend - quotient * divisor)
+            elif mnemonic == 'cmp':
+                self.flags = (signed(self.read(operands[0])), signed(self.read(operands[1])))
+            elif mnemonic == 'test':
+                self.flags = (signed(self.read(operands[0]) & self.read(operands[1])), 0)
+            elif mnemonic == 'push':
+                self.registers['rsp'] -= 8
+                self.stack[self.registers['rsp']] = self.read(operands[0])
+            elif mnemonic == 'pop':
+                self.write(operands[0], self.stack[self.registers['rsp']])
+                self.registers['rsp'] += 8
+            elif mnemonic == 'jmp':
+                pc = self.labels[operands[0]]
+            elif mnemonic in CONDITIONS:
+                if CONDITIONS[mnemonic](*self.flags):
+                    pc = self.labels[operands[0]]
+            elif mnemonic in ('int', 'syscall'):
+                break
+            else:
+                raise ValueError(f"cannot emulate {mnemonic} {', '.join(operands)}")
+        return {name: signed(value) for name, value in self.data.items()}
+
+
+def run(listing, limit=1000000):
+    # The value of every variable in the data section when the program
+    # exits. Raises ZeroDivisionError if it divides by zero and
+    # StepLimitExceeded if it runs for more than limit instructions.
+    return Machine(listing).run(limit)
@@ -0,0 +1,325 @@
+import re
+from bisect import bisect_right
+
+from assembly_gen import AssemblyGenerator, program_listing
+from compiler import Compiler, CompilationContext, CompilationResult
+from nodes import Declaration, DeclarationAssign
+from parser import SyntaxErrorFound
+from semantic import Symbol, SymbolTable
+from tac import format_tac
+
+
+# Comments and strings that are closed. Lexing a piece of the source on its
+# own is only safe when none is left open to run past its end.
+CLOSED = re.compile(r'/\*(.|\n)*?\*/|"([^"\\]|\\.)*"|//.*')
+DELIMITER = re.compile(r'/\*|\*/|//|"|\\')
+
+BLOCK = 4096
+
+
+def common_prefix(a, b):
+    # Compared a block at a time, so the work is done by string comparison.
+    limit = min(len(a), len(b))
+    i = 0
+    while i + BLOCK <= limit and a[i:i + BLOCK] == b[i:i + BLOCK]:
+        i += BLOCK
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def common_suffix(a, b, limit):
+    i = 0
+    while i + BLOCK <= limit and a[len(a) - i - BLOCK:len(a) - i] == b[len(b) - i - BLOCK:len(b) - i]:
+        i += BLOCK
+    while i < limit and a[len(a) - 1 - i] == b[len(b) - 1 - i]:
+        i += 1
+    return i
+
+
+def split_statements(tokens, next_head):
+    # Groups the tokens of consecutive top-level statements. A statement
+    # ends at a semicolon or closing brace outside all parentheses and
+    # braces, unless an else follows; next_head is the type of the token
+    # after the last one. Returns the groups and the tokens left over.
+    groups = []
+    start = 0
+    parens = braces = 0
+    for i, tok in enumerate(tokens):
+        kind = tok.type
+        if kind == 'LPAREN':
+            parens += 1
+            continue
+        if kind == 'RPAREN':
+            parens -= 1
+            continue
+        if kind == 'LBRACE':
+            braces += 1
+            continue
+        if kind == 'RBRACE':
+            braces -= 1
+        elif kind != 'SEMICOLON':
+            continue
+        if parens or braces:
+            continue
+        following = tokens[i + 1].type if i + 1 < len(tokens) else next_head
+        if following == 'ELSE':
+            continue
+        groups.append(tokens[start:i + 1])
+        start = i + 1
+    return groups, tokens[start:]
+
+
+class Statement:
+    # One top-level statement. text runs from its first token to the next
+    # statement's. names are the identifiers in it, and deps what each of
+    # them was declared as (a type, or None) when the statement was last
+    # analyzed; shadow_entry and shadows are the shadowing count it started
+    # from and how many declarations in it shadow another. exports are the
+    # global declarations it makes. tac, asm, data and frame are what it
+    # compiled to.
+    __slots__ = ('text', 'head', 'names', 'tokens', 'nodes', 'parsed_line', 'error',
+                 'syntax_error', 'deps', 'shadow_entry', 'shadows', 'exports',
+                 'tac', 'asm', 'data', 'frame')
+
+    def __init__(self, text, tokens):
+        self.text = text
+        self.head = tokens[0].type if tokens else None
+        self.names = tuple({tok.value: None for tok in tokens if tok.type == 'ID'})
+        self.tokens = tokens
+        self.nodes = None
+        self.parsed_line = None
+        self.error = None
+        self.syntax_error = False
+        self.deps = None
+        self.shadow_entry = 0
+        self.shadows = 0
+        self.exports = ()
+        self.tac = ''
+        self.asm = ''
+        self.data = ()
+        self.frame = 0
+
+
+class IncrementalCompiler:
+    # Compiles successive versions of one program, redoing only the work an
+    # edit affects. The source is kept as a list of top-level statements,
+    # each with the TAC and assembly it compiled to. An edit is located by
+    # comparing the new text with the previous one, and only the statements
+    # it touches are lexed and parsed again. The statements are then
+    # analyzed in order against a symbol table of the global declarations:
+    # one that was not reparsed and whose identifiers are declared as they
+    # were last time keeps its code, so a changed declaration reaches every
+    # statement that uses the name. Temporary and label numbers continue
+    # from the highest ever handed out, so kept code never clashes with new
+    # code, and the program is linked by concatenating the pieces.
+    #
+    # Each statement is optimized on its own: every variable is live at its
+    # end, and constants are not propagated from one statement to the next.
+    # Loops are statements, so the loop passes of opt_level 2 still apply.
+
+    def __init__(self, opt_level=0, target='x86', fast_startup=True):
+        self.compiler = Compiler(fast_startup=fast_startup, opt_level=opt_level, target=target)
+        self.context = CompilationContext(self.compiler)
+        self.text = ''
+        self.statements = []
+        self.starts = []
+        self.lines = []
+        self.temp_count = 0
+        self.label_count = 0
+        # How many statements the last compile parsed and analyzed again.
+        self.reparsed = 0
+        self.reanalyzed = 0
+
+    def compile(self, text):
+        self.update(text)
+        error = self.syntax_error()
+        if error is None:
+            error = self.analyze()
+        if error is not None:
+            return CompilationResult(error=error)
+        return self.link()
+
+    def update(self, text):
+        # Replaces the statements the edit from self.text to text touches.
+        old = self.text
+        statements = self.statements
+        prefix = common_prefix(old, text)
+        suffix = common_suffix(old, text, min(len(old), len(text)) - prefix)
+        delta = len(text) - len(old)
+
+        # The statement the edit starts in, and the one before it, which an
+        # inserted else could extend; up to the statement the edit ends in.
+        first = max(bisect_right(self.starts, prefix) - 2, 0)
+        stop = min(bisect_right(self.starts, len(old) - suffix), len(statements))
+        # Adding or removing a comment or string delimiter can change how
+        # text on either side of the edit lexes, so everything is lexed again.
+        window = old[max(prefix - 1, 0):len(old) - suffix + 1] + '\0' + text[max(prefix - 1, 0):len(text) - suffix + 1]
+        if DELIMITER.search(window):
+            first = 0
+            stop = len(statements)
+        start = self.starts[first] if statements else 0
+        line = self.lines[first] if statements else 1
+
+        while True:
+            # The piece ends at the start of a line, so a // comment
+            # inside it cannot reach past it.
+            while stop < len(statements):
+                end = self.starts[stop] + delta
+                if text[text.rfind('\n', 0, end) + 1:end].isspace() or text[end - 1] == '\n':
+                    break
+                stop += 1
+            end = self.starts[stop] + delta if stop < len(statements) else len(text)
+            piece = text[start:end]
+            tokens = self.lex(piece, start, line)
+            next_head = statements[stop].head if stop < len(statements) else None
+            groups, rest = split_statements(tokens, next_head)
+            unclosed = '/*' in CLOSED.sub('', piece) or '"' in CLOSED.sub('', piece)
+            if stop == len(statements):
+                if rest:
+                    groups.append(rest)
+                break
+            if not rest and not unclosed:
+                break
+            stop = len(statements)
+
+        replacement = []
+        starts = []
+        lines = []
+        for i, group in enumerate(groups):
+            begin = start if i == 0 else group[0].lexpos
+            finish = groups[i + 1][0].lexpos if i + 1 < len(groups) else end
+            replacement.append(Statement(text[begin:finish], group))
+            starts.append(begin)
+            lines.append(line if i == 0 else group[0].lineno)
+        if not groups and piece:
+            replacement.append(Statement(piece, []))
+            starts.append(start)
+            lines.append(line)
+
+        line_delta = piece.count('\n') - old[start:end - delta].count('\n')
+        self.statements[first:stop] = replacement
+        self.starts[first:] = starts + [offset + delta for offset in self.starts[stop:]]
+        self.lines[first:] = lines + [number + line_delta for number in self.lines[stop:]]
+        self.text = text
+        self.reparsed = len(replacement)
+        for statement, number in zip(replacement, lines):
+            self.parse(statement, number)
+
+    def lex(self, piece, offset, line):
+        lexer = self.context.lexer
+        lexer.input(piece)
+        lexer.lineno = line
+        tokens = list(iter(lexer.token, None))
+        for tok in tokens:
+            tok.lexpos += offset
+        return tokens
+
+    def parse(self, statement, line):
+        tokens = statement.tokens
+        if tokens is None:
+            tokens = self.lex(statement.text, 0, line)
+        statement.tokens = None
+        statement.parsed_line = line
+        statement.nodes = None
+        statement.error = None
+        statement.syntax_error = False
+        if not tokens:
+            return
+        stream = iter(tokens)
+        try:
+            program = self.context.parser.parse(lexer=self.context.lexer,
+                                                tokenfunc=lambda: next(stream, None))
+        except SyntaxErrorFound as e:
+            statement.error = str(e)
+            statement.syntax_error = True
+            return
+        statement.nodes = program.statements
+
+    def syntax_error(self):
+        # The whole program fails to parse if any statement does.
+        for index, statement in enumerate(self.statements):
+            if statement.syntax_error:
+                if statement.parsed_line != self.lines[index]:
+                    self.parse(statement, self.lines[index])
+                return statement.error
+        return None
+
+    def analyze(self):
+        # Returns the first semantic error, or None.
+        self.reanalyzed = 0
+        table = SymbolTable()
+        analyzed = False
+        for index, statement in enumerate(self.statements):
+            if statement.nodes is None:
+                continue
+            analyzed = True
+            if statement.deps is not None and statement.error is None and self.unchanged(statement, table):
+                for name, type in statement.exports:
+                    table.add_symbol(Symbol(name, type))
+                table.shadow_count += statement.shadows
+                continue
+            if statement.parsed_line != self.lines[index]:
+                # Line numbers in the tree are only read by error messages,
+                # which is when a statement is analyzed again.
+                self.parse(statement, self.lines[index])
+                if statement.syntax_error:
+                    return statement.error
+            error = self.translate(statement, table)
+            if error is not None:
+                return error
+        if not analyzed:
+            return "Syntax error at EOF"
+        return None
+
+    def unchanged(self, statement, table):
+        if statement.shadows and table.shadow_count != statement.shadow_entry:
+            return False
+        visible = table.visible
+        for name, type in statement.deps:
+            symbol = visible.get(name)
+            if (symbol.type if symbol is not None else None) != type:
+                return False
+        return True
+
+    def translate(self, statement, table):
+        context = self.context
+        visible = table.visible
+        statement.deps = tuple((name, visible[name].type if name in visible else None)
+                               for name in statement.names)
+        statement.shadow_entry = table.shadow_count
+        context.codegen.reset(self.temp_count, self.label_count)
+        analyzer = context.semantic_analyzer
+        analyzer.symbol_table = table
+        analyzer.values = []
+        try:
+            for node in statement.nodes:
+                analyzer.translate(node)
+        except Exception as e:
+            statement.error = str(e)
+            return statement.error
+        statement.error = None
+        statement.shadows = table.shadow_count - statement.shadow_entry
+        statement.exports = tuple((node.name, node.type) for node in statement.nodes
+                                  if type(node) is Declaration or type(node) is DeclarationAssign)
+
+        code = context.optimizer.optimize(context.codegen.get_instructions())
+        self.temp_count = context.codegen.temp_count
+        self.label_count = context.codegen.label_count
+        compiler = self.compiler
+        asm_gen = AssemblyGenerator(peephole=compiler.opt_level >= 1, target=compiler.target)
+        asm_gen.generate(code)
+        statement.tac = format_tac(code)
+        statement.asm = '\n'.join(asm_gen.assembly_code)
+        statement.data = tuple(asm_gen.data_section)
+        statement.frame = asm_gen.stack_offset
+        self.reanalyzed += 1
+        return None
+
+    def link(self):
+        statements = self.statements
+        tac = '\n'.join(s.tac for s in statements if s.tac)
+        data = list(dict.fromkeys(line for s in statements for line in s.data))
+        code = [s.asm for s in statements if s.asm]
+        frame = max((s.frame for s in statements), default=0)
+        return CompilationResult(tac, program_listing(self.compiler.target, data, code, frame))
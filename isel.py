@@ -0,0 +1,63 @@
+from tac import Instr, is_temporary, ASSIGN, ADD, SUB, MUL, DIV, MOD, MOV, INC, DEC, IF, GOTO, LABEL
+
+
+# Instructions whose operands x86 can take straight from memory or as an
+# immediate: the generator loads at most one of them into a register.
+MEMORY_OPERANDS = frozenset((ASSIGN, ADD, SUB, MUL, DIV, MOD, IF))
+
+
+def select_operands(code):
+    # Maximal munch over the expression trees of each basic block. The TAC
+    # gives every constant and every variable read its own temporary; a
+    # temporary read only once is an edge of the tree, and the leaf it
+    # holds is better matched as part of the instruction that reads it: a
+    # constant becomes an immediate operand and a variable a memory operand
+    # ("add eax, [x]", "cmp dword [i], 5"), and the instruction that set the
+    # temporary goes away along with the register it needed. A variable's
+    # read is never moved past a store to it.
+    uses = {}
+    defs = {}
+    for instr in code:
+        defs[instr.dest] = defs.get(instr.dest, 0) + 1
+        for operand in (instr.a, instr.b):
+            if is_temporary(operand):
+                uses[operand] = uses.get(operand, 0) + 1
+
+    leaves = {}
+    selected = []
+    for instr in code:
+        op = instr.op
+        if op == LABEL or op == GOTO:
+            leaves.clear()
+            selected.append(instr)
+            continue
+
+        a, b = instr.a, instr.b
+        if a in leaves and can_take(instr, a, leaves[a][1]):
+            index, a = leaves.pop(a)
+            selected[index] = None
+        if b in leaves and can_take(instr, b, leaves[b][1]):
+            index, b = leaves.pop(b)
+            selected[index] = None
+        if a is not instr.a or b is not instr.b:
+            instr = Instr(op, instr.dest, a, b, instr.rel)
+
+        dest = instr.dest
+        if op in (MOV, INC, DEC):
+            for temp in [temp for temp, (_, value) in leaves.items() if value == dest]:
+                del leaves[temp]
+        elif (op == ASSIGN and not is_temporary(a) and is_temporary(dest)
+                and uses.get(dest) == 1 and defs[dest] == 1):
+            leaves[dest] = (len(selected), a)
+        selected.append(instr)
+    return [instr for instr in selected if instr is not None]
+
+
+def can_take(instr, temp, value):
+    # Whether instr can read value in place of temp.
+    if not isinstance(value, str):
+        return True
+    if instr.op in MEMORY_OPERANDS:
+        return True
+    # ADD/SUB v, a, b updates v in memory; only reading v itself is free.
+    return instr.op in (INC, DEC) and instr.a == temp and value == instr.dest
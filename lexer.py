@@ -1,6 +1,18 @@
+import hashlib
+import importlib
+import os
+import sys
+
 import ply.lex as lex
 
 
+LEXTAB = 'lextab'
+
+# Lexer built by the first optimized build in this process; later builds
+# clone it instead of reflecting over the rules again.
+_prebuilt = None
+
+
 class Lexer:
     
     reserved = {
@@ -25,14 +37,19 @@ class Lexer:
         'INCREMENT', 'DECREMENT'
     ] + list(reserved.values())
 
+    def __init__(self, trace=None):
+        self.trace = trace
+
     def t_INCREMENT(self, t):
         r'\+\+'
-        print(f"Increment Operator: {t.value}")
+        if self.trace is not None:
+            self.trace.event('lexer', "Increment Operator: {}", t.value)
         return t
 
     def t_DECREMENT(self, t):
         r'--'
-        print(f"Decrement Operator: {t.value}")
+        if self.trace is not None:
+            self.trace.event('lexer', "Decrement Operator: {}", t.value)
         return t
 
     t_PLUS = r'\+'
@@ -59,28 +76,32 @@ class Lexer:
 
     def t_STRING(self, t):
         r'"([^"\\]|\\.)*"'
-        print(f"String: {t.value}")
+        if self.trace is not None:
+            self.trace.event('lexer', "String: {}", t.value)
         return t
     
     def t_FLOAT_CONSTANT(self, t):
         r'\d+\.\d+'
         t.value = float(t.value)
-        print(f"Constant: {t.value}")
+        if self.trace is not None:
+            self.trace.event('lexer', "Constant: {}", t.value)
         return t
     
     def t_CONSTANT(self, t):
         r'\d+'
         t.value = int(t.value)
-        print(f"Constant: {t.value}")
+        if self.trace is not None:
+            self.trace.event('lexer', "Constant: {}", t.value)
         return t
     
     def t_ID(self, t):
         r'[a-zA-Z_][a-zA-Z0-9_]*'
         t.type = self.reserved.get(t.value, 'ID')
-        if t.type == 'ID':
-            print(f"Identifier: {t.value}")
-        else:
-            print(f"Keyword: {t.value}")
+        if self.trace is not None:
+            if t.type == 'ID':
+                self.trace.event('lexer', "Identifier: {}", t.value)
+            else:
+                self.trace.event('lexer', "Keyword: {}", t.value)
         return t
     
     def t_newline(self, t):
@@ -96,9 +117,81 @@ class Lexer:
         pass
     
     def t_error(self, t):
-        print(f"Unrecognized character: {t.value[0]}")
+        if self.trace is not None:
+            self.trace.event('lexer', "Unrecognized character: {}", t.value[0])
         t.lexer.skip(1)
     
-    def build(self):
-        self.lexer = lex.lex(module=self)
-        return self.lexer
\ No newline at end of file
+    def build(self, optimize=False):
+        global _prebuilt
+        if not optimize:
+            self.lexer = lex.lex(module=self)
+            return self.lexer
+        if _prebuilt is None:
+            _prebuilt = self.load_tables()
+        self.lexer = _prebuilt.clone(self)
+        return self.lexer
+    
+    @classmethod
+    def signature(cls):
+        rules = []
+        for name in dir(cls):
+            if name.startswith('t_'):
+                rule = getattr(cls, name)
+                if callable(rule):
+                    rules.append((rule.__code__.co_firstlineno, name, rule.__doc__))
+                else:
+                    rules.append((0, name, rule))
+        rules.sort(key=lambda rule: (rule[0], rule[1]))
+        spec = repr((cls.tokens, sorted(cls.reserved.items()), [rule[1:] for rule in rules]))
+        return hashlib.sha256(spec.encode()).hexdigest()
+    
+    def load_tables(self):
+        # lextab.py carries the signature of the rules it was generated
+        # from. Matching tables are loaded without re-validating the rules;
+        # anything else triggers a full build that rewrites the file.
+        signature = self.signature()
+        try:
+            tables = importlib.import_module(LEXTAB)
+            if getattr(tables, '_lexsignature', None) == signature:
+                return lex.lex(module=self, optimize=True, lextab=tables)
+        except ImportError:
+            pass
+        
+        lexer = lex.lex(module=self)
+        outputdir = os.path.dirname(os.path.abspath(__file__))
+        try:
+            lexer.writetab(LEXTAB, outputdir)
+            with open(os.path.join(outputdir, LEXTAB + '.py'), 'a') as tf:
+                tf.write(f"_lexsignature = {signature!r}\n")
+        except IOError:
+            pass
+        sys.modules.pop(LEXTAB, None)
+        return lexer
+
+
+class TokenStream:
+    
+    # Tees a single lexing pass: tokens are pulled from the lexer on demand
+    # and buffered, so a token report and the parser can both consume the
+    # same pass over the text.
+    def __init__(self, lexer, text):
+        lexer.input(text)
+        self.lexer = lexer
+        self.tokens = []
+        self.position = 0
+    
+    def __iter__(self):
+        yield from self.tokens[:]
+        for tok in iter(self.lexer.token, None):
+            self.tokens.append(tok)
+            yield tok
+    
+    def token(self):
+        if self.position == len(self.tokens):
+            tok = self.lexer.token()
+            if tok is None:
+                return None
+            self.tokens.append(tok)
+        tok = self.tokens[self.position]
+        self.position += 1
+        return tok
\ No newline at end of file
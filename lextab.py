@@ -0,0 +1,11 @@
+# lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('ASSIGN', 'AUTO', 'BREAK', 'CASE', 'CHAR', 'COMMA', 'CONST', 'CONSTANT', 'CONTINUE', 'DECREMENT', 'DEFAULT', 'DIVIDE', 'DO', 'DOUBLE', 'ELSE', 'ENUM', 'EQ', 'EXTERN', 'FLOAT', 'FLOAT_CONSTANT', 'FOR', 'GE', 'GOTO', 'GT', 'ID', 'IF', 'INCREMENT', 'INT', 'LBRACE', 'LBRACKET', 'LE', 'LONG', 'LPAREN', 'LT', 'MINUS', 'MODULO', 'NE', 'PLUS', 'RBRACE', 'RBRACKET', 'REGISTER', 'RETURN', 'RPAREN', 'SEMICOLON', 'SHORT', 'SIGNED', 'SIZEOF', 'STATIC', 'STRING', 'STRUCT', 'SWITCH', 'TIMES', 'TYPEDEF', 'UNION', 'UNSIGNED', 'VOID', 'VOLATILE', 'WHILE'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_INCREMENT>\\+\\+)|(?P<t_DECREMENT>--)|(?P<t_STRING>"([^"\\\\]|\\\\.)*")|(?P<t_FLOAT_CONSTANT>\\d+\\.\\d+)|(?P<t_CONSTANT>\\d+)|(?P<t_ID>[a-zA-Z_][a-zA-Z0-9_]*)|(?P<t_newline>\\n+)|(?P<t_COMMENT_MULTI>/\\*(.|\\n)*?\\*/)|(?P<t_COMMENT_SINGLE>//.*)|(?P<t_EQ>==)|(?P<t_GE>>=)|(?P<t_LBRACE>\\{)|(?P<t_LBRACKET>\\[)|(?P<t_LE><=)|(?P<t_LPAREN>\\()|(?P<t_NE>!=)|(?P<t_PLUS>\\+)|(?P<t_RBRACE>\\})|(?P<t_RBRACKET>\\])|(?P<t_RPAREN>\\))|(?P<t_TIMES>\\*)|(?P<t_ASSIGN>=)|(?P<t_COMMA>,)|(?P<t_DIVIDE>/)|(?P<t_GT>>)|(?P<t_LT><)|(?P<t_MINUS>-)|(?P<t_MODULO>%)|(?P<t_SEMICOLON>;)', [None, ('t_INCREMENT', 'INCREMENT'), ('t_DECREMENT', 'DECREMENT'), ('t_STRING', 'STRING'), None, ('t_FLOAT_CONSTANT', 'FLOAT_CONSTANT'), ('t_CONSTANT', 'CONSTANT'), ('t_ID', 'ID'), ('t_newline', 'newline'), ('t_COMMENT_MULTI', 'COMMENT_MULTI'), None, ('t_COMMENT_SINGLE', 'COMMENT_SINGLE'), (None, 'EQ'), (None, 'GE'), (None, 'LBRACE'), (None, 'LBRACKET'), (None, 'LE'), (None, 'LPAREN'), (None, 'NE'), (None, 'PLUS'), (None, 'RBRACE'), (None, 'RBRACKET'), (None, 'RPAREN'), (None, 'TIMES'), (None, 'ASSIGN'), (None, 'COMMA'), (None, 'DIVIDE'), (None, 'GT'), (None, 'LT'), (None, 'MINUS'), (None, 'MODULO'), (None, 'SEMICOLON')])]}
+_lexstateignore = {'INITIAL': ' \t'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
+_lexsignature = 'bf5aa7c862e6caf30d5fb39daf062320aa6e9d5f2edc849be8ad2ef7175fd392'
@@ -1,8 +1,15 @@
-from compiler import Compiler
+import argparse
+import os
+import sys
+
+from assembly_gen import TARGETS
+from compiler import Compiler, compile_many
+from streaming import StreamingCompiler
+from tracing import TRACE
 from test_cases import test_suite, error_suite
 
 def run_tests():
-    compiler = Compiler()
+    compiler = Compiler(verbosity=TRACE)
     
     # print("\n" + "=" * 20 + " RUNNING PASSING TESTS " + "=" * 20)
     # tests = test_suite
@@ -52,5 +59,75 @@ def run_tests():
     compiler.compile(code)
 
 
+def output_path(path, directory):
+    output = os.path.splitext(path)[0] + '.asm'
+    if directory is not None:
+        output = os.path.join(directory, os.path.basename(output))
+    return output
+
+
+def stream_files(paths, directory, **options):
+    # Compiles one file at a time in this process, writing the assembly
+    # while the source is read. Yields the error of each file, or None.
+    compiler = StreamingCompiler(**options)
+    for path in paths:
+        output = output_path(path, directory)
+        with open(path) as source, open(output, 'w') as f:
+            error = compiler.compile(source, f)
+        if error is not None:
+            os.remove(output)
+        yield error
+
+
+def compile_in_batch(paths, directory, jobs, **options):
+    # Reads every file and compiles them on compile_many's worker processes.
+    # Yields the error of each file, or None.
+    sources = []
+    for path in paths:
+        with open(path) as f:
+            sources.append(f.read())
+    results = compile_many(sources, jobs, **options)
+    for path, result in zip(paths, results):
+        if result.ok:
+            with open(output_path(path, directory), 'w') as f:
+                f.write(result.asm + '\n')
+        yield result.error
+
+
+def compile_files(argv=None):
+    # python main.py [-O N] [--target T] [-j N] [-o DIR] [--stream] FILE...
+    # Compiles every file to a .asm file next to it, or in DIR, using a
+    # process per CPU. --stream instead compiles them one by one with
+    # memory that does not grow with their size. Returns the exit status:
+    # 1 if any file failed.
+    arguments = argparse.ArgumentParser(description="Compile source files to NASM assembly.")
+    arguments.add_argument('files', nargs='+', metavar='FILE')
+    arguments.add_argument('-O', dest='opt_level', type=int, choices=(0, 1, 2), default=0,
+                           help="optimization level")
+    arguments.add_argument('--target', choices=sorted(TARGETS), default='x86')
+    arguments.add_argument('-j', '--jobs', type=int, default=None,
+                           help="worker processes (default: one per CPU)")
+    arguments.add_argument('-o', '--output-dir', help="directory for the .asm files")
+    arguments.add_argument('--stream', action='store_true',
+                           help="compile each file while reading it, in bounded memory")
+    args = arguments.parse_args(argv)
+
+    if args.stream:
+        errors = stream_files(args.files, args.output_dir, opt_level=args.opt_level, target=args.target)
+    else:
+        errors = compile_in_batch(args.files, args.output_dir, args.jobs,
+                                  opt_level=args.opt_level, target=args.target)
+    failed = 0
+    for path, error in zip(args.files, errors):
+        if error is not None:
+            print(f"{path}: {error}", file=sys.stderr)
+            failed += 1
+    if failed:
+        print(f"{failed} of {len(args.files)} files failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(compile_files())
     run_tests()
\ No newline at end of file
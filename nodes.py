@@ -0,0 +1,179 @@
+class Node:
+    # kind is the name used to dispatch to analyze_<kind> / generate_tac_<kind>.
+    __slots__ = ('lineno',)
+    kind = None
+    fields = ()
+
+    def __repr__(self):
+        args = ', '.join(repr(getattr(self, field)) for field in self.fields)
+        return f"{type(self).__name__}({args})"
+
+
+class Program(Node):
+    __slots__ = ('statements',)
+    kind = 'program'
+    fields = __slots__
+
+    def __init__(self, statements, lineno=0):
+        self.statements = statements
+        self.lineno = lineno
+
+
+class Declaration(Node):
+    __slots__ = ('type', 'name')
+    kind = 'declaration'
+    fields = __slots__
+
+    def __init__(self, type, name, lineno=0):
+        self.type = type
+        self.name = name
+        self.lineno = lineno
+
+
+class DeclarationAssign(Node):
+    __slots__ = ('type', 'name', 'expr')
+    kind = 'declaration_assign'
+    fields = __slots__
+
+    def __init__(self, type, name, expr, lineno=0):
+        self.type = type
+        self.name = name
+        self.expr = expr
+        self.lineno = lineno
+
+
+class Assign(Node):
+    __slots__ = ('name', 'expr')
+    kind = 'assign'
+    fields = __slots__
+
+    def __init__(self, name, expr, lineno=0):
+        self.name = name
+        self.expr = expr
+        self.lineno = lineno
+
+
+class Increment(Node):
+    __slots__ = ('name',)
+    kind = 'increment'
+    fields = __slots__
+
+    def __init__(self, name, lineno=0):
+        self.name = name
+        self.lineno = lineno
+
+
+class Decrement(Node):
+    __slots__ = ('name',)
+    kind = 'decrement'
+    fields = __slots__
+
+    def __init__(self, name, lineno=0):
+        self.name = name
+        self.lineno = lineno
+
+
+class If(Node):
+    __slots__ = ('condition', 'body')
+    kind = 'if'
+    fields = __slots__
+
+    def __init__(self, condition, body, lineno=0):
+        self.condition = condition
+        self.body = body
+        self.lineno = lineno
+
+
+class IfElse(Node):
+    __slots__ = ('condition', 'body', 'else_body')
+    kind = 'if_else'
+    fields = __slots__
+
+    def __init__(self, condition, body, else_body, lineno=0):
+        self.condition = condition
+        self.body = body
+        self.else_body = else_body
+        self.lineno = lineno
+
+
+class For(Node):
+    __slots__ = ('init', 'condition', 'step', 'body')
+    kind = 'for'
+    fields = __slots__
+
+    def __init__(self, init, condition, step, body, lineno=0):
+        self.init = init
+        self.condition = condition
+        self.step = step
+        self.body = body
+        self.lineno = lineno
+
+
+class Block(Node):
+    __slots__ = ('statements',)
+    kind = 'block'
+    fields = __slots__
+
+    def __init__(self, statements, lineno=0):
+        self.statements = statements
+        self.lineno = lineno
+
+
+class BinOp(Node):
+    __slots__ = ('op', 'left', 'right')
+    kind = 'binop'
+    fields = __slots__
+
+    def __init__(self, op, left, right, lineno=0):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.lineno = lineno
+
+
+class UMinus(Node):
+    __slots__ = ('operand',)
+    kind = 'uminus'
+    fields = __slots__
+
+    def __init__(self, operand, lineno=0):
+        self.operand = operand
+        self.lineno = lineno
+
+
+class Id(Node):
+    __slots__ = ('name',)
+    kind = 'id'
+    fields = __slots__
+
+    def __init__(self, name, lineno=0):
+        self.name = name
+        self.lineno = lineno
+
+
+class Const(Node):
+    __slots__ = ('value',)
+    kind = 'const'
+    fields = __slots__
+
+    def __init__(self, value, lineno=0):
+        self.value = value
+        self.lineno = lineno
+
+
+class Condition(Node):
+    __slots__ = ('op', 'left', 'right')
+    kind = 'condition'
+    fields = __slots__
+
+    def __init__(self, op, left, right, lineno=0):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.lineno = lineno
+
+
+NODE_TYPES = (
+    Program, Declaration, DeclarationAssign, Assign, Increment, Decrement,
+    If, IfElse, For, Block, BinOp, UMinus, Id, Const, Condition,
+)
@@ -0,0 +1,864 @@
+from bisect import bisect_left
+
+from cfg import ControlFlowGraph
+from regalloc import live_intervals
+from tac import (Instr, is_temporary, is_constant,
+                 ASSIGN, ADD, SUB, MUL, DIV, MOD, MOV, INC, DEC, IF, GOTO, LABEL)
+
+INT_MIN = -2 ** 31
+
+RELATIONS = {
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+}
+
+# Relation that holds after swapping the operands of a comparison.
+SWAPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '==': '==', '!=': '!='}
+
+# Relation that holds exactly when the original does not.
+NEGATED = {'<': '>=', '<=': '>', '>': '<=', '>=': '<', '==': '!=', '!=': '=='}
+
+ARITHMETIC = (ADD, SUB, MUL, DIV, MOD)
+PURE_DEFINITIONS = (ASSIGN,) + ARITHMETIC
+DEFINITIONS = PURE_DEFINITIONS + (MOV, INC, DEC)
+COMMUTATIVE = (ADD, MUL)
+
+# Instructions a rotated loop test may duplicate.
+MAX_ROTATED_TEST = 8
+
+
+def wrap32(value):
+    return (value - INT_MIN) % 2 ** 32 + INT_MIN
+
+
+def evaluate(op, a, b):
+    # Integer arithmetic with the target's semantics: 32-bit wraparound and
+    # C division, which truncates toward zero. Returns None when the result
+    # cannot be computed at compile time.
+    if type(a) is not int or type(b) is not int:
+        return None
+    if op == ADD:
+        return wrap32(a + b)
+    if op == SUB:
+        return wrap32(a - b)
+    if op == MUL:
+        return wrap32(a * b)
+    if b == 0:
+        return None
+    quotient = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        quotient = -quotient
+    if op == DIV:
+        return wrap32(quotient)
+    return wrap32(a - b * quotient)
+
+
+def label_runs(code):
+    # The position of every label, and for every index the first instruction
+    # at or after it that is not a label.
+    positions = {}
+    ends = [len(code)] * (len(code) + 1)
+    for i in range(len(code) - 1, -1, -1):
+        if code[i].op == LABEL:
+            positions[code[i].dest] = i
+            ends[i] = ends[i + 1]
+        else:
+            ends[i] = i
+    return positions, ends
+
+
+def in_label_run(label, i, positions, ends):
+    # Whether control reaching index i falls straight through to label.
+    return i <= positions.get(label, -1) < ends[i]
+
+
+def innermost_loops(graph, loops):
+    # The innermost loop around every block, or None, by block index.
+    innermost = []
+    enclosing = []
+    pending = iter(loops)
+    loop = next(pending, None)
+    for block in graph.blocks:
+        while enclosing and not enclosing[-1].contains(block):
+            enclosing.pop()
+        while loop is not None and loop.header is block:
+            enclosing.append(loop)
+            loop = next(pending, None)
+        innermost.append(enclosing[-1] if enclosing else None)
+    return innermost
+
+
+def defined_in(positions, loop):
+    # Whether a sorted list of block indexes has one inside the loop.
+    i = bisect_left(positions, loop.header.index)
+    return i < len(positions) and positions[i] <= loop.latch.index
+
+
+def with_preheaders(graph, preheaders, extra=None):
+    # The code of the graph with each loop's preheader instructions placed
+    # just before its header, and extra[instr] placed after an instruction.
+    code = []
+    for block in graph.blocks:
+        code.extend(preheaders.get(block.index, ()))
+        for instr in block.instructions:
+            code.append(instr)
+            if extra and instr in extra:
+                code.extend(extra[instr])
+    return code
+
+
+class Optimizer:
+
+    def __init__(self, level=1, codegen=None, trace=None, live_at_exit=None, registers=6):
+        # live_at_exit names the variables whose final values are observed
+        # after the program ends. None means every variable except the
+        # renamed storage of shadowing declarations, which is out of scope
+        # by then. registers is the number the target allocates temporaries
+        # to, which bounds how many variables a loop keeps in them.
+        self.level = level
+        self.codegen = codegen
+        self.trace = trace
+        self.live_at_exit = live_at_exit
+        self.registers = registers
+        self.stats = {}
+        self.removed = 0
+
+    def count(self, name, amount=1):
+        self.stats[name] = self.stats.get(name, 0) + amount
+
+    def optimize(self, code):
+        self.stats = {}
+        size = len(code)
+        if self.level >= 1:
+            code = self.fold_constants(code)
+            code = self.remove_dead_temps(code)
+            code = self.optimize_jumps(code)
+            # Branch layout merges blocks, which gives the local passes
+            # longer stretches of straight-line code to work on.
+            code = self.fold_constants(code)
+            code = self.number_values(code)
+            code = self.remove_dead_temps(code)
+        if self.level >= 2:
+            code = self.hoist_invariants(code)
+            code = self.reduce_strength(code)
+            code = self.number_values(code)
+            code = self.fold_constants(code)
+            code = self.remove_dead_temps(code)
+            code = self.promote_variables(code)
+            code = self.number_values(code)
+            code = self.remove_dead_temps(code)
+            code = self.eliminate_dead_code(code)
+        if self.level >= 1:
+            code = self.optimize_jumps(code)
+        self.removed = size - len(code)
+        if self.trace is not None:
+            for name, amount in self.stats.items():
+                self.trace.event('optimizer', "Optimizer: {} x{}", name, amount)
+        return code
+
+    def fold_constants(self, code):
+        # Constant folding and propagation within straight-line code. The
+        # known values are dropped at every label, where control flow from
+        # elsewhere may join, except those of temporaries defined only once:
+        # their definition comes before every use.
+        definitions = {}
+        for instr in code:
+            if is_temporary(instr.dest) and instr.op in DEFINITIONS:
+                definitions[instr.dest] = definitions.get(instr.dest, 0) + 1
+        known = {}
+        constant_temps = {}
+        optimized = []
+        for instr in code:
+            op = instr.op
+            if op == LABEL:
+                known.clear()
+                optimized.append(instr)
+                continue
+            if op == GOTO:
+                optimized.append(instr)
+                continue
+
+            a = instr.a
+            if isinstance(a, str):
+                a = known.get(a, constant_temps.get(a, a))
+            b = instr.b
+            if isinstance(b, str):
+                b = known.get(b, constant_temps.get(b, b))
+            if a is not instr.a or b is not instr.b:
+                self.count('constants propagated', (a is not instr.a) + (b is not instr.b))
+
+            if op == IF:
+                if is_constant(a) and is_constant(b):
+                    self.count('branches folded')
+                    if RELATIONS[instr.rel](a, b):
+                        optimized.append(Instr(GOTO, instr.dest))
+                    continue
+                if is_constant(a):
+                    optimized.append(Instr(IF, instr.dest, b, a, SWAPPED[instr.rel]))
+                else:
+                    optimized.append(Instr(IF, instr.dest, a, b, instr.rel))
+                continue
+
+            if op in ARITHMETIC:
+                instr = self.simplify(Instr(op, instr.dest, a, b))
+            elif op in (INC, DEC):
+                if is_constant(a) and is_constant(b):
+                    value = evaluate(ADD if op == INC else SUB, a, b)
+                    if value is not None:
+                        self.count('constants folded')
+                        instr = Instr(MOV, instr.dest, value)
+                    else:
+                        instr = Instr(op, instr.dest, instr.dest, b)
+                else:
+                    instr = Instr(op, instr.dest, instr.dest, b)
+            else:
+                instr = Instr(op, instr.dest, a)
+
+            if instr.op in (ASSIGN, MOV) and is_constant(instr.a):
+                known[instr.dest] = instr.a
+                if definitions.get(instr.dest) == 1:
+                    constant_temps[instr.dest] = instr.a
+            else:
+                known.pop(instr.dest, None)
+            optimized.append(instr)
+        return optimized
+
+    def simplify(self, instr):
+        op, a, b = instr.op, instr.a, instr.b
+        value = evaluate(op, a, b)
+        if value is not None:
+            self.count('constants folded')
+            return Instr(ASSIGN, instr.dest, value)
+
+        result = None
+        if op == ADD:
+            if b == 0 and type(b) is int:
+                result = a
+            elif a == 0 and type(a) is int:
+                result = b
+        elif op == SUB:
+            if b == 0 and type(b) is int:
+                result = a
+        elif op == MUL:
+            if (b == 0 and type(b) is int) or (a == 0 and type(a) is int):
+                result = 0
+            elif b == 1 and type(b) is int:
+                result = a
+            elif a == 1 and type(a) is int:
+                result = b
+        elif op == DIV:
+            if b == 1 and type(b) is int:
+                result = a
+        elif op == MOD:
+            if b == 1 and type(b) is int:
+                result = 0
+
+        if result is None:
+            return instr
+        self.count('identities simplified')
+        return Instr(ASSIGN, instr.dest, result)
+
+    def number_values(self, code):
+        # Local value numbering with copy propagation. Within straight-line
+        # code every name is mapped to the number of the value it holds, and
+        # every computed expression to the number of its result. A load of a
+        # value some temporary already holds, or a recomputation of a known
+        # expression, becomes a copy of that temporary, and uses of a copy
+        # read the original instead. The copies are left for the dead
+        # temporary sweep. Everything is forgotten at labels.
+        value_of = {}
+        expressions = {}
+        holders = {}
+        numbered = []
+
+        def number(operand):
+            if not isinstance(operand, str):
+                return ('const', operand)
+            value = value_of.get(operand)
+            if value is None:
+                value = value_of[operand] = len(holders)
+                holders[value] = [operand]
+            return value
+
+        def holding(value):
+            for name in holders.get(value, ()):
+                if is_temporary(name) and value_of.get(name) == value:
+                    return name
+            return None
+
+        def define(name, value):
+            value_of[name] = value
+            holders.setdefault(value, []).append(name)
+
+        def use(operand):
+            value = number(operand)
+            if type(value) is tuple:
+                return value[1]
+            name = holding(value)
+            if name is None or name == operand:
+                return operand
+            if is_temporary(operand):
+                self.count('copies propagated')
+            else:
+                self.count('redundant loads removed')
+            return name
+
+        for instr in code:
+            op = instr.op
+            if op == LABEL:
+                value_of.clear()
+                expressions.clear()
+                holders.clear()
+                numbered.append(instr)
+                continue
+            if op == GOTO:
+                numbered.append(instr)
+                continue
+
+            a = use(instr.a) if instr.a is not None else None
+            b = use(instr.b) if instr.b is not None else None
+            if op == IF:
+                numbered.append(Instr(IF, instr.dest, a, b, instr.rel))
+                continue
+            if op == ASSIGN or op == MOV:
+                define(instr.dest, number(a))
+                numbered.append(Instr(op, instr.dest, a))
+                continue
+
+            # ADD/SUB dest, a, b reads the variable it updates.
+            key_op = ADD if op == INC else SUB if op == DEC else op
+            operands = (number(a), number(b))
+            if key_op in COMMUTATIVE:
+                operands = tuple(sorted(operands, key=repr))
+            key = (key_op,) + operands
+            value = expressions.get(key)
+            if value is not None and op in ARITHMETIC and holding(value) is not None:
+                self.count('common subexpressions removed')
+                numbered.append(Instr(ASSIGN, instr.dest, holding(value)))
+            else:
+                if value is None:
+                    value = expressions[key] = len(holders)
+                    holders[value] = []
+                if op in COMMUTATIVE and is_constant(a) and not is_constant(b):
+                    a, b = b, a
+                numbered.append(Instr(op, instr.dest, a, b))
+            define(instr.dest, value)
+        return numbered
+
+    def remove_dead_temps(self, code):
+        # Temporaries have no other observers, so a definition nobody reads
+        # can go. Walking backwards lets a removal free the operands it used.
+        uses = {}
+        for instr in code:
+            for operand in (instr.a, instr.b):
+                if is_temporary(operand):
+                    uses[operand] = uses.get(operand, 0) + 1
+
+        kept = []
+        for instr in reversed(code):
+            if instr.op in PURE_DEFINITIONS and is_temporary(instr.dest) and not uses.get(instr.dest):
+                self.count('dead temporaries removed')
+                for operand in (instr.a, instr.b):
+                    if is_temporary(operand):
+                        uses[operand] -= 1
+                continue
+            kept.append(instr)
+        kept.reverse()
+        return kept
+
+    def eliminate_dead_code(self, code):
+        # Dead-store and unreachable-code elimination driven by liveness over
+        # the control-flow graph. Blocks the entry cannot reach are dropped;
+        # a definition of a temporary or a store to a variable that is not
+        # live afterwards is removed. Removing one can make the values it
+        # read dead in turn, so this repeats until nothing changes.
+        live_at_exit = self.live_at_exit
+        if live_at_exit is None:
+            live_at_exit = set()
+            for instr in code:
+                if instr.op in (MOV, INC, DEC):
+                    live_at_exit.add(instr.dest)
+                if instr.op not in (LABEL, GOTO):
+                    for operand in (instr.a, instr.b):
+                        if isinstance(operand, str) and not is_temporary(operand):
+                            live_at_exit.add(operand)
+            live_at_exit = {name for name in live_at_exit if '@' not in name}
+
+        new_label = self.codegen.new_label if self.codegen is not None else None
+        while True:
+            graph = ControlFlowGraph(code)
+            reachable = graph.reverse_postorder()
+            unreachable = len(graph.blocks) - len(reachable)
+            if unreachable:
+                indexes = {block.index for block in reachable}
+                for block in graph.blocks:
+                    if block.index not in indexes and block.instructions:
+                        self.count('unreachable instructions removed', len(block.instructions))
+
+            _, live_out = graph.liveness(live_at_exit)
+            removed = 0
+            for block in reachable:
+                live = set(live_out[block.index])
+                kept = []
+                for instr in reversed(block.instructions):
+                    op = instr.op
+                    if op in DEFINITIONS and instr.dest not in live:
+                        self.count('dead temporaries removed' if is_temporary(instr.dest) else 'dead stores removed')
+                        removed += 1
+                        continue
+                    if op != LABEL and op != GOTO:
+                        if op != IF:
+                            live.discard(instr.dest)
+                        for operand in (instr.a, instr.b):
+                            if isinstance(operand, str):
+                                live.add(operand)
+                    kept.append(instr)
+                kept.reverse()
+                block.instructions = kept
+
+            if not removed and not unreachable:
+                return code
+            code = graph.to_tac(sorted(reachable, key=lambda block: block.index), new_label)
+            if not removed:
+                return code
+
+    def hoist_invariants(self, code):
+        # Loop-invariant code motion. A temporary computed from constants,
+        # from names no instruction in the loop defines, or from temporaries
+        # already hoisted out of it, has the same value on every iteration;
+        # its one definition moves to the loop's preheader, out of as many
+        # enclosing loops as it is invariant in. Only divisions by constants
+        # that cannot trap move, as the loop may not have run them at all.
+        graph = ControlFlowGraph(code)
+        loops = graph.find_loops()
+        if not loops:
+            return code
+        innermost = innermost_loops(graph, loops)
+        defs = {}
+        for block in graph.blocks:
+            for instr in block.instructions:
+                if instr.op in DEFINITIONS:
+                    defs.setdefault(instr.dest, []).append(block.index)
+
+        hoisted = {}
+
+        def invariant(operand, loop):
+            if not isinstance(operand, str):
+                return True
+            target = hoisted.get(operand)
+            if target is not None:
+                return target.header.index <= loop.header.index and loop.latch.index <= target.latch.index
+            return not defined_in(defs.get(operand, ()), loop)
+
+        preheaders = {}
+        for block in graph.blocks:
+            loop = innermost[block.index]
+            if loop is None:
+                continue
+            kept = []
+            for instr in block.instructions:
+                op = instr.op
+                target = None
+                if (op in PURE_DEFINITIONS and is_temporary(instr.dest) and len(defs[instr.dest]) == 1
+                        and not (op == ASSIGN and is_constant(instr.a))
+                        and not (op in (DIV, MOD) and (type(instr.b) is not int or instr.b in (0, -1)))):
+                    while loop is not None and invariant(instr.a, loop) and invariant(instr.b, loop):
+                        target = loop
+                        loop = loop.parent
+                    loop = innermost[block.index]
+                if target is None:
+                    kept.append(instr)
+                    continue
+                self.count('loop invariants hoisted')
+                hoisted[instr.dest] = target
+                preheaders.setdefault(target.header.index, []).append(instr)
+            block.instructions = kept
+        if not hoisted:
+            return code
+        return with_preheaders(graph, preheaders)
+
+    def reduce_strength(self, code):
+        # Induction-variable strength reduction. A variable whose only
+        # definitions in a loop step it by constants is an induction
+        # variable of the loop, and its product with a constant can be kept
+        # in a temporary that is set in the preheader and stepped alongside
+        # it, replacing the multiplication with an addition.
+        if self.codegen is None:
+            return code
+        graph = ControlFlowGraph(code)
+        loops = graph.find_loops()
+        if not loops:
+            return code
+        innermost = innermost_loops(graph, loops)
+
+        # Block indexes of the steps and of the other definitions of every
+        # variable. A step is ADD/SUB v, a, c where a holds v's value.
+        steps = {}
+        others = {}
+        for block in graph.blocks:
+            loaded = {}
+            for instr in block.instructions:
+                op = instr.op
+                if op not in DEFINITIONS:
+                    continue
+                dest = instr.dest
+                if is_temporary(dest):
+                    if op == ASSIGN and isinstance(instr.a, str) and not is_temporary(instr.a):
+                        loaded[dest] = instr.a
+                    continue
+                if (op in (INC, DEC) and type(instr.b) is int
+                        and (instr.a == dest or loaded.get(instr.a) == dest)):
+                    steps.setdefault(dest, []).append(block.index)
+                else:
+                    others.setdefault(dest, []).append(block.index)
+                loaded = {temp: var for temp, var in loaded.items() if var != dest}
+
+        preheaders = {}
+        accumulators = {}
+        by_loop = {}
+        for block in graph.blocks:
+            loop = innermost[block.index]
+            if loop is None:
+                continue
+            loaded = {}
+            for i, instr in enumerate(block.instructions):
+                op = instr.op
+                if op not in DEFINITIONS:
+                    continue
+                dest = instr.dest
+                if not is_temporary(dest):
+                    loaded = {temp: var for temp, var in loaded.items() if var != dest}
+                    continue
+                if op == ASSIGN and isinstance(instr.a, str) and not is_temporary(instr.a):
+                    loaded[dest] = instr.a
+                    continue
+                if op != MUL or type(instr.b) is not int or instr.a not in loaded:
+                    continue
+                var = loaded[instr.a]
+                if not defined_in(steps.get(var, ()), loop) or defined_in(others.get(var, ()), loop):
+                    continue
+                key = (loop.header.index, var, instr.b)
+                accumulator = accumulators.get(key)
+                if accumulator is None:
+                    accumulator = accumulators[key] = self.codegen.new_temp()
+                    value = self.codegen.new_temp()
+                    preheaders.setdefault(loop.header.index, []).extend(
+                        [Instr(ASSIGN, value, var), Instr(MUL, accumulator, value, instr.b)])
+                    by_loop.setdefault((loop.header.index, var), []).append((instr.b, accumulator))
+                self.count('multiplications strength-reduced')
+                block.instructions[i] = Instr(ASSIGN, dest, accumulator)
+        if not accumulators:
+            return code
+
+        # A step updates the accumulators of the loops around it, found by
+        # walking out from its innermost loop, so a variable that is the
+        # counter of many loops costs nothing extra per step.
+        updates = {}
+        for block in graph.blocks:
+            for instr in block.instructions:
+                if instr.op not in (INC, DEC):
+                    continue
+                loop = innermost[block.index]
+                while loop is not None:
+                    for factor, accumulator in by_loop.get((loop.header.index, instr.dest), ()):
+                        step = Instr(ADD if instr.op == INC else SUB, accumulator, accumulator,
+                                     wrap32(factor * instr.b))
+                        updates.setdefault(instr, []).append(step)
+                    loop = loop.parent
+        return with_preheaders(graph, preheaders, updates)
+
+    def promote_variables(self, code):
+        # Register promotion for innermost loops. The variables a loop uses
+        # most are copied into temporaries in its preheader, the loop works
+        # on the temporaries, and the ones it changed are stored back where
+        # it exits, so they stay in registers for the whole loop. A loop
+        # only takes as many as the registers its own temporaries leave
+        # free, and only when every exit leads to the block after it.
+        if self.codegen is None:
+            return code
+        graph = ControlFlowGraph(code)
+        loops = graph.find_loops()
+        if not loops:
+            return code
+
+        # The number of registers taken at each instruction. A temporary
+        # whose interval ends at an instruction can share a register with
+        # one starting there.
+        pressure = [0] * (len(code) + 1)
+        for start, end in live_intervals(code).values():
+            pressure[start] += 1
+            pressure[end] -= 1
+        for i in range(1, len(pressure)):
+            pressure[i] += pressure[i - 1]
+        starts = []
+        position = 0
+        for block in graph.blocks:
+            starts.append(position)
+            position += len(block.instructions)
+
+        inner = {loop.header.index for loop in loops}
+        inner.difference_update(loop.parent.header.index for loop in loops if loop.parent is not None)
+        preheaders = {}
+        entry_stores = {}
+        tail_stores = {}
+        promoted = {}
+        for loop in loops:
+            if loop.header.index not in inner:
+                continue
+            blocks = graph.blocks[loop.header.index:loop.latch.index + 1]
+            after = graph.blocks[loop.latch.index + 1]
+            edges = [(block, succ) for block in blocks for succ in block.succs if not loop.contains(succ)]
+            if any(succ is not after for _, succ in edges):
+                continue
+            # The stores go at the top of the block after the loop when only
+            # the loop reaches it, or else at the end of a latch that falls
+            # into it as the only way out.
+            if all(loop.contains(pred) for pred in after.preds):
+                exits = entry_stores.setdefault(after.index, [])
+            elif (len(edges) == 1 and edges[0][0] is loop.latch and loop.latch.falls_through
+                    and (loop.latch.terminator is None or loop.latch.terminator.dest != after.label)):
+                exits = tail_stores.setdefault(loop.latch.index, [])
+            else:
+                continue
+
+            references = {}
+            stored = set()
+            divides = False
+            for block in blocks:
+                for instr in block.instructions:
+                    op = instr.op
+                    if op == LABEL or op == GOTO:
+                        continue
+                    divides = divides or op == DIV or op == MOD
+                    if op in (MOV, INC, DEC):
+                        references[instr.dest] = references.get(instr.dest, 0) + 1
+                        stored.add(instr.dest)
+                    for operand in (instr.a, instr.b):
+                        if isinstance(operand, str) and not is_temporary(operand):
+                            references[operand] = references.get(operand, 0) + 1
+            first = starts[loop.header.index]
+            last = starts[loop.latch.index] + len(loop.latch.instructions)
+            free = self.registers - max(pressure[first:last], default=0)
+            if divides:
+                free -= 2
+            chosen = sorted(references, key=lambda name: (-references[name], name))[:max(free, 0)]
+            if not chosen:
+                continue
+
+            names = {}
+            for var in chosen:
+                names[var] = self.codegen.new_temp()
+                preheaders.setdefault(loop.header.index, []).append(Instr(ASSIGN, names[var], var))
+                if var in stored:
+                    exits.append(Instr(MOV, var, names[var]))
+            for block in blocks:
+                promoted[block.index] = names
+            self.count('variables promoted to registers', len(chosen))
+        if not promoted:
+            return code
+
+        uses = {}
+        for instr in code:
+            for operand in (instr.a, instr.b):
+                if is_temporary(operand):
+                    uses[operand] = uses.get(operand, 0) + 1
+        result = []
+        for block in graph.blocks:
+            result.extend(preheaders.get(block.index, ()))
+            instructions = block.instructions
+            names = promoted.get(block.index)
+            if names is not None:
+                instructions = []
+                for instr in block.instructions:
+                    renamed = self.rename_variables(instr, names)
+                    previous = instructions[-1] if instructions else None
+                    # t = a + b; MOV v, t  ->  v' = a + b
+                    if (instr.op == MOV and renamed.op == ASSIGN and uses.get(renamed.a) == 1
+                            and previous is not None and previous.op in PURE_DEFINITIONS
+                            and previous.dest == renamed.a):
+                        instructions[-1] = Instr(previous.op, renamed.dest, previous.a, previous.b)
+                        continue
+                    instructions.append(renamed)
+            stores = entry_stores.get(block.index, ())
+            if stores and block.label is not None:
+                result.append(instructions[0])
+                instructions = instructions[1:]
+            result.extend(stores)
+            result.extend(instructions)
+            result.extend(tail_stores.get(block.index, ()))
+        return result
+
+    def rename_variables(self, instr, names):
+        op = instr.op
+        if op == LABEL or op == GOTO:
+            return instr
+        a = names.get(instr.a, instr.a) if isinstance(instr.a, str) else instr.a
+        b = names.get(instr.b, instr.b) if isinstance(instr.b, str) else instr.b
+        dest = instr.dest
+        if op in (MOV, INC, DEC) and dest in names:
+            if op == MOV:
+                return Instr(ASSIGN, names[dest], a)
+            return Instr(ADD if op == INC else SUB, names[dest], a, b)
+        if a is instr.a and b is instr.b:
+            return instr
+        return Instr(op, dest, a, b, instr.rel)
+
+    def optimize_jumps(self, code):
+        # Branch layout for the if/for lowering: a conditional jump over an
+        # unconditional one becomes a single inverted jump, and loops are
+        # rotated so each iteration ends in one conditional backward jump
+        # instead of a test at the top and a GOTO at the bottom.
+        for _ in range(4):
+            before = dict(self.stats)
+            code = self.thread_jumps(code)
+            code = self.invert_branches(code)
+            code = self.rotate_loops(code)
+            code = self.remove_redundant_jumps(code)
+            code = self.remove_unused_labels(code)
+            if self.stats == before:
+                break
+        return code
+
+    def thread_jumps(self, code):
+        # Retarget jumps that land on a GOTO to that GOTO's destination, and
+        # name each run of adjacent labels by its first label.
+        _, ends = label_runs(code)
+        canonical = {}
+        forward = {}
+        run = None
+        for i, instr in enumerate(code):
+            if instr.op != LABEL:
+                run = None
+                continue
+            if run is None:
+                run = instr.dest
+            canonical[instr.dest] = run
+            j = ends[i]
+            if j < len(code) and code[j].op == GOTO:
+                forward[instr.dest] = code[j].dest
+
+        def resolve(label):
+            seen = set()
+            while label in forward and label not in seen:
+                seen.add(label)
+                label = forward[label]
+            return canonical.get(label, label)
+
+        threaded = []
+        for instr in code:
+            if instr.op in (GOTO, IF):
+                target = resolve(instr.dest)
+                if target != instr.dest:
+                    if forward.get(instr.dest) is not None:
+                        self.count('jumps threaded')
+                    instr = Instr(instr.op, target, instr.a, instr.b, instr.rel)
+            threaded.append(instr)
+        return threaded
+
+    def invert_branches(self, code):
+        # IF c GOTO L1; GOTO L2; L1:  ->  IF !c GOTO L2; L1:
+        positions, ends = label_runs(code)
+        inverted = []
+        i = 0
+        while i < len(code):
+            instr = code[i]
+            if (instr.op == IF and i + 2 < len(code) and code[i + 1].op == GOTO
+                    and in_label_run(instr.dest, i + 2, positions, ends)):
+                self.count('branches inverted')
+                inverted.append(Instr(IF, code[i + 1].dest, instr.a, instr.b, NEGATED[instr.rel]))
+                i += 2
+                continue
+            inverted.append(instr)
+            i += 1
+        return inverted
+
+    def rotate_loops(self, code):
+        # A loop lowered as
+        #     Lh: <test> IF !c GOTO Lx; <body> GOTO Lh; Lx:
+        # becomes
+        #     <test> IF !c GOTO Lx; Lb: <body> <test'> IF c GOTO Lb; Lx:
+        # where <test'> is a copy of the side-effect-free test with fresh
+        # temporaries. The test at the top only runs on entry.
+        if self.codegen is None:
+            return code
+        positions, ends = label_runs(code)
+        uses = {}
+        for instr in code:
+            for operand in (instr.a, instr.b):
+                if is_temporary(operand):
+                    uses[operand] = uses.get(operand, 0) + 1
+
+        body_labels = {}
+        replacements = {}
+        for i, instr in enumerate(code):
+            if instr.op != GOTO or positions.get(instr.dest, i) >= i:
+                continue
+            start = positions[instr.dest] + 1
+            end = start
+            while (end < i and code[end].op in PURE_DEFINITIONS and is_temporary(code[end].dest)
+                   and end - start < MAX_ROTATED_TEST):
+                end += 1
+            test = code[end]
+            if test.op != IF or end + 1 >= i or not in_label_run(test.dest, i + 1, positions, ends):
+                continue
+            local = {}
+            for test_instr in code[start:end + 1]:
+                for operand in (test_instr.a, test_instr.b):
+                    if is_temporary(operand):
+                        local[operand] = local.get(operand, 0) + 1
+            if any(uses.get(temp) != count for temp, count in local.items()):
+                continue
+
+            if code[end + 1].op == LABEL:
+                body = code[end + 1].dest
+            else:
+                body = body_labels.get(end + 1) or self.codegen.new_label()
+                body_labels[end + 1] = body
+            renamed = {}
+            copy = []
+            for test_instr in code[start:end]:
+                a = renamed.get(test_instr.a, test_instr.a)
+                b = renamed.get(test_instr.b, test_instr.b)
+                renamed[test_instr.dest] = self.codegen.new_temp()
+                copy.append(Instr(test_instr.op, renamed[test_instr.dest], a, b))
+            copy.append(Instr(IF, body, renamed.get(test.a, test.a), renamed.get(test.b, test.b),
+                              NEGATED[test.rel]))
+            replacements[i] = copy
+            self.count('loops rotated')
+
+        if not replacements:
+            return code
+        rotated = []
+        for i, instr in enumerate(code):
+            if i in body_labels:
+                rotated.append(Instr(LABEL, body_labels[i]))
+            if i in replacements:
+                rotated.extend(replacements[i])
+            else:
+                rotated.append(instr)
+        return rotated
+
+    def remove_redundant_jumps(self, code):
+        # A jump to a label that immediately follows it goes nowhere.
+        positions, ends = label_runs(code)
+        kept = []
+        for i, instr in enumerate(code):
+            if instr.op in (GOTO, IF) and in_label_run(instr.dest, i + 1, positions, ends):
+                self.count('redundant jumps removed')
+                continue
+            kept.append(instr)
+        return kept
+
+    def remove_unused_labels(self, code):
+        targets = {instr.dest for instr in code if instr.op in (GOTO, IF)}
+        kept = []
+        for instr in code:
+            if instr.op == LABEL and instr.dest not in targets:
+                self.count('unused labels removed')
+                continue
+            kept.append(instr)
+        return kept
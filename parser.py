@@ -1,5 +1,15 @@
+import copy
+
 import ply.yacc as yacc
 from lexer import Lexer
+from nodes import (Program, Declaration, DeclarationAssign, Assign, Increment, Decrement,
+                   If, IfElse, For, Block, BinOp, UMinus, Id, Const, Condition)
+
+
+# Parser built by the first optimized build in this process. Its tables are
+# shared by later builds, which only rebind the grammar actions.
+_prebuilt = None
+
 
 class SyntaxErrorFound(Exception):
     pass
@@ -7,8 +17,9 @@ class SyntaxErrorFound(Exception):
 
 class Parser:
     
-    def __init__(self, codegen):
+    def __init__(self, codegen, trace=None):
         self.codegen = codegen
+        self.trace = trace
         self.tokens = Lexer.tokens
         self.precedence = (
             ('left', 'PLUS', 'MINUS'),
@@ -18,17 +29,21 @@ class Parser:
     
     def p_program(self, p):
         'program : statement_list'
-        print("Parsing: program -> statement_list")
-        p[0] = ('program', p[1])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: program -> statement_list")
+        p[0] = Program(p[1], p[1][0].lineno)
     
     def p_statement_list(self, p):
         '''statement_list : statement_list statement
                          | statement'''
         if len(p) == 3:
-            print("Parsing: statement_list -> statement_list statement")
-            p[0] = p[1] + [p[2]]
+            if self.trace is not None:
+                self.trace.event('parser', "Parsing: statement_list -> statement_list statement")
+            p[1].append(p[2])
+            p[0] = p[1]
         else:
-            print("Parsing: statement_list -> statement")
+            if self.trace is not None:
+                self.trace.event('parser', "Parsing: statement_list -> statement")
             p[0] = [p[1]]
     
     def p_statement(self, p):
@@ -39,17 +54,17 @@ class Parser:
                     | declaration
                     | increment_statement
                     | decrement_statement'''
-        stmt_type = p[1][0] if isinstance(p[1], tuple) else 'unknown'
-        print(f"Parsing: statement -> {stmt_type}")
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: statement -> {}", p[1].kind)
         p[0] = p[1]
 
     def p_increment_statement(self, p):
         'increment_statement : ID INCREMENT SEMICOLON'
-        p[0] = ('increment', p[1])
+        p[0] = Increment(p[1], p.lineno(1))
 
     def p_decrement_statement(self, p):
         'decrement_statement : ID DECREMENT SEMICOLON'
-        p[0] = ('decrement', p[1])
+        p[0] = Decrement(p[1], p.lineno(1))
     
     def p_declaration(self, p):
         '''declaration : INT ID SEMICOLON
@@ -62,31 +77,37 @@ class Parser:
                       | CHAR ID ASSIGN expression SEMICOLON
                       | DOUBLE ID ASSIGN expression SEMICOLON'''
         if len(p) == 6:
-            print(f"Parsing: declaration -> {p[1]} {p[2]} = expression")
-            p[0] = ('declaration_assign', p[1], p[2], p[4])
+            if self.trace is not None:
+                self.trace.event('parser', "Parsing: declaration -> {} {} = expression", p[1], p[2])
+            p[0] = DeclarationAssign(p[1], p[2], p[4], p.lineno(1))
         elif len(p) == 4:
-            print(f"Parsing: declaration -> {p[1]} {p[2]}")
-            p[0] = ('declaration', p[1], p[2])
+            if self.trace is not None:
+                self.trace.event('parser', "Parsing: declaration -> {} {}", p[1], p[2])
+            p[0] = Declaration(p[1], p[2], p.lineno(1))
 
     def p_assignment(self, p):
         'assignment : ID ASSIGN expression SEMICOLON'
-        print(f"Parsing: assignment -> {p[1]} = expression")
-        p[0] = ('assign', p[1], p[3])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: assignment -> {} = expression", p[1])
+        p[0] = Assign(p[1], p[3], p.lineno(1))
 
     def p_if_statement(self, p):
         '''if_statement : IF LPAREN condition RPAREN statement
                        | IF LPAREN condition RPAREN statement ELSE statement'''
         if len(p) == 8:
-            print("Parsing: if_statement -> if (condition) statement else statement")
-            p[0] = ('if_else', p[3], p[5], p[7])
+            if self.trace is not None:
+                self.trace.event('parser', "Parsing: if_statement -> if (condition) statement else statement")
+            p[0] = IfElse(p[3], p[5], p[7], p.lineno(1))
         else:
-            print("Parsing: if_statement -> if (condition) statement")
-            p[0] = ('if', p[3], p[5])
+            if self.trace is not None:
+                self.trace.event('parser', "Parsing: if_statement -> if (condition) statement")
+            p[0] = If(p[3], p[5], p.lineno(1))
 
     def p_for_statement(self, p):
         'for_statement : FOR LPAREN for_init SEMICOLON condition SEMICOLON for_increment RPAREN statement'
-        print("Parsing: for_statement -> for (for_init; condition; increment) statement")
-        p[0] = ('for', p[3], p[5], p[7], p[9])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: for_statement -> for (for_init; condition; increment) statement")
+        p[0] = For(p[3], p[5], p[7], p[9], p.lineno(1))
 
     def p_for_init(self, p):
         """for_init : assignment_no_semicolon
@@ -95,8 +116,9 @@ class Parser:
 
     def p_assignment_no_semicolon(self, p):
         'assignment_no_semicolon : ID ASSIGN expression'
-        print(f"Parsing: assignment_no_semicolon -> {p[1]} = expression")
-        p[0] = ('assign', p[1], p[3])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: assignment_no_semicolon -> {} = expression", p[1])
+        p[0] = Assign(p[1], p[3], p.lineno(1))
 
     def p_empty(self, p):
         'empty :'
@@ -107,17 +129,18 @@ class Parser:
                          | ID INCREMENT
                          | ID DECREMENT'''
         if len(p) == 4:
-            p[0] = ('assign', p[1], p[3])
+            p[0] = Assign(p[1], p[3], p.lineno(1))
         else:
             if p[2] == '++':
-                p[0] = ('increment', p[1])
+                p[0] = Increment(p[1], p.lineno(1))
             else:
-                p[0] = ('decrement', p[1])
+                p[0] = Decrement(p[1], p.lineno(1))
     
     def p_block(self, p):
         'block : LBRACE statement_list RBRACE'
-        print("Parsing: block -> { statement_list }")
-        p[0] = ('block', p[2])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: block -> {{ statement_list }}")
+        p[0] = Block(p[2], p.lineno(1))
     
     def p_expression_binop(self, p):
         '''expression : expression PLUS expression
@@ -125,28 +148,33 @@ class Parser:
                      | expression TIMES expression
                      | expression DIVIDE expression
                      | expression MODULO expression'''
-        print(f"Parsing: expression -> expression {p[2]} expression")
-        p[0] = ('binop', p[2], p[1], p[3])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: expression -> expression {} expression", p[2])
+        p[0] = BinOp(p[2], p[1], p[3], p[1].lineno)
 
     def p_expression_uminus(self, p):
         'expression : MINUS expression %prec UMINUS'
-        print("Parsing: expression -> - expression")
-        p[0] = ('uminus', p[2])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: expression -> - expression")
+        p[0] = UMinus(p[2], p.lineno(1))
     
     def p_expression_id(self, p):
         'expression : ID'
-        print(f"Parsing: expression -> ID ({p[1]})")
-        p[0] = ('id', p[1])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: expression -> ID ({})", p[1])
+        p[0] = Id(p[1], p.lineno(1))
     
     def p_expression_constant(self, p):
         '''expression : CONSTANT
                      | FLOAT_CONSTANT'''
-        print(f"Parsing: expression -> CONSTANT ({p[1]})")
-        p[0] = ('const', p[1])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: expression -> CONSTANT ({})", p[1])
+        p[0] = Const(p[1], p.lineno(1))
     
     def p_expression_paren(self, p):
         'expression : LPAREN expression RPAREN'
-        print("Parsing: expression -> ( expression )")
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: expression -> ( expression )")
         p[0] = p[2]
     
     def p_condition(self, p):
@@ -156,19 +184,36 @@ class Parser:
                     | expression GE expression
                     | expression EQ expression
                     | expression NE expression'''
-        print(f"Parsing: condition -> expression {p[2]} expression")
-        p[0] = ('condition', p[2], p[1], p[3])
+        if self.trace is not None:
+            self.trace.event('parser', "Parsing: condition -> expression {} expression", p[2])
+        p[0] = Condition(p[2], p[1], p[3], p[1].lineno)
     
     def p_error(self, p):
         if p:
-            message = f"Syntax error at token {p.type} ('{p.value}') on line {p.lineno}"
-            print(message)
-            raise SyntaxErrorFound(message)
+            raise SyntaxErrorFound(f"Syntax error at token {p.type} ('{p.value}') on line {p.lineno}")
         else:
-            message = "Syntax error at EOF"
-            print(message)
-            raise SyntaxErrorFound(message)
+            raise SyntaxErrorFound("Syntax error at EOF")
+    
+    def build(self, optimize=False):
+        global _prebuilt
+        if not optimize:
+            self.parser = yacc.yacc(module=self)
+            return self.parser
+        if _prebuilt is None:
+            # ply only reuses parsetab.py when its signature matches the
+            # grammar, and regenerates it otherwise. debug=False skips
+            # writing parser.out.
+            _prebuilt = yacc.yacc(module=self, debug=False)
+        self.parser = self.bind(_prebuilt)
+        return self.parser
     
-    def build(self):
-        self.parser = yacc.yacc(module=self)
-        return self.parser
\ No newline at end of file
+    def bind(self, template):
+        parser = copy.copy(template)
+        parser.productions = []
+        for production in template.productions:
+            production = copy.copy(production)
+            if production.func:
+                production.callable = getattr(self, production.func)
+            parser.productions.append(production)
+        parser.errorfunc = self.p_error
+        return parser
\ No newline at end of file
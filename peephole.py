@@ -0,0 +1,260 @@
+import re
+
+
+# General-purpose register names, in their 32- and 64-bit forms.
+REGISTER = re.compile(r'\b(?:[er](?:[abcd]x|[sd]i|[sb]p)|r(?:8|9|1[0-5])d?)\b')
+
+FLAG_WRITERS = frozenset(('add', 'sub', 'imul', 'idiv', 'and', 'or', 'xor', 'neg',
+                          'cmp', 'test', 'shl', 'sar', 'shr', 'inc', 'dec'))
+FLAG_NEUTRAL = frozenset(('mov', 'lea', 'push', 'pop', 'cdq', 'cqo', 'movsxd'))
+READ_WRITE = frozenset(('add', 'sub', 'imul', 'and', 'or', 'xor', 'shl', 'sar', 'shr',
+                        'neg', 'not', 'inc', 'dec'))
+
+# How far ahead the rules look for the next use of a register or the flags.
+# Past this the value is treated as still needed.
+LOOKAHEAD = 32
+
+
+def family(register):
+    # eax and rax are the same register; so are r8d and r8.
+    if register[1].isdigit():
+        return register.rstrip('d')
+    return register[1:]
+
+
+def registers_in(operand):
+    return {family(name) for name in REGISTER.findall(operand)}
+
+
+def strip_size(operand):
+    return operand[6:] if operand.startswith(('dword ', 'qword ')) else operand
+
+
+def is_register(operand):
+    return REGISTER.fullmatch(operand) is not None
+
+
+def is_memory(operand):
+    return strip_size(operand).startswith('[')
+
+
+def is_immediate(operand):
+    return re.fullmatch(r'-?\d+', operand) is not None
+
+
+def effects(instr):
+    # The registers an instruction reads and writes, or None for the reads
+    # when it may read any of them.
+    mnemonic, operands = instr
+    if mnemonic in ('mov', 'lea', 'movsxd') or mnemonic == 'imul' and len(operands) == 3:
+        dest = operands[0]
+        reads = set()
+        for operand in operands[1:]:
+            reads |= registers_in(operand)
+        if is_register(dest):
+            return reads, {family(dest)}
+        return reads | registers_in(dest), set()
+    if mnemonic == 'imul' and len(operands) == 1:
+        return {'ax'} | registers_in(operands[0]), {'ax', 'dx'}
+    if mnemonic in ('xor', 'sub') and len(operands) == 2 and operands[0] == operands[1]:
+        return set(), registers_in(operands[0])
+    if mnemonic in READ_WRITE:
+        reads = set()
+        for operand in operands:
+            reads |= registers_in(operand)
+        written = {family(operands[0])} if is_register(operands[0]) else set()
+        return reads, written
+    if mnemonic in ('cmp', 'test', 'push'):
+        reads = set()
+        for operand in operands:
+            reads |= registers_in(operand)
+        return reads, set()
+    if mnemonic == 'pop':
+        if is_register(operands[0]):
+            return set(), {family(operands[0])}
+        return registers_in(operands[0]), set()
+    if mnemonic in ('cdq', 'cqo'):
+        return {'ax'}, {'dx'}
+    if mnemonic == 'idiv':
+        return {'ax', 'dx'} | registers_in(operands[0]), {'ax', 'dx'}
+    return None, set()
+
+
+def register_dead_after(code, j, register):
+    # Whether a register's value is overwritten before anything reads it,
+    # looking at code[j:]. Running off the end counts as dead: the exit
+    # sequence that follows sets the registers it uses.
+    for instr in code[j:j + LOOKAHEAD]:
+        mnemonic = instr[0]
+        if mnemonic is None:
+            continue
+        if mnemonic.startswith('j'):
+            return False
+        reads, writes = effects(instr)
+        if reads is None or register in reads:
+            return False
+        if register in writes:
+            return True
+    return j + LOOKAHEAD >= len(code)
+
+
+def flags_dead_after(code, j):
+    # Whether the flags are set again before a conditional jump reads them.
+    for instr in code[j:j + LOOKAHEAD]:
+        mnemonic = instr[0]
+        if mnemonic is None or mnemonic in FLAG_NEUTRAL:
+            continue
+        return mnemonic in FLAG_WRITERS
+    return j + LOOKAHEAD >= len(code)
+
+
+# Each rule looks at the instructions already emitted (out), whose last one
+# was just added, and may rewrite the end of that list. code[j:] is what is
+# still to come, for rules that need to know whether a value is used later.
+# A rule returns True when it changed something.
+
+def remove_self_move(out, code, j):
+    # mov eax, eax
+    mnemonic, operands = out[-1]
+    if mnemonic == 'mov' and operands[0] == operands[1]:
+        out.pop()
+        return True
+    return False
+
+
+def collapse_move_chain(out, code, j):
+    # mov eax, X; mov ebx, eax  ->  mov ebx, X   when eax is not read again
+    if len(out) < 2:
+        return False
+    first, second = out[-2], out[-1]
+    if first[0] != 'mov' or second[0] != 'mov':
+        return False
+    temp, source = first[1]
+    dest, value = second[1]
+    if value != temp or not is_register(temp) or family(temp) in registers_in(dest):
+        return False
+    if is_memory(dest) and is_memory(source):
+        return False
+    if not register_dead_after(code, j, family(temp)):
+        return False
+    if is_memory(dest) and is_immediate(source):
+        dest = f"dword {strip_size(dest)}" if dest.startswith('[') else dest
+    out[-2:] = [('mov', (dest, source))]
+    return True
+
+
+def forward_store(out, code, j):
+    # mov [v], eax; mov ebx, [v]  ->  mov [v], eax; mov ebx, eax
+    if len(out) < 2:
+        return False
+    first, second = out[-2], out[-1]
+    if first[0] != 'mov' or second[0] != 'mov':
+        return False
+    memory, register = first[1]
+    dest, source = second[1]
+    if not is_memory(memory) or not is_register(register) or not is_register(dest):
+        return False
+    if strip_size(source) != strip_size(memory) or family(register) in registers_in(memory):
+        return False
+    if dest == register:
+        out.pop()
+    else:
+        out[-1] = ('mov', (dest, register))
+    return True
+
+
+def zero_with_xor(out, code, j):
+    # mov eax, 0  ->  xor eax, eax   when nothing reads the flags it sets
+    mnemonic, operands = out[-1]
+    if mnemonic != 'mov' or operands[1] != '0' or not is_register(operands[0]):
+        return False
+    if not flags_dead_after(code, j):
+        return False
+    out[-1] = ('xor', (operands[0], operands[0]))
+    return True
+
+
+def multiply_by_shift(out, code, j):
+    # imul eax, 8  ->  shl eax, 3
+    mnemonic, operands = out[-1]
+    if mnemonic != 'imul' or len(operands) != 2 or not is_register(operands[0]):
+        return False
+    if not is_immediate(operands[1]):
+        return False
+    factor = int(operands[1])
+    if factor < 2 or factor & (factor - 1) or not flags_dead_after(code, j):
+        return False
+    out[-1] = ('shl', (operands[0], str(factor.bit_length() - 1)))
+    return True
+
+
+def remove_jump_to_next(out, code, j):
+    # jmp L2; L2:  (or any conditional jump)
+    mnemonic, operands = out[-1]
+    if mnemonic is None or not mnemonic.startswith('j'):
+        return False
+    while j < len(code) and code[j][0] is None:
+        if code[j][1] == operands[0]:
+            out.pop()
+            return True
+        j += 1
+    return False
+
+
+RULES = (
+    ('self moves removed', remove_self_move),
+    ('move chains collapsed', collapse_move_chain),
+    ('stores forwarded to loads', forward_store),
+    ('zeroing moves replaced by xor', zero_with_xor),
+    ('multiplications replaced by shifts', multiply_by_shift),
+    ('jumps to the next instruction removed', remove_jump_to_next),
+)
+
+
+def parse_line(line):
+    # (mnemonic, operands) for an instruction and (None, name) for a label.
+    text = line.strip()
+    if text.endswith(':'):
+        return None, text[:-1]
+    mnemonic, _, rest = text.partition(' ')
+    operands = tuple(operand.strip() for operand in rest.split(',')) if rest else ()
+    return mnemonic, operands
+
+
+def format_line(instr):
+    mnemonic, operands = instr
+    if mnemonic is None:
+        return f"{operands}:"
+    if not operands:
+        return f"    {mnemonic}"
+    return f"    {mnemonic} {', '.join(operands)}"
+
+
+class Peephole:
+    # Pattern-driven rewriting of an assembly listing. Instructions are fed
+    # one at a time; after each, every rule in the table is tried on the end
+    # of the output until none applies, so one rewrite can enable another.
+    # New rules only need an entry in rules.
+
+    def __init__(self, rules=RULES, trace=None):
+        self.rules = rules
+        self.trace = trace
+        self.stats = {}
+
+    def optimize(self, lines):
+        self.stats = {}
+        code = [parse_line(line) for line in lines]
+        out = []
+        for j, instr in enumerate(code, 1):
+            out.append(instr)
+            changed = True
+            while changed and out:
+                changed = False
+                for name, rule in self.rules:
+                    if rule(out, code, j):
+                        self.stats[name] = self.stats.get(name, 0) + 1
+                        if self.trace is not None:
+                            self.trace.event('peephole', "Peephole: {}", name)
+                        changed = True
+                        break
+        return [format_line(instr) for instr in out]
@@ -0,0 +1,154 @@
+from tac import is_temporary, ASSIGN, ADD, SUB, MUL, DIV, MOD, IF, GOTO, LABEL
+
+
+CONTROL = frozenset((LABEL, GOTO, IF))
+TWO_ADDRESS = frozenset((ASSIGN, ADD, SUB, MUL))
+
+def live_intervals(code):
+    # Live range of every temporary as [first, last] instruction index. The
+    # liveness is computed backwards over the instruction list; the live-in
+    # set of each label is iterated to a fixed point so values carried
+    # around loops stay live across the back edge. A temporary stays in the
+    # live set between the points recorded below, so only those points are
+    # visited: definitions, uses, jumps and the start of the code.
+    defs = []
+    uses = []
+    for instr in code:
+        if instr.op in CONTROL:
+            defs.append(None)
+        else:
+            defs.append(instr.dest if is_temporary(instr.dest) else None)
+        uses.append([operand for operand in (instr.a, instr.b) if is_temporary(operand)])
+
+    label_live = {}
+    while True:
+        changed = False
+        first = {}
+        last = {}
+        live = set()
+        for i in range(len(code) - 1, -1, -1):
+            op = code[i].op
+            if op == LABEL:
+                label = code[i].dest
+                if label_live.get(label, set()) != live:
+                    label_live[label] = set(live)
+                    changed = True
+                continue
+            if op == GOTO:
+                for temp in live:
+                    first[temp] = i + 1
+                live = set(label_live.get(code[i].dest, ()))
+                for temp in live:
+                    first[temp] = i
+                    last.setdefault(temp, i)
+            elif op == IF:
+                for temp in label_live.get(code[i].dest, ()):
+                    first[temp] = i
+                    last.setdefault(temp, i)
+                    live.add(temp)
+            dest = defs[i]
+            if dest is not None:
+                first[dest] = i
+                last.setdefault(dest, i)
+                live.discard(dest)
+            for temp in uses[i]:
+                first[temp] = i
+                last.setdefault(temp, i)
+                live.add(temp)
+        for temp in live:
+            first[temp] = 0
+        if not changed:
+            return {temp: [first[temp], last[temp]] for temp in last}
+
+
+class LinearScan:
+    # Linear-scan allocation (Poletto and Sarkar) of the temporaries onto a
+    # fixed set of registers. Intervals that do not fit are spilled to
+    # 4-byte stack slots for their whole lifetime. A slot is shared only by
+    # intervals that do not overlap.
+
+    def __init__(self, registers, trace=None):
+        self.registers = registers
+        self.trace = trace
+        self.intervals = {}
+        self.register_map = {}
+        self.spill_slots = {}
+        self.frame_size = 0
+
+    def allocate(self, code):
+        self.intervals = intervals = live_intervals(code)
+        self.register_map = {}
+        self.spill_slots = {}
+        self.frame_size = 0
+
+        # Division clobbers eax and edx, so values living across one are
+        # kept out of them, and the quotient or remainder prefers the
+        # register it is produced in: eax, except for the remainder of an
+        # idiv. A temporary also prefers the register
+        # of the left operand it is computed from, which saves a mov.
+        divisions = [0]
+        hints = {}
+        for i, instr in enumerate(code):
+            op = instr.op
+            divisions.append(divisions[-1] + (op == DIV or op == MOD))
+            if op == DIV:
+                hints[instr.dest] = 'eax'
+            elif op == MOD:
+                hints[instr.dest] = 'eax' if type(instr.b) is int and instr.b != 0 else 'edx'
+            elif op in TWO_ADDRESS and is_temporary(instr.a):
+                hints[instr.dest] = instr.a
+
+        free = set(self.registers)
+        free_slots = []
+        active = []
+        active_spills = []
+        for temp in sorted(intervals, key=lambda t: intervals[t][0]):
+            start, end = intervals[temp]
+
+            for other in [t for t in active if intervals[t][1] <= start]:
+                active.remove(other)
+                free.add(self.register_map[other])
+            for other in [t for t in active_spills if intervals[t][1] <= start]:
+                active_spills.remove(other)
+                free_slots.append((self.spill_slots[other], intervals[other][1]))
+
+            if free:
+                candidates = [r for r in self.registers if r in free]
+                if divisions[end] - divisions[start + 1] > 0:
+                    candidates = [r for r in candidates if r not in ('eax', 'edx')] or candidates
+                hint = hints.get(temp)
+                hint = self.register_map.get(hint, hint)
+                reg = hint if hint in candidates else candidates[0]
+                free.discard(reg)
+                self.register_map[temp] = reg
+                active.append(temp)
+                if self.trace is not None:
+                    self.trace.event('assembly', "Assembly: Allocating register {} for {}", reg, temp)
+                continue
+
+            victim = max(active, key=lambda t: intervals[t][1])
+            if intervals[victim][1] > end:
+                reg = self.register_map.pop(victim)
+                active.remove(victim)
+                self.register_map[temp] = reg
+                active.append(temp)
+                if self.trace is not None:
+                    self.trace.event('assembly', "Assembly: Spilling {} from {} for {}", victim, reg, temp)
+            else:
+                victim = temp
+
+            # A victim taken from the active list lives in its slot from its
+            # own start, which can be before the current one, so a freed
+            # slot is only reused once its last owner ended by then.
+            begin = intervals[victim][0]
+            reusable = [i for i, (_, last) in enumerate(free_slots) if last <= begin]
+            if reusable:
+                slot = free_slots.pop(reusable[-1])[0]
+            else:
+                self.frame_size += 4
+                slot = self.frame_size
+            self.spill_slots[victim] = slot
+            active_spills.append(victim)
+            if self.trace is not None:
+                self.trace.event('assembly', "Assembly: Spilling {} to stack slot {}", victim, slot)
+        return self.register_map
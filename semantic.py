@@ -1,276 +1,472 @@
+from nodes import Node, NODE_TYPES, Program
+from tac import Instr, Op, BINARY_OPS
+
+
 class SemanticError(Exception):
     pass
 
 class Symbol:
-    def __init__(self, name, type):
+    def __init__(self, name, type, lineno=0):
         self.name = name
         self.type = type
+        self.lineno = lineno
+        # Name of the variable's storage in the generated code. It only
+        # differs from name for declarations that shadow an outer variable.
+        self.storage = name
+        self.outer = None
 
 class SymbolTable:
-    def __init__(self):
+    # visible maps each name to its innermost declaration, and every symbol
+    # links to the declaration it shadows, so lookups stay O(1) however
+    # deeply scopes are nested.
+    def __init__(self, trace=None):
         self.scopes = [{}]
+        self.visible = {}
+        self.trace = trace
+        self.shadow_count = 0
 
     def enter_scope(self):
-        print("Semantic: Entering new scope")
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Entering new scope")
         self.scopes.append({})
 
     def exit_scope(self):
-        print("Semantic: Exiting scope")
-        self.scopes.pop()
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Exiting scope")
+        for symbol in self.scopes.pop().values():
+            if symbol.outer is None:
+                del self.visible[symbol.name]
+            else:
+                self.visible[symbol.name] = symbol.outer
 
     def add_symbol(self, symbol):
-        print(f"Semantic: Adding symbol '{symbol.name}' of type '{symbol.type}'")
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Adding symbol '{}' of type '{}'", symbol.name, symbol.type)
         if symbol.name in self.scopes[-1]:
-            raise SemanticError(f"Variable '{symbol.name}' already declared in this scope.")
+            raise SemanticError(f"Variable '{symbol.name}' already declared in this scope on line {symbol.lineno}.")
+        outer = self.visible.get(symbol.name)
+        if outer is not None:
+            # '@' cannot appear in source identifiers, so the storage name
+            # never collides with a user variable.
+            self.shadow_count += 1
+            symbol.storage = f"{symbol.name}@{self.shadow_count}"
+            symbol.outer = outer
         self.scopes[-1][symbol.name] = symbol
+        self.visible[symbol.name] = symbol
 
     def lookup_symbol(self, name):
-        print(f"Semantic: Looking up symbol '{name}'")
-        for scope in reversed(self.scopes):
-            if name in scope:
-                return scope[name]
-        return None
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Looking up symbol '{}'", name)
+        return self.visible.get(name)
 
 class SemanticAnalyzer:
-    def __init__(self, codegen):
-        self.symbol_table = SymbolTable()
+    # The tree walks never recurse, so arbitrarily deep programs can be
+    # compiled. walk() keeps an explicit stack of work items: a node is
+    # visited through the handler table of the walk, a list is expanded in
+    # order, and a (continuation, argument) pair runs a deferred step once
+    # everything pushed above it has been processed. Expression results are
+    # passed between steps on self.values.
+    def __init__(self, codegen, trace=None, fused=False):
+        # fused checks the tree and emits TAC in a single traversal, with the
+        # symbol table of the enclosing scopes available during emission.
+        # Otherwise the tree is checked first and lowered in a second walk.
+        self.trace = trace
+        self.fused = fused
+        self.symbol_table = SymbolTable(trace)
         self.codegen = codegen
+        self.values = []
+        self.analyzers = self.dispatch_table('analyze_', self.default_analyzer)
+        self.generators = self.dispatch_table('generate_tac_', self.default_generate_tac)
+        self.translators = self.dispatch_table('translate_')
+
+    def dispatch_table(self, prefix, default=None):
+        return {node_type: getattr(self, prefix + node_type.kind, default) for node_type in NODE_TYPES}
 
     def reset(self):
-        self.symbol_table = SymbolTable()
+        self.symbol_table = SymbolTable(self.trace)
+        self.values = []
+
+    def walk(self, root, handlers):
+        stack = [root]
+        while stack:
+            item = stack.pop()
+            item_type = type(item)
+            if item_type is tuple:
+                item[0](item[1], stack)
+            elif item_type is list:
+                stack.extend(reversed(item))
+            elif item is not None:
+                handlers[item_type](item, stack)
+
+    def push_children(self, node, stack):
+        for field in reversed(node.fields):
+            child = getattr(node, field)
+            if isinstance(child, (Node, list)):
+                stack.append(child)
+
+    # Shared continuations
+
+    def exit_scope(self, _, stack):
+        self.symbol_table.exit_scope()
 
-    def analyze(self, node):
-        if node is None:
-            return
-        if isinstance(node, list):
-            for item in node:
-                self.analyze(item)
-            return
-
-        method_name = 'analyze_' + node[0]
-        method = getattr(self, method_name, self.default_analyzer)
-        return method(node)
-
-    def default_analyzer(self, node):
-        if isinstance(node, list):
-            for item in node:
-                self.analyze(item)
-        elif isinstance(node, tuple):
-            for item in node[1:]:
-                if isinstance(item, (tuple, list)):
-                    self.analyze(item)
-
-    def analyze_program(self, node):
-        print("Semantic: Analyzing program")
-        self.analyze(node[1])
-        self.generate_tac(node)
-
-    def analyze_statement_list(self, node):
-        print("Semantic: Analyzing statement list")
-        for statement in node:
-            self.analyze(statement)
-
-    def analyze_declaration(self, node):
-        print(f"Semantic: Analyzing declaration for '{node[2]}'")
-        symbol = Symbol(node[2], node[1])
-        self.symbol_table.add_symbol(symbol)
+    def emit_label(self, label, stack):
+        self.codegen.emit(Instr(Op.LABEL, label))
 
-    def analyze_declaration_assign(self, node):
-        print(f"Semantic: Analyzing declaration with assignment for '{node[2]}'")
-        symbol = Symbol(node[2], node[1])
-        self.symbol_table.add_symbol(symbol)
-        self.analyze(node[3])
-
-    def analyze_assign(self, node):
-        print(f"Semantic: Analyzing assignment to '{node[1]}'")
-        if not self.symbol_table.lookup_symbol(node[1]):
-            raise SemanticError(f"Undeclared variable '{node[1]}' used in assignment.")
-        self.analyze(node[2])
-
-    def analyze_increment(self, node):
-        print(f"Semantic: Analyzing increment for '{node[1]}'")
-        if not self.symbol_table.lookup_symbol(node[1]):
-            raise SemanticError(f"Undeclared variable '{node[1]}' used in increment.")
-
-    def analyze_decrement(self, node):
-        print(f"Semantic: Analyzing decrement for '{node[1]}'")
-        if not self.symbol_table.lookup_symbol(node[1]):
-            raise SemanticError(f"Undeclared variable '{node[1]}' used in decrement.")
-
-    def analyze_id(self, node):
-        print(f"Semantic: Analyzing ID '{node[1]}'")
-        if not self.symbol_table.lookup_symbol(node[1]):
-            raise SemanticError(f"Undeclared variable '{node[1]}' used in expression.")
-
-    def analyze_if(self, node):
-        print("Semantic: Analyzing if statement")
-        self.analyze(node[1])
-        self.analyze(node[2])
-
-    def analyze_if_else(self, node):
-        print("Semantic: Analyzing if-else statement")
-        self.analyze(node[1])
-        self.analyze(node[2])
-        self.analyze(node[3])
-
-    def analyze_for(self, node):
-        print("Semantic: Analyzing for loop")
-        self.symbol_table.enter_scope()
-        self.analyze(node[1])
-        self.analyze(node[2])
-        self.analyze(node[3])
-        self.analyze(node[4])
-        self.symbol_table.exit_scope()
+    def emit_goto(self, label, stack):
+        self.codegen.emit(Instr(Op.GOTO, label))
 
-    def analyze_block(self, node):
-        print("Semantic: Analyzing block")
-        self.symbol_table.enter_scope()
-        self.analyze(node[1])
-        self.symbol_table.exit_scope()
-        
-    def analyze_binop(self, node):
-        print(f"Semantic: Analyzing binary operation '{node[1]}'")
-        self.analyze(node[2])
-        self.analyze(node[3])
-
-    def analyze_uminus(self, node):
-        print("Semantic: Analyzing unary minus")
-        self.analyze(node[1])
-
-    def analyze_condition(self, node):
-        print(f"Semantic: Analyzing condition '{node[1]}'")
-        self.analyze(node[2])
-        self.analyze(node[3])
-
-    def generate_tac(self, node):
-        if isinstance(node, list):
-            for item in node:
-                self.generate_tac(item)
-            return
-
-        method_name = 'generate_tac_' + node[0]
-        method = getattr(self, method_name, self.default_generate_tac)
-        return method(node)
-
-    def default_generate_tac(self, node):
-        if isinstance(node, list):
-            for item in node:
-                self.generate_tac(item)
-        elif isinstance(node, tuple):
-            for item in node[1:]:
-                if isinstance(item, (tuple, list)):
-                    self.generate_tac(item)
-
-    def generate_tac_program(self, node):
-        self.generate_tac(node[1])
-
-    def generate_tac_statement_list(self, node):
-        for statement in node:
-            self.generate_tac(statement)
-
-    def generate_tac_assign(self, stmt):
-        expr_temp = self.generate_tac_expression(stmt[2])
-        self.codegen.emit(f"MOV {stmt[1]}, {expr_temp}")
-
-    def generate_tac_increment(self, stmt):
-        self.codegen.emit(f"ADD {stmt[1]}, {stmt[1]}, 1")
-
-    def generate_tac_decrement(self, stmt):
-        self.codegen.emit(f"SUB {stmt[1]}, {stmt[1]}, 1")
-
-    def generate_tac_if(self, stmt):
-        cond_result = self.generate_tac_condition(stmt[1])
+    def emit_store(self, storage, stack):
+        self.codegen.emit(Instr(Op.MOV, storage, self.values.pop()))
+
+    def emit_binop(self, expr, stack):
+        right = self.values.pop()
+        left = self.values.pop()
+        temp = self.codegen.new_temp()
+        self.codegen.emit(Instr(BINARY_OPS[expr.op], temp, left, right))
+        self.values.append(temp)
+
+    def emit_uminus(self, expr, stack):
+        expr_temp = self.values.pop()
+        temp = self.codegen.new_temp()
+        self.codegen.emit(Instr(Op.SUB, temp, 0, expr_temp))
+        self.values.append(temp)
+
+    def emit_condition(self, cond, stack):
+        right = self.values.pop()
+        left = self.values.pop()
+        self.values.append((left, cond.op, right))
+
+    def emit_if(self, stmt, stack):
+        cond_result = self.values.pop()
         label_true = self.codegen.new_label()
         label_end = self.codegen.new_label()
         
-        self.codegen.emit(f"IF {cond_result[0]} {cond_result[1]} {cond_result[2]} GOTO {label_true}")
-        self.codegen.emit(f"GOTO {label_end}")
-        self.codegen.emit(f"{label_true}:")
+        self.codegen.emit(Instr(Op.IF, label_true, cond_result[0], cond_result[2], cond_result[1]))
+        self.codegen.emit(Instr(Op.GOTO, label_end))
+        self.codegen.emit(Instr(Op.LABEL, label_true))
         
-        self.generate_tac(stmt[2])
-        
-        self.codegen.emit(f"{label_end}:")
+        stack.append((self.emit_label, label_end))
+        stack.append(stmt.body)
 
-    def generate_tac_if_else(self, stmt):
-        cond_result = self.generate_tac_condition(stmt[1])
+    def emit_if_else(self, stmt, stack):
+        cond_result = self.values.pop()
         label_true = self.codegen.new_label()
         label_false = self.codegen.new_label()
         label_end = self.codegen.new_label()
         
-        self.codegen.emit(f"IF {cond_result[0]} {cond_result[1]} {cond_result[2]} GOTO {label_true}")
-        self.codegen.emit(f"GOTO {label_false}")
-        self.codegen.emit(f"{label_true}:")
-        
-        self.generate_tac(stmt[2])
-        
-        self.codegen.emit(f"GOTO {label_end}")
-        self.codegen.emit(f"{label_false}:")
+        self.codegen.emit(Instr(Op.IF, label_true, cond_result[0], cond_result[2], cond_result[1]))
+        self.codegen.emit(Instr(Op.GOTO, label_false))
+        self.codegen.emit(Instr(Op.LABEL, label_true))
         
-        self.generate_tac(stmt[3])
-        
-        self.codegen.emit(f"{label_end}:")
+        stack.append((self.emit_label, label_end))
+        stack.append(stmt.else_body)
+        stack.append((self.emit_label, label_false))
+        stack.append((self.emit_goto, label_end))
+        stack.append(stmt.body)
 
-    def generate_tac_for(self, stmt):
-        init_stmt = stmt[1]
-        condition = stmt[2]
-        increment = stmt[3]
-        body = stmt[4]
-        
-        self.generate_tac(init_stmt)
-        
+    def emit_for_start(self, stmt, stack):
         label_start = self.codegen.new_label()
         label_body = self.codegen.new_label()
         label_end = self.codegen.new_label()
         
-        self.codegen.emit(f"{label_start}:")
+        self.codegen.emit(Instr(Op.LABEL, label_start))
         
-        cond_result = self.generate_tac_condition(condition)
-        self.codegen.emit(f"IF {cond_result[0]} {cond_result[1]} {cond_result[2]} GOTO {label_body}")
-        self.codegen.emit(f"GOTO {label_end}")
+        stack.append((self.emit_label, label_end))
+        stack.append((self.emit_goto, label_start))
+        stack.append(stmt.step)
+        stack.append(stmt.body)
+        stack.append((self.emit_for_branch, (label_body, label_end)))
+        stack.append(stmt.condition)
+
+    def emit_for_branch(self, labels, stack):
+        label_body, label_end = labels
+        cond_result = self.values.pop()
+        self.codegen.emit(Instr(Op.IF, label_body, cond_result[0], cond_result[2], cond_result[1]))
+        self.codegen.emit(Instr(Op.GOTO, label_end))
         
-        self.codegen.emit(f"{label_body}:")
-        
-        self.generate_tac(body)
-        
-        self.generate_tac(increment)
+        self.codegen.emit(Instr(Op.LABEL, label_body))
+
+    # Semantic checks
+
+    def analyze(self, node):
+        if self.fused and type(node) is Program:
+            return self.translate(node)
+        self.walk(node, self.analyzers)
+
+    def default_analyzer(self, node, stack):
+        self.push_children(node, stack)
+
+    def check_declared(self, name, usage, node):
+        if not self.symbol_table.lookup_symbol(name):
+            raise SemanticError(f"Undeclared variable '{name}' used in {usage} on line {node.lineno}.")
+
+    def analyze_program(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing program")
+        stack.append((self.generate_tac, node))
+        stack.append(node.statements)
+
+    def analyze_declaration(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing declaration for '{}'", node.name)
+        symbol = Symbol(node.name, node.type, node.lineno)
+        self.symbol_table.add_symbol(symbol)
+
+    def analyze_declaration_assign(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing declaration with assignment for '{}'", node.name)
+        symbol = Symbol(node.name, node.type, node.lineno)
+        self.symbol_table.add_symbol(symbol)
+        stack.append(node.expr)
+
+    def analyze_assign(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing assignment to '{}'", node.name)
+        self.check_declared(node.name, 'assignment', node)
+        stack.append(node.expr)
+
+    def analyze_increment(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing increment for '{}'", node.name)
+        self.check_declared(node.name, 'increment', node)
+
+    def analyze_decrement(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing decrement for '{}'", node.name)
+        self.check_declared(node.name, 'decrement', node)
+
+    def analyze_id(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing ID '{}'", node.name)
+        self.check_declared(node.name, 'expression', node)
+
+    def analyze_const(self, node, stack):
+        pass
+
+    def analyze_if(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing if statement")
+        stack.append(node.body)
+        stack.append(node.condition)
+
+    def analyze_if_else(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing if-else statement")
+        stack.append(node.else_body)
+        stack.append(node.body)
+        stack.append(node.condition)
+
+    def analyze_for(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing for loop")
+        self.symbol_table.enter_scope()
+        stack.append((self.exit_scope, None))
+        stack.append(node.body)
+        stack.append(node.step)
+        stack.append(node.condition)
+        stack.append(node.init)
+
+    def analyze_block(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing block")
+        self.symbol_table.enter_scope()
+        stack.append((self.exit_scope, None))
+        stack.append(node.statements)
         
-        self.codegen.emit(f"GOTO {label_start}")
-        self.codegen.emit(f"{label_end}:")
+    def analyze_binop(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing binary operation '{}'", node.op)
+        stack.append(node.right)
+        stack.append(node.left)
+
+    def analyze_uminus(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing unary minus")
+        stack.append(node.operand)
+
+    def analyze_condition(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing condition '{}'", node.op)
+        stack.append(node.right)
+        stack.append(node.left)
+
+    # TAC generation without scope information (second walk of the two-pass mode)
+
+    def generate_tac(self, node, stack=None):
+        # stack is unused; it lets analyze_program queue this walk as a
+        # continuation.
+        self.walk(node, self.generators)
 
-    def generate_tac_block(self, node):
-        for s in node[1]:
-            self.generate_tac(s)
+    def default_generate_tac(self, node, stack):
+        self.push_children(node, stack)
 
-    def generate_tac_declaration(self, node):
+    def generate_tac_program(self, node, stack):
+        stack.append(node.statements)
+
+    def generate_tac_assign(self, stmt, stack):
+        stack.append((self.emit_store, stmt.name))
+        stack.append(stmt.expr)
+
+    def generate_tac_increment(self, stmt, stack):
+        self.codegen.emit(Instr(Op.INC, stmt.name, stmt.name, 1))
+
+    def generate_tac_decrement(self, stmt, stack):
+        self.codegen.emit(Instr(Op.DEC, stmt.name, stmt.name, 1))
+
+    def generate_tac_if(self, stmt, stack):
+        stack.append((self.emit_if, stmt))
+        stack.append(stmt.condition)
+
+    def generate_tac_if_else(self, stmt, stack):
+        stack.append((self.emit_if_else, stmt))
+        stack.append(stmt.condition)
+
+    def generate_tac_for(self, stmt, stack):
+        stack.append((self.emit_for_start, stmt))
+        stack.append(stmt.init)
+
+    def generate_tac_block(self, node, stack):
+        stack.append(node.statements)
+
+    def generate_tac_declaration(self, node, stack):
         pass
 
-    def generate_tac_declaration_assign(self, stmt):
-        expr_temp = self.generate_tac_expression(stmt[3])
-        self.codegen.emit(f"MOV {stmt[2]}, {expr_temp}")
+    def generate_tac_declaration_assign(self, stmt, stack):
+        stack.append((self.emit_store, stmt.name))
+        stack.append(stmt.expr)
 
     def generate_tac_expression(self, expr):
-        if expr[0] == 'const':
-            temp = self.codegen.new_temp()
-            self.codegen.emit(f"{temp} = {expr[1]}")
-            return temp
-        elif expr[0] == 'id':
-            temp = self.codegen.new_temp()
-            self.codegen.emit(f"{temp} = {expr[1]}")
-            return temp
-        elif expr[0] == 'binop':
-            left = self.generate_tac_expression(expr[2])
-            right = self.generate_tac_expression(expr[3])
-            temp = self.codegen.new_temp()
-            self.codegen.emit(f"{temp} = {left} {expr[1]} {right}")
-            return temp
-        elif expr[0] == 'uminus':
-            expr_temp = self.generate_tac_expression(expr[1])
-            temp = self.codegen.new_temp()
-            self.codegen.emit(f"{temp} = 0 - {expr_temp}")
-            return temp
-        return None
-
-    def generate_tac_condition(self, cond):
-        left = self.generate_tac_expression(cond[2])
-        right = self.generate_tac_expression(cond[3])
-        return (left, cond[1], right)
+        self.walk(expr, self.generators)
+        return self.values.pop()
+
+    def generate_tac_const(self, expr, stack):
+        temp = self.codegen.new_temp()
+        self.codegen.emit(Instr(Op.ASSIGN, temp, expr.value))
+        self.values.append(temp)
+
+    def generate_tac_id(self, expr, stack):
+        temp = self.codegen.new_temp()
+        self.codegen.emit(Instr(Op.ASSIGN, temp, expr.name))
+        self.values.append(temp)
+
+    def generate_tac_binop(self, expr, stack):
+        stack.append((self.emit_binop, expr))
+        stack.append(expr.right)
+        stack.append(expr.left)
+
+    def generate_tac_uminus(self, expr, stack):
+        stack.append((self.emit_uminus, expr))
+        stack.append(expr.operand)
+
+    def generate_tac_condition(self, cond, stack):
+        stack.append((self.emit_condition, cond))
+        stack.append(cond.right)
+        stack.append(cond.left)
+
+    # Fused checking and TAC generation
+
+    def translate(self, node):
+        self.walk(node, self.translators)
+
+    def lookup_storage(self, name, usage, node):
+        symbol = self.symbol_table.lookup_symbol(name)
+        if not symbol:
+            raise SemanticError(f"Undeclared variable '{name}' used in {usage} on line {node.lineno}.")
+        return symbol.storage
+
+    def translate_program(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing program")
+        stack.append(node.statements)
+
+    def translate_declaration(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing declaration for '{}'", node.name)
+        self.symbol_table.add_symbol(Symbol(node.name, node.type, node.lineno))
+
+    def translate_declaration_assign(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing declaration with assignment for '{}'", node.name)
+        symbol = Symbol(node.name, node.type, node.lineno)
+        self.symbol_table.add_symbol(symbol)
+        stack.append((self.emit_store, symbol.storage))
+        stack.append(node.expr)
+
+    def translate_assign(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing assignment to '{}'", node.name)
+        storage = self.lookup_storage(node.name, 'assignment', node)
+        stack.append((self.emit_store, storage))
+        stack.append(node.expr)
+
+    def translate_increment(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing increment for '{}'", node.name)
+        storage = self.lookup_storage(node.name, 'increment', node)
+        self.codegen.emit(Instr(Op.INC, storage, storage, 1))
+
+    def translate_decrement(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing decrement for '{}'", node.name)
+        storage = self.lookup_storage(node.name, 'decrement', node)
+        self.codegen.emit(Instr(Op.DEC, storage, storage, 1))
+
+    def translate_if(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing if statement")
+        stack.append((self.emit_if, node))
+        stack.append(node.condition)
+
+    def translate_if_else(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing if-else statement")
+        stack.append((self.emit_if_else, node))
+        stack.append(node.condition)
+
+    def translate_for(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing for loop")
+        self.symbol_table.enter_scope()
+        stack.append((self.exit_scope, None))
+        stack.append((self.emit_for_start, node))
+        stack.append(node.init)
+
+    def translate_block(self, node, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing block")
+        self.symbol_table.enter_scope()
+        stack.append((self.exit_scope, None))
+        stack.append(node.statements)
+
+    def translate_const(self, expr, stack):
+        temp = self.codegen.new_temp()
+        self.codegen.emit(Instr(Op.ASSIGN, temp, expr.value))
+        self.values.append(temp)
+
+    def translate_id(self, expr, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing ID '{}'", expr.name)
+        storage = self.lookup_storage(expr.name, 'expression', expr)
+        temp = self.codegen.new_temp()
+        self.codegen.emit(Instr(Op.ASSIGN, temp, storage))
+        self.values.append(temp)
+
+    def translate_binop(self, expr, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing binary operation '{}'", expr.op)
+        stack.append((self.emit_binop, expr))
+        stack.append(expr.right)
+        stack.append(expr.left)
+
+    def translate_uminus(self, expr, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing unary minus")
+        stack.append((self.emit_uminus, expr))
+        stack.append(expr.operand)
+
+    def translate_condition(self, cond, stack):
+        if self.trace is not None:
+            self.trace.event('semantic', "Semantic: Analyzing condition '{}'", cond.op)
+        stack.append((self.emit_condition, cond))
+        stack.append(cond.right)
+        stack.append(cond.left)
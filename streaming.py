@@ -0,0 +1,185 @@
+from assembly_gen import AssemblyGenerator
+from compiler import Compiler, CompilationContext
+from incremental import CLOSED
+from parser import SyntaxErrorFound
+from tac import format_tac
+
+
+BLOCK = 65536
+
+# Running the optimizer and the code generator has a cost per call that
+# dwarfs the work on a single small statement.
+BATCH = 512
+
+
+def read_chunks(source):
+    # A file is read a block at a time; any other iterable yields the text
+    # in pieces of its own choosing, such as lines.
+    if isinstance(source, str):
+        return (source,)
+    if hasattr(source, 'read'):
+        return iter(lambda: source.read(BLOCK), '')
+    return source
+
+
+def stream_tokens(lexer, chunks):
+    # Lexes the text as it arrives, up to the last complete line. Only a
+    # comment or string can span lines, so the text is held back while one
+    # is open; if it never closes, the rest is lexed at the end of input as
+    # a single piece, which is what lexing the whole text would see.
+    buffer = ''
+    line = 1
+    for chunk in chunks:
+        buffer += chunk
+        cut = buffer.rfind('\n') + 1
+        if not cut:
+            continue
+        head = buffer[:cut]
+        rest = CLOSED.sub('', head)
+        if '/*' in rest or '"' in rest:
+            continue
+        buffer = buffer[cut:]
+        lexer.input(head)
+        lexer.lineno = line
+        yield from iter(lexer.token, None)
+        line += head.count('\n')
+    lexer.input(buffer)
+    lexer.lineno = line
+    yield from iter(lexer.token, None)
+
+
+def top_level_statements(tokens):
+    # Groups the tokens of each top-level statement, like split_statements
+    # in incremental.py. A statement that ends is only yielded once the next
+    # token shows it is not followed by an else. One that closes more than
+    # it opened cannot parse, so it is yielded at once to report the error.
+    group = []
+    parens = braces = 0
+    complete = False
+    for tok in tokens:
+        kind = tok.type
+        if complete and kind != 'ELSE':
+            yield group
+            group = []
+        complete = False
+        group.append(tok)
+        if kind == 'LPAREN':
+            parens += 1
+            continue
+        if kind == 'RPAREN':
+            parens -= 1
+            if parens >= 0:
+                continue
+        elif kind == 'LBRACE':
+            braces += 1
+            continue
+        elif kind == 'RBRACE':
+            braces -= 1
+        elif kind != 'SEMICOLON':
+            continue
+        if parens < 0 or braces < 0:
+            yield group
+            group = []
+            parens = braces = 0
+        elif not parens and not braces:
+            complete = True
+    if group:
+        yield group
+
+
+class StreamingCompiler:
+    # Compiles a program while it is read. Each top-level statement is
+    # parsed and translated to TAC as soon as its last token arrives; once
+    # the TAC of consecutive statements reaches a batch, it is optimized,
+    # turned into assembly and written out before more input is read.
+    # Neither the source, the syntax tree nor the TAC of the whole program
+    # is ever held, so memory stays flat with the length of the input: it
+    # grows only with the number of global names and the size of the
+    # largest statement.
+    #
+    # Each batch is optimized on its own, with every variable live at its
+    # end. The data section follows the code, since it is only complete at
+    # the end, and the stack frame grows when a batch needs more spill slots
+    # than the ones before it.
+
+    def __init__(self, opt_level=0, target='x86', fast_startup=True, batch=BATCH):
+        # batch is how many TAC instructions are collected from consecutive
+        # statements before they are optimized and emitted together.
+        self.compiler = Compiler(fast_startup=fast_startup, opt_level=opt_level, target=target)
+        self.context = CompilationContext(self.compiler)
+        self.batch = batch
+
+    def compile(self, source, output, tac_output=None):
+        # Reads source, a file or an iterable of strings, and writes the
+        # assembly listing to output and the TAC, if asked, to tac_output.
+        # Returns the error message, or None. On an error, what was written
+        # so far is not a complete program.
+        target = self.compiler.target
+        output.write('\n'.join(list(target.header) + ["section .text", "    global _start", "", "_start:", ""]))
+        data = {}
+        frame = 0
+        try:
+            for tac, code, variables, size in self.fragments(source):
+                if tac_output is not None and tac:
+                    tac_output.write(format_tac(tac) + '\n')
+                if size > frame:
+                    if not frame:
+                        output.write(f"    mov {target.frame_pointer}, {target.stack_pointer}\n")
+                    output.write(f"    sub {target.stack_pointer}, {size - frame}\n")
+                    frame = size
+                if code:
+                    output.write('\n'.join(code) + '\n')
+                data.update(dict.fromkeys(variables))
+        except Exception as e:
+            return str(e)
+        lines = ["", "    ; Exit program"]
+        lines.extend(f"    {instruction}" for instruction in target.exit)
+        lines.append("")
+        lines.append("section .data")
+        lines.extend(data)
+        output.write('\n'.join(lines) + '\n')
+        return None
+
+    def fragments(self, source):
+        # Yields the TAC instructions, assembly lines, data lines and frame
+        # size of each batch of statements in turn; the TAC is only
+        # formatted when it is written. Errors are raised. A semantic
+        # error is only raised once the rest of the input has parsed, because
+        # a syntax error anywhere is what a compile of the whole text reports.
+        context = self.context
+        context.reset()
+        codegen = context.codegen
+        analyzer = context.semantic_analyzer
+        error = None
+        empty = True
+        for tokens in top_level_statements(stream_tokens(context.lexer, read_chunks(source))):
+            stream = iter(tokens)
+            program = context.parser.parse(lexer=context.lexer, tokenfunc=lambda: next(stream, None))
+            empty = False
+            if error is not None:
+                continue
+            try:
+                for node in program.statements:
+                    analyzer.translate(node)
+            except Exception as e:
+                error = e
+                continue
+            if len(codegen.code) >= self.batch:
+                yield self.emit()
+        if empty:
+            raise SyntaxErrorFound("Syntax error at EOF")
+        if error is not None:
+            raise error
+        if codegen.code:
+            yield self.emit()
+
+    def emit(self):
+        # Optimizes and translates the TAC collected since the last batch.
+        context = self.context
+        compiler = self.compiler
+        codegen = context.codegen
+        code = context.optimizer.optimize(codegen.get_instructions())
+        codegen.reset(codegen.temp_count, codegen.label_count)
+        asm_gen = AssemblyGenerator(peephole=compiler.opt_level >= 1, target=compiler.target)
+        asm_gen.generate(code)
+        return code, asm_gen.assembly_code, asm_gen.data_section, asm_gen.stack_offset
@@ -0,0 +1,114 @@
+from enum import IntEnum
+
+
+class Op(IntEnum):
+    ASSIGN = 0   # dest = a
+    ADD = 1      # dest = a + b
+    SUB = 2      # dest = a - b
+    MUL = 3      # dest = a * b
+    DIV = 4      # dest = a / b
+    MOD = 5      # dest = a % b
+    MOV = 6      # MOV dest, a
+    INC = 7      # ADD dest, a, b
+    DEC = 8      # SUB dest, a, b
+    IF = 9       # IF a rel b GOTO dest
+    GOTO = 10    # GOTO dest
+    LABEL = 11   # dest:
+
+
+# The opcodes as plain module constants: attribute lookups on the enum class
+# are slow in the inner loops of the passes.
+ASSIGN, ADD, SUB, MUL, DIV, MOD, MOV, INC, DEC, IF, GOTO, LABEL = Op
+
+
+BINARY_OPS = {'+': Op.ADD, '-': Op.SUB, '*': Op.MUL, '/': Op.DIV, '%': Op.MOD}
+OP_SYMBOLS = {op: symbol for symbol, op in BINARY_OPS.items()}
+
+
+class Instr:
+    # Operands are either names (variables, temporaries, labels) stored as
+    # strings, or constants stored as Python numbers.
+    __slots__ = ('op', 'dest', 'a', 'b', 'rel')
+
+    def __init__(self, op, dest=None, a=None, b=None, rel=None):
+        self.op = op
+        self.dest = dest
+        self.a = a
+        self.b = b
+        self.rel = rel
+
+    def format(self):
+        op = self.op
+        if op == Op.ASSIGN:
+            return f"{self.dest} = {self.a}"
+        if op in OP_SYMBOLS:
+            return f"{self.dest} = {self.a} {OP_SYMBOLS[op]} {self.b}"
+        if op == Op.MOV:
+            return f"MOV {self.dest}, {self.a}"
+        if op == Op.INC:
+            return f"ADD {self.dest}, {self.a}, {self.b}"
+        if op == Op.DEC:
+            return f"SUB {self.dest}, {self.a}, {self.b}"
+        if op == Op.IF:
+            return f"IF {self.a} {self.rel} {self.b} GOTO {self.dest}"
+        if op == Op.GOTO:
+            return f"GOTO {self.dest}"
+        return f"{self.dest}:"
+
+    def __str__(self):
+        return self.format()
+
+    def __repr__(self):
+        return f"Instr({self.format()!r})"
+
+
+def is_temporary(name):
+    return isinstance(name, str) and name.startswith('t') and name[1:].isdigit()
+
+
+def is_constant(operand):
+    return not isinstance(operand, str)
+
+
+def parse_operand(text):
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def parse_instruction(line):
+    if line.endswith(':'):
+        return Instr(Op.LABEL, line[:-1])
+
+    parts = line.replace(',', ' ').split()
+    head = parts[0]
+    if head == 'GOTO':
+        return Instr(Op.GOTO, parts[1])
+    if head == 'IF':
+        return Instr(Op.IF, parts[5], parse_operand(parts[1]), parse_operand(parts[3]), parts[2])
+    if head == 'MOV':
+        return Instr(Op.MOV, parts[1], parse_operand(parts[2]))
+    if head in ('ADD', 'SUB'):
+        op = Op.INC if head == 'ADD' else Op.DEC
+        return Instr(op, parts[1], parse_operand(parts[2]), parse_operand(parts[3]))
+    if len(parts) == 3:
+        return Instr(Op.ASSIGN, parts[0], parse_operand(parts[2]))
+    return Instr(BINARY_OPS[parts[3]], parts[0], parse_operand(parts[2]), parse_operand(parts[4]))
+
+
+def parse_tac(text):
+    code = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if line:
+            code.append(parse_instruction(line))
+    return code
+
+
+def format_tac(code):
+    return '\n'.join(instr.format() for instr in code)
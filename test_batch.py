@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import emulator
+import main
+from compiler import Compiler, compile_many
+from test_cases import error_suite, test_suite
+
+
+# Valid and invalid sources interleaved.
+SOURCES = [code for pair in zip([case[1] for case in test_suite], [case[1] for case in error_suite])
+           for code in pair] + [case[1] for case in test_suite[len(error_suite):]]
+
+
+def outputs(result):
+    return result.tac, result.asm, result.error
+
+
+@pytest.mark.parametrize('workers', (1, 2, 4))
+def test_results_come_back_in_input_order(workers):
+    results = compile_many(SOURCES, workers=workers, opt_level=1)
+    compiler = Compiler(opt_level=1)
+    assert [outputs(result) for result in results] == [outputs(compiler.compile(code)) for code in SOURCES]
+    failed = [i for i, result in enumerate(results) if not result.ok]
+    assert failed == [2 * i + 1 for i in range(len(error_suite))]
+    for i in failed:
+        assert results[i].asm is None and results[i].error
+
+
+def test_options_reach_every_worker():
+    results = compile_many([case[1] for case in test_suite], workers=2, opt_level=2, target='x86-64')
+    assert all(result.asm.startswith("default rel") for result in results)
+
+
+def test_an_exception_only_fails_its_unit(monkeypatch):
+    compile = Compiler.compile
+
+    def failing(self, text):
+        if text == "int crash;":
+            raise RuntimeError("internal failure")
+        return compile(self, text)
+
+    monkeypatch.setattr(Compiler, 'compile', failing)
+    results = compile_many(["int x; x = 1;", "int crash;", "int y; y = 2;"], workers=1)
+    assert [result.error for result in results] == [None, "RuntimeError: internal failure", None]
+    assert emulator.run(results[2].asm) == {'y': 2}
+
+
+def write_sources(directory):
+    paths = []
+    for name, code in (('one', "int x;\nx = 6 * 7;\n"), ('two', "int y;\ny = x;\n"), ('three', "int z;\nz = -5;\n")):
+        path = directory / f"{name}.c"
+        path.write_text(code)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('stream', (False, True))
+def test_command_line_writes_outputs_and_reports_failures(tmp_path, capsys, stream):
+    paths = write_sources(tmp_path)
+    output = tmp_path / 'out'
+    output.mkdir()
+    argv = ['-O', '1', '-j', '2', '-o', str(output)] + (['--stream'] if stream else []) + paths
+    assert main.compile_files(argv) == 1
+    assert sorted(os.listdir(output)) == ['one.asm', 'three.asm']
+    assert emulator.run((output / 'one.asm').read_text()) == {'x': 42}
+    assert emulator.run((output / 'three.asm').read_text()) == {'z': -5}
+    err = capsys.readouterr().err
+    assert f"{paths[1]}: Undeclared variable 'x'" in err
+    assert "1 of 3 files failed" in err
+
+
+def test_command_line_succeeds_next_to_the_sources(tmp_path, capsys):
+    paths = write_sources(tmp_path)
+    del paths[1]
+    assert main.compile_files(['--target', 'x86-64'] + paths) == 0
+    assert (tmp_path / 'one.asm').read_text().startswith("default rel")
+    assert (tmp_path / 'three.asm').exists() and not (tmp_path / 'two.asm').exists()
+    assert capsys.readouterr().err == ""
@@ -0,0 +1,122 @@
+import os
+import pickle
+
+import pytest
+
+from cache import CompileCache
+from compiler import REPORT, Compiler, compile_many
+from test_cases import pressure_suite, test_suite
+
+
+CODE = "int x; int y; x = 3; y = x * 4 + 1;"
+
+CASES = [(case[0], case[1]) for case in test_suite + pressure_suite]
+
+
+def outputs(result):
+    return result.tac, result.asm, result.error
+
+
+@pytest.mark.parametrize('name, code', CASES, ids=[case[0] for case in CASES])
+def test_cached_results_equal_uncached(name, code):
+    cache = CompileCache()
+    compiler = Compiler(opt_level=2, cache=cache)
+    expected = outputs(Compiler(opt_level=2).compile(code))
+    assert outputs(compiler.compile(code)) == expected
+    assert outputs(compiler.compile(code)) == expected
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+
+def test_errors_are_cached():
+    cache = CompileCache()
+    compiler = Compiler(cache=cache)
+    first = compiler.compile("int x; x = y;")
+    assert first.error
+    assert outputs(compiler.compile("int x; x = y;")) == outputs(first)
+    assert cache.stats['hits'] == 1
+
+
+def test_options_and_source_change_the_key():
+    cache = CompileCache()
+    for options in ({}, {'opt_level': 1}, {'target': 'x86-64'}, {'fused': False}, {'live_at_exit': ['y']}):
+        Compiler(cache=cache, **options).compile(CODE)
+    Compiler(cache=cache).compile(CODE + " x = 1;")
+    assert cache.stats['misses'] == 6 and cache.stats['hits'] == 0
+    assert cache.stats['entries'] == 6
+    Compiler(cache=cache, live_at_exit=['y']).compile(CODE)
+    assert cache.stats['hits'] == 1
+
+
+def test_results_are_shared_through_the_directory(tmp_path):
+    expected = outputs(Compiler(cache=CompileCache(directory=str(tmp_path))).compile(CODE))
+    assert any(files for _, _, files in os.walk(tmp_path))
+    cache = CompileCache(directory=str(tmp_path))
+    assert outputs(Compiler(cache=cache).compile(CODE)) == expected
+    assert cache.stats['disk hits'] == 1 and cache.stats['misses'] == 0
+    # The result read from disk is now in memory too.
+    Compiler(cache=cache).compile(CODE)
+    assert cache.stats['hits'] == 1
+
+
+def test_unreadable_files_are_misses(tmp_path):
+    cache = CompileCache(directory=str(tmp_path))
+    key = cache.key(CODE, {})
+    cache.put(key, ('tac', 'asm', None))
+    with open(cache.path(key), 'w') as f:
+        f.write("{not json")
+    cache.clear()
+    assert cache.get(key) is None
+    assert cache.stats['misses'] == 1
+
+
+def test_least_recently_used_results_are_evicted():
+    cache = CompileCache(max_bytes=30)
+    cache.put('a', ('a' * 10, None, None))
+    cache.put('b', ('b' * 10, None, None))
+    cache.put('c', ('c' * 10, None, None))
+    assert cache.get('a') is not None
+    cache.put('d', ('d' * 10, None, None))
+    assert list(cache.entries) == ['c', 'a', 'd']
+    assert cache.stats['bytes'] == 30 and cache.stats['evictions'] == 1
+    # A result larger than the memory tier is not kept in memory.
+    cache.put('e', ('e' * 31, None, None))
+    assert cache.get('e') is None
+
+
+def test_stats():
+    cache = CompileCache()
+    compiler = Compiler(cache=cache)
+    for _ in range(3):
+        compiler.compile(CODE)
+    stats = cache.stats
+    assert (stats['hits'], stats['disk hits'], stats['misses']) == (2, 0, 1)
+    assert stats['hit rate'] == pytest.approx(2 / 3)
+    assert stats['bytes'] == sum(len(text) for text in cache.entries[next(iter(cache.entries))] if text)
+
+
+def test_reports_bypass_the_cache(capsys):
+    cache = CompileCache()
+    Compiler(cache=cache, verbosity=REPORT).compile(CODE)
+    Compiler(cache=cache, report_optimizations=True).compile(CODE)
+    assert cache.stats['misses'] == 0 and cache.stats['entries'] == 0
+
+
+def test_pickled_copies_share_only_the_directory(tmp_path):
+    cache = CompileCache(max_bytes=1000, directory=str(tmp_path))
+    Compiler(cache=cache).compile(CODE)
+    copy = pickle.loads(pickle.dumps(cache))
+    assert (copy.max_bytes, copy.directory) == (1000, str(tmp_path))
+    assert copy.stats['entries'] == 0 and copy.stats['misses'] == 0
+    Compiler(cache=copy).compile(CODE)
+    assert copy.stats['disk hits'] == 1
+
+
+def test_workers_share_the_directory(tmp_path):
+    cache = CompileCache(directory=str(tmp_path))
+    sources = [code for _, code in CASES]
+    expected = [outputs(result) for result in compile_many(sources, workers=2)]
+    assert [outputs(result) for result in compile_many(sources, workers=2, cache=cache)] == expected
+    cache.clear()
+    for source, result in zip(sources, expected):
+        assert outputs(Compiler(cache=cache).compile(source)) == result
+    assert cache.stats['disk hits'] == len(set(sources))
@@ -1,5 +1,7 @@
 # test_cases.py
 
+import random
+
 test_suite = [
     # 1. Basic Assignments
     ("Assignment: Simple", "int x; x = 10;"),
@@ -76,3 +78,100 @@ error_suite = [
     ("Error: Invalid Operator Placement", "int c; c = 5 + * 3;"),
     ("Error: Invalid Assignment Target", "int d; 5 = d;"),
 ]
+
+
+# Programs that keep more values live than there are registers, with the
+# value each must leave in s. The expressions mix divisions, which tie up
+# eax and edx, with operands that stay live across most of the statement.
+pressure_suite = [
+    ("Pressure: Spilled Operand Outlives Slot Reuse", """
+        int v0 = 11; int v1 = -7; int v2 = 3; int v3 = 100; int v4 = -1; int v5 = 9;
+        int i; int s;
+        for (i = 0; i < 3; i++) {
+            s = s + ((v1 + ((v0 % -7) + ((((v4 + v4) - v1) * ((v2 - -3) * (v3 % 3))) % 8)))
+                - ((v0 - ((((v0 / v5) % 8) % 3) % 3))
+                - (v1 - (((v1 + (v3 * v4)) / v5) + ((v1 % v5) + ((5 / v5) * (v0 / -7)))))));
+            v5 = v5 + 1;
+        }
+    """, 9),
+    ("Pressure: Long-Lived Spill Across Divisions", """
+        int v0 = 5; int v1 = 100; int v2 = 9; int v3 = 100; int v4 = 5; int v5 = 11;
+        int i; int s;
+        for (i = 0; i < 3; i++) {
+            s = s + (((((((8 + 2) - (v4 % (v5 + 1))) * ((v2 / -7) % -7))
+                - (((v2 % 8) + (-2 - 7)) - ((v3 + v5) - (9 * v3))))
+                + ((((v1 * v5) % v5) - ((v3 / -7) / v5))
+                + (((2 / 8) + (-5 % -7)) * ((v1 / 8) / (v5 + 1)))))
+                - (((((v0 + v0) / v5) * ((8 / (v5 + 1)) - (-2 * v4))) % (v5 + 1))
+                + ((((v0 - v1) - (v0 % 8)) * ((v5 + v1) - (v2 - v3))) + (((v4 / 8) / v5) / -7))))
+                - ((((((v0 / v5) % 8) % 8) * (((v4 % 8) / v5) / -7))
+                - ((((v5 + v4) * (v5 - v1)) % -7) - (((v0 / v5) + (-5 / -7)) - ((v1 * v1) % 3))))
+                + (((((-1 - 3) % (v5 + 1)) / 8) + (((v2 / v5) / -7) * ((v0 + v2) - (v4 + v0))))
+                * ((((v1 - v4) + (v4 + v4)) - ((-6 - -4) * (v0 / v5))) % 8))));
+            v5 = v5 + 1;
+        }
+    """, 58533),
+]
+
+
+# Random programs over a few variables, with nested ifs, loops and every
+# operator, for checking that optimized code computes what -O0 code does.
+# Loop counters are never assigned in the body, so every loop ends.
+RANDOM_VARIABLES = ('a', 'b', 'c', 'd', 'e')
+
+
+def random_program(seed):
+    rng = random.Random(seed)
+
+    def expression(depth):
+        roll = rng.random()
+        if depth <= 0 or roll < 0.25:
+            return rng.choice(RANDOM_VARIABLES + (str(rng.randint(0, 9)),))
+        if roll < 0.3:
+            # Parenthesized, so a negation of a negation is not lexed as --.
+            return f"-({expression(depth - 1)})"
+        if roll < 0.4:
+            return f"({expression(depth - 1)})"
+        op = rng.choice('+-*+-/%')
+        right = expression(depth - 1)
+        if op in '/%' and rng.random() < 0.8:
+            right = rng.choice(('1', '2', '3', '4', '7', '8', '16', '-5', '(a * 0 + 6)', 'b'))
+        return f"{expression(depth - 1)} {op} {right}"
+
+    def condition():
+        relation = rng.choice(('<', '<=', '>', '>=', '==', '!='))
+        return f"{expression(2)} {relation} {expression(2)}"
+
+    def statement(depth, counters):
+        roll = rng.random()
+        target = rng.choice([v for v in RANDOM_VARIABLES if v not in counters])
+        if depth <= 0 or roll < 0.45:
+            kind = rng.random()
+            if kind < 0.1:
+                return f"{target}++;"
+            if kind < 0.15:
+                return f"{target}--;"
+            return f"{target} = {expression(rng.randint(1, 4))};"
+        if roll < 0.6:
+            return f"if ({condition()}) {{ {block(depth - 1, counters)} }}"
+        if roll < 0.75:
+            return (f"if ({condition()}) {{ {block(depth - 1, counters)} }} "
+                    f"else {{ {block(depth - 1, counters)} }}")
+        if roll < 0.9 and len(counters) < 2:
+            counter = rng.choice([v for v in RANDOM_VARIABLES if v not in counters])
+            bound = rng.choice((str(rng.randint(0, 4)), rng.choice(RANDOM_VARIABLES)))
+            start = rng.choice(('0', '1', rng.choice(RANDOM_VARIABLES)))
+            step = rng.choice((f"{counter}++", f"{counter}++", f"{counter} = {counter} + 2"))
+            inner = counters + (counter,)
+            body = block(depth - 1, inner)
+            if rng.random() < 0.5:
+                scaled = rng.choice([v for v in RANDOM_VARIABLES if v not in inner])
+                body = f"{scaled} = {rng.choice(RANDOM_VARIABLES)} + {counter} * {rng.randint(2, 9)}; {body}"
+            return f"for ({counter} = {start}; {counter} < {bound}; {step}) {{ {body} }}"
+        return f"{{ {block(depth - 1, counters)} }}"
+
+    def block(depth, counters):
+        return ' '.join(statement(depth, counters) for _ in range(rng.randint(1, 3)))
+
+    declarations = ' '.join(f"int {v} = {rng.randint(-5, 9)};" for v in RANDOM_VARIABLES)
+    return f"{declarations} {block(3, ())}"
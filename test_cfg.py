@@ -0,0 +1,138 @@
+import random
+
+import pytest
+
+import emulator
+from assembly_gen import AssemblyGenerator
+from cfg import ControlFlowGraph
+from compiler import Compiler
+from tac import parse_tac
+from test_cases import random_program, test_suite
+
+
+NESTED = """
+    int a; int b; int i; int j;
+    if (a < 1) { b = 1; } else { b = 2; }
+    for (i = 0; i < 3; i++) { for (j = 0; j < 2; j++) { b = b + j; } }
+"""
+
+
+def graph_of(code, opt_level=0):
+    return ControlFlowGraph(parse_tac(Compiler(opt_level=opt_level).compile(code).tac))
+
+
+def indexes(blocks):
+    return [block.index for block in blocks]
+
+
+def naive_dominators(graph):
+    # Every block's dominators by the textbook fixpoint over sets.
+    reachable = graph.reverse_postorder()
+    everything = {block.index for block in reachable}
+    dominators = {block.index: set(everything) for block in reachable}
+    dominators[graph.entry.index] = {graph.entry.index}
+    changed = True
+    while changed:
+        changed = False
+        for block in reachable[1:]:
+            preds = [dominators[pred.index] for pred in block.preds if pred.index in dominators]
+            new = set.intersection(*preds) | {block.index}
+            if new != dominators[block.index]:
+                dominators[block.index] = new
+                changed = True
+    return dominators
+
+
+def test_blocks_and_edges():
+    graph = graph_of(NESTED)
+    labels = [block.label for block in graph.blocks]
+    assert labels == [None, None, 'L1', 'L2', 'L3', 'L4', None, 'L5', 'L7', None, 'L8', 'L9', 'L6', None]
+    assert graph.exit is graph.blocks[-1] and not graph.exit.instructions
+    # The jump target comes before the fallthrough block.
+    assert indexes(graph.blocks[0].succs) == [2, 1]
+    assert indexes(graph.blocks[1].succs) == [3]
+    assert indexes(graph.blocks[4].succs) == [5]
+    assert indexes(graph.blocks[5].preds) == [4, 11]
+    assert indexes(graph.blocks[12].succs) == [13]
+
+
+def test_immediate_dominators():
+    graph = graph_of(NESTED)
+    graph.compute_dominators()
+    idoms = [block.idom.index if block.idom else None for block in graph.blocks]
+    assert idoms == [None, 0, 0, 1, 0, 4, 5, 5, 7, 8, 8, 9, 6, 12]
+    blocks = graph.blocks
+    assert graph.dominates(blocks[5], blocks[11])
+    assert not graph.dominates(blocks[2], blocks[4])
+    assert graph.dominates(blocks[3], blocks[3])
+
+
+def test_unreachable_blocks_have_no_dominator():
+    graph = ControlFlowGraph(parse_tac("MOV x, 1\nGOTO L1\nMOV x, 2\nL1:\nMOV y, x"))
+    graph.compute_dominators()
+    unreachable = graph.blocks[1]
+    assert unreachable.idom is None
+    assert not graph.dominates(graph.entry, unreachable)
+    assert graph.blocks[2].idom is graph.entry
+
+
+@pytest.mark.parametrize('opt_level', (0, 2))
+@pytest.mark.parametrize('seed', range(30))
+def test_dominators_match_the_set_definition(seed, opt_level):
+    graph = graph_of(random_program(seed), opt_level)
+    graph.compute_dominators()
+    dominators = naive_dominators(graph)
+    for block in graph.blocks:
+        if block.index not in dominators:
+            assert block.idom is None
+            continue
+        strict = dominators[block.index] - {block.index}
+        # The immediate dominator is the strict dominator every other one
+        # dominates.
+        idom = max(strict, key=lambda index: len(dominators[index]), default=None)
+        assert (block.idom.index if block.idom else None) == idom
+        for other in graph.blocks:
+            assert graph.dominates(other, block) == (other.index in dominators[block.index])
+
+
+def test_nested_loops_are_found():
+    graph = graph_of(NESTED)
+    graph.compute_dominators()
+    loops = graph.find_loops()
+    assert [(loop.header.label, loop.latch.label) for loop in loops] == [('L4', 'L9'), ('L7', 'L8')]
+    outer, inner = loops
+    assert outer.parent is None and inner.parent is outer
+    assert outer.contains(inner.header) and not inner.contains(outer.header)
+    for loop in loops:
+        assert graph.dominates(loop.header, loop.latch)
+
+
+def test_conditionals_are_not_loops():
+    graph = graph_of("int a; int b; if (a < 1) { b = 1; } else { if (a > 5) { b = 2; } }")
+    assert graph.find_loops() == []
+
+
+def test_rendering_in_the_original_order_is_unchanged():
+    code = parse_tac(Compiler().compile(NESTED).tac)
+    assert [instr.format() for instr in ControlFlowGraph(code).to_tac()] == [instr.format() for instr in code]
+
+
+CASES = [case[1] for case in test_suite] + [random_program(seed) for seed in range(30)]
+
+
+@pytest.mark.parametrize('code', CASES, ids=[str(i) for i in range(len(CASES))])
+def test_permuted_order_computes_the_same_values(code):
+    tac = Compiler().compile(code).tac
+    try:
+        expected = emulator.run(AssemblyGenerator().generate(parse_tac(tac)))
+    except (ZeroDivisionError, emulator.StepLimitExceeded):
+        pytest.skip("the program divides by zero or does not finish")
+    rng = random.Random(code)
+    for _ in range(3):
+        graph = ControlFlowGraph(parse_tac(tac))
+        labels = iter(f"P{i}" for i in range(len(graph.blocks)))
+        # The entry stays first, as that is where the program starts.
+        rest = graph.blocks[1:]
+        rng.shuffle(rest)
+        permuted = graph.to_tac([graph.entry] + rest, lambda: next(labels))
+        assert emulator.run(AssemblyGenerator().generate(permuted)) == expected
@@ -0,0 +1,131 @@
+import threading
+
+import ply.lex
+import pytest
+
+import emulator
+from compiler import Compiler
+from lexer import Lexer, TokenStream
+from test_cases import error_suite, random_program, test_suite
+from tracing import REPORT, EventLog
+
+
+CODE = "int x; int y; x = 1; if (x < 2) { y = x + 1; } // done"
+
+
+def count_lexing(monkeypatch):
+    # How many times a source text is handed to a lexer, and how many
+    # tokens lexers produce.
+    counts = {'input': 0, 'token': 0}
+    lex_input = ply.lex.Lexer.input
+    lex_token = ply.lex.Lexer.token
+
+    def counted_input(self, text):
+        counts['input'] += bool(text)
+        return lex_input(self, text)
+
+    def counted_token(self):
+        tok = lex_token(self)
+        counts['token'] += tok is not None
+        return tok
+
+    monkeypatch.setattr(ply.lex.Lexer, 'input', counted_input)
+    monkeypatch.setattr(ply.lex.Lexer, 'token', counted_token)
+    return counts
+
+
+def test_token_report_lexes_the_source_once(monkeypatch, capsys):
+    quiet = Compiler()
+    report = Compiler(verbosity=REPORT)
+    counts = count_lexing(monkeypatch)
+    expected = quiet.compile(CODE)
+    quiet_counts = dict(counts)
+    counts.update(input=0, token=0)
+    result = report.compile(CODE)
+    assert "TOKENIZATION" in capsys.readouterr().out
+    assert counts == quiet_counts == {'input': 1, 'token': 24}
+    assert (result.tac, result.asm) == (expected.tac, expected.asm)
+
+
+def test_token_report_lists_every_token(capsys):
+    Compiler(verbosity=REPORT).compile("int x; x = (x + 1) * 2;")
+    out = capsys.readouterr().out
+    report = out.split("PARSING AND SEMANTIC ANALYSIS")[0]
+    assert report.count("Punctuation: ;") == 2
+    assert report.count("Parenthesis:") == 2
+    assert "Arithmetic Operator: +" in report and "Arithmetic Operator: *" in report
+    assert "Relational/Assignment Operator: =" in report
+
+
+def test_token_stream_replays_what_it_has_read():
+    lexer = Lexer().build(optimize=True)
+    stream = TokenStream(lexer, "int x; x = 5;")
+    listed = [(tok.type, tok.value) for tok in stream]
+    assert listed[:3] == [('INT', 'int'), ('ID', 'x'), ('SEMICOLON', ';')]
+    assert [(tok.type, tok.value) for tok in stream] == listed
+    pulled = []
+    while True:
+        tok = stream.token()
+        if tok is None:
+            break
+        pulled.append((tok.type, tok.value))
+    assert pulled == listed
+
+
+SOURCES = [case[1] for case in test_suite + error_suite] + [random_program(seed) for seed in range(40)]
+
+
+def outputs(result):
+    return result.tac, result.asm, result.error
+
+
+def run_threads(compiler, threads, rounds):
+    # Every thread compiles the sources in its own order, starting together,
+    # so compilations of different programs overlap on the one compiler.
+    barrier = threading.Barrier(threads)
+    results = [{} for _ in range(threads)]
+    failures = []
+
+    def work(number):
+        order = SOURCES[number:] + SOURCES[:number]
+        try:
+            barrier.wait()
+            for _ in range(rounds):
+                for source in order:
+                    results[number].setdefault(source, set()).add(outputs(compiler.compile(source)))
+        except Exception as error:
+            failures.append(error)
+
+    workers = [threading.Thread(target=work, args=(number,)) for number in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert failures == []
+    return results
+
+
+@pytest.mark.parametrize('opt_level', (0, 2))
+def test_threads_sharing_a_compiler_get_their_own_results(opt_level):
+    expected = {source: outputs(Compiler(opt_level=opt_level).compile(source)) for source in SOURCES}
+    compiler = Compiler(opt_level=opt_level, fast_startup=True)
+    for results in run_threads(compiler, 8, 3):
+        assert results == {source: {output} for source, output in expected.items()}
+    # Each running compilation had a context of its own, and they are all
+    # back in the pool.
+    assert 0 < len(compiler.contexts) <= 8
+    assert len({id(context) for context in compiler.contexts}) == len(compiler.contexts)
+    for source in SOURCES[:len(test_suite)]:
+        result = compiler.compile(source)
+        assert result.ok
+        assert emulator.run(result.asm, limit=10 ** 6) == emulator.run(Compiler().compile(source).asm, limit=10 ** 6)
+
+
+def test_shared_trace_gets_every_threads_events():
+    sequential = EventLog()
+    compiler = Compiler(trace=sequential)
+    for source in SOURCES:
+        compiler.compile(source)
+    shared = EventLog()
+    run_threads(Compiler(trace=shared), 4, 1)
+    assert len(shared.events) == 4 * len(sequential.events)
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+import emulator
+from assembly_gen import TARGETS, AssemblyGenerator, division_magic
+from compiler import Compiler
+from tac import parse_tac
+
+
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+rng = random.Random(18)
+
+DIVISORS = sorted(
+    set(range(-40, 41)) - {0}
+    | {2 ** k for k in range(31)} | {-2 ** k for k in range(32)}
+    | {INT_MAX, -INT_MAX, 641, 1000000007, -1000000007, 12345, 3 ** 19, -3 ** 19, 7 * 2 ** 20}
+    | {rng.randint(INT_MIN, INT_MAX) for _ in range(60)} - {0}
+)
+
+DIVIDENDS = ([0, 1, -1, 7, -7, 100, -100, INT_MAX, INT_MIN, INT_MIN + 1]
+             + [rng.randint(INT_MIN, INT_MAX) for _ in range(8)])
+
+
+def truncating_divmod(n, d):
+    # C division: the quotient truncates toward zero and the remainder has
+    # the sign of the dividend.
+    quotient = n // d
+    if quotient < 0 and quotient * d != n:
+        quotient += 1
+    return quotient, n - quotient * d
+
+
+def dividends_for(divisor):
+    # The fixed dividends, and the ones around multiples of the divisor,
+    # where an estimate that is off by one shows.
+    values = set(DIVIDENDS)
+    for k in (1, 2, 3, INT_MAX // abs(divisor)):
+        for multiple in (k * divisor, -k * divisor):
+            values.update(v for v in (multiple - 1, multiple, multiple + 1) if INT_MIN <= v <= INT_MAX)
+    return sorted(values)
+
+
+def magic_quotient(n, divisor):
+    # The quotient as the generated code computes it: the high half of the
+    # 64-bit product, corrected by the dividend when the magic number's
+    # sign differs from the divisor's, shifted, plus one if negative.
+    magic, shift = division_magic(divisor)
+    high = (n * magic) >> 32
+    if divisor > 0 and magic < 0:
+        high += n
+    elif divisor < 0 and magic > 0:
+        high -= n
+    high >>= shift
+    return high + (high < 0)
+
+
+@pytest.mark.parametrize('divisor', [d for d in DIVISORS if abs(d) & (abs(d) - 1)])
+def test_division_magic(divisor):
+    magic, shift = division_magic(divisor)
+    assert INT_MIN <= magic <= INT_MAX and 0 <= shift < 32
+    for n in dividends_for(divisor):
+        assert magic_quotient(n, divisor) == truncating_divmod(n, divisor)[0], n
+
+
+def divide_program(divisor, dividends, pressure):
+    # TAC storing n / divisor and n % divisor for each dividend. With
+    # pressure, the dividend and a value computed from it stay live across
+    # the division, so eax and edx are busy.
+    lines = []
+    temp = 0
+    for i, n in enumerate(dividends):
+        lines.append(f"MOV x{i}, {n}")
+        first = temp + 1
+        temp += 5
+        t = [f"t{k}" for k in range(first, first + 5)]
+        lines.append(f"{t[0]} = x{i}")
+        if pressure:
+            lines.append(f"{t[1]} = {t[0]} + 1")
+        lines.append(f"{t[2]} = {t[0]} / {divisor}")
+        lines.append(f"{t[3]} = {t[0]} % {divisor}")
+        lines.append(f"MOV quo{i}, {t[2]}")
+        lines.append(f"MOV rem{i}, {t[3]}")
+        if pressure:
+            lines.append(f"{t[4]} = {t[1]} + {t[2]}")
+            lines.append(f"MOV sum{i}, {t[4]}")
+    return '\n'.join(lines)
+
+
+@pytest.mark.parametrize('pressure', (False, True))
+@pytest.mark.parametrize('target', ('x86', 'x86-64'))
+@pytest.mark.parametrize('divisor', DIVISORS)
+def test_generated_division_by_constant(divisor, target, pressure):
+    dividends = [n for n in dividends_for(divisor) if not (n == INT_MIN and divisor == -1)]
+    code = parse_tac(divide_program(divisor, dividends, pressure))
+    asm = AssemblyGenerator(peephole=True, target=TARGETS[target]).generate(code)
+    assert 'idiv' not in asm
+    values = emulator.run(asm)
+    for i, n in enumerate(dividends):
+        quotient, remainder = truncating_divmod(n, divisor)
+        assert (values[f"quo{i}"], values[f"rem{i}"]) == (quotient, remainder), n
+        if pressure:
+            assert values[f"sum{i}"] == emulator.signed(n + 1 + quotient)
+
+
+def test_division_by_variables_matches_constants():
+    code = "int a = -17; int b = 5; int q; int r; int c; int d; q = a / b; r = a % b; c = a / 5; d = a % 5;"
+    for opt_level in (0, 1, 2):
+        values = emulator.run(Compiler(opt_level=opt_level).compile(code).asm)
+        assert (values['q'], values['r'], values['c'], values['d']) == (-3, -2, -3, -2)
@@ -0,0 +1,156 @@
+import random
+
+import pytest
+
+import emulator
+from compiler import Compiler
+from incremental import IncrementalCompiler
+from test_cases import error_suite, pressure_suite, random_program, test_suite
+
+
+CASES = [(case[0], case[1]) for case in test_suite + error_suite + pressure_suite]
+
+LEVELS = (0, 1, 2)
+
+
+def outputs(result):
+    return result.tac, result.asm, result.error
+
+
+def results(result):
+    # The variables the program leaves, or None when it divides by zero or
+    # does not finish, where the optimizer may change what happens.
+    try:
+        values = emulator.run(result.asm)
+    except (ZeroDivisionError, emulator.StepLimitExceeded):
+        return None
+    return {name: value for name, value in values.items() if '@' not in name}
+
+
+def check(compiler, text):
+    full = Compiler(opt_level=compiler.compiler.opt_level).compile(text)
+    result = compiler.compile(text)
+    assert result.error == full.error, text
+    if full.error is None:
+        expected = results(full)
+        if expected is not None:
+            assert results(result) == expected, text
+
+
+@pytest.mark.parametrize('name, code', CASES, ids=[case[0] for case in CASES])
+def test_first_version_equals_full_compile(name, code):
+    assert outputs(IncrementalCompiler().compile(code)) == outputs(Compiler().compile(code))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_first_version_equals_full_compile(seed):
+    code = random_program(seed).replace('; ', ';\n')
+    assert outputs(IncrementalCompiler().compile(code)) == outputs(Compiler().compile(code))
+
+
+EDITS = [
+    # A constant changed.
+    lambda rng, text, other: change_digit(rng, text),
+    # A line deleted, or one from another program inserted.
+    lambda rng, text, other: splice(rng, text, []),
+    lambda rng, text, other: splice(rng, text, [rng.choice(other)]),
+    # Comments and strings opened or closed anywhere, reaching past the
+    # statements the edit is in.
+    lambda rng, text, other: insert(rng, text, rng.choice(("/*", "*/", "//", '"', "\\"))),
+    # A declaration removed or repeated.
+    lambda rng, text, other: text.replace("int ", "", 1),
+    lambda rng, text, other: "int a;\n" + text,
+]
+
+
+def change_digit(rng, text):
+    digits = [i for i, char in enumerate(text) if char.isdigit()]
+    if not digits:
+        return text
+    i = rng.choice(digits)
+    return text[:i] + str(rng.randrange(10)) + text[i + 1:]
+
+
+def splice(rng, text, lines):
+    current = text.split('\n')
+    i = rng.randrange(len(current))
+    return '\n'.join(current[:i] + lines + current[i + bool(not lines):])
+
+
+def insert(rng, text, piece):
+    i = rng.randrange(len(text) + 1)
+    return text[:i] + piece + text[i:]
+
+
+@pytest.mark.parametrize('opt_level', LEVELS)
+@pytest.mark.parametrize('seed', range(15))
+def test_edits_match_full_compile(seed, opt_level):
+    rng = random.Random(seed)
+    original = random_program(seed).replace('; ', ';\n')
+    other = random_program(seed + 1000).replace('; ', ';\n').split('\n')
+    compiler = IncrementalCompiler(opt_level=opt_level)
+    text = original
+    check(compiler, text)
+    for step in range(12):
+        # Every few edits, go back to a version that compiles.
+        text = original if step % 4 == 3 else rng.choice(EDITS)(rng, text, other)
+        check(compiler, text)
+
+
+def test_errors_are_reported_and_recovered_from():
+    compiler = IncrementalCompiler()
+    text = "int x;\nint y;\nx = 1;\ny = x + 2;\n"
+    assert compiler.compile(text).ok
+    for broken in ("int x;\nint y;\nx = 1;\ny = z + 2;\n",
+                   "int x;\nint y;\nx = 1\ny = x + 2;\n",
+                   "int x;\nint y;\n/* x = 1;\ny = x + 2;\n",
+                   "int x;\nint x;\nx = 1;\ny = x + 2;\n"):
+        result = compiler.compile(broken)
+        assert result.error == Compiler().compile(broken).error is not None
+    result = compiler.compile(text)
+    assert outputs(result)[2] is None
+    assert emulator.run(result.asm) == {'x': 1, 'y': 3}
+
+
+def test_comment_opened_and_closed_across_statements():
+    compiler = IncrementalCompiler()
+    text = "int x;\nx = 1;\nx = x + 1;\nx = x * 5;\n"
+    for edited in (text.replace("x = x + 1;", "/* x = x + 1;"),
+                   text.replace("x = x + 1;", "/* x = x + 1; */"),
+                   text.replace("x = x + 1;", "// x = x + 1;"),
+                   text):
+        check(compiler, edited)
+    assert emulator.run(compiler.compile(text.replace("x = 1;", "/* x = 1; */")).asm) == {'x': 5}
+
+
+@pytest.mark.parametrize('opening, closing', [('/*', '*/'), ('"', '"')])
+def test_delimiters_closed_by_a_later_edit(opening, closing):
+    # The second edit closes a comment or string the first one opened, in
+    # text the second edit does not touch.
+    compiler = IncrementalCompiler()
+    text = "int x;\nint y;\nx = 1;\ny = 2;\nx = x + y;\n"
+    check(compiler, text)
+    opened = text.replace("x = 1;", opening + "x = 1;")
+    check(compiler, opened)
+    check(compiler, opened.replace("y = 2;", "y = 2;" + closing))
+    check(compiler, text)
+
+
+def test_one_line_edit_redoes_little():
+    lines = ["int x;", "int y;"] + [f"x = x + {i};\ny = y + x * 2;" for i in range(200)]
+    text = '\n'.join(lines)
+    compiler = IncrementalCompiler()
+    assert compiler.compile(text).ok
+    assert compiler.reparsed == compiler.reanalyzed == len(compiler.statements)
+    edited = text.replace("x = x + 100;", "x = x + 7;")
+    result = compiler.compile(edited)
+    assert compiler.reparsed <= 2 and compiler.reanalyzed <= 2
+    assert emulator.run(result.asm) == emulator.run(Compiler().compile(edited).asm)
+    # An initializer added to a declaration leaves the name's type as it
+    # was, so the statements using it keep their code.
+    result = compiler.compile(edited.replace("int y;", "int y = 4;"))
+    assert compiler.reparsed <= 2 and compiler.reanalyzed <= 3
+    assert emulator.run(result.asm) == emulator.run(Compiler().compile(edited.replace("int y;", "int y = 4;")).asm)
+    # Without the declaration, the first use is an error.
+    removed = edited.replace("int y;", "")
+    assert compiler.compile(removed).error == Compiler().compile(removed).error is not None
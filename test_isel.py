@@ -0,0 +1,101 @@
+import pytest
+
+import assembly_gen
+import emulator
+from assembly_gen import AssemblyGenerator, TARGETS
+from compiler import Compiler
+from isel import select_operands
+from tac import parse_tac
+from test_cases import random_program, test_suite
+
+
+def select(text):
+    return [instr.format() for instr in select_operands(parse_tac(text))]
+
+
+def body(asm):
+    # The instructions between the entry point and the exit sequence.
+    lines = [line.strip() for line in asm.split('_start:')[1].split('; Exit program')[0].split('\n')]
+    return [line for line in lines if line]
+
+
+def generate(text, target='x86'):
+    return AssemblyGenerator(target=TARGETS[target]).generate(parse_tac(text))
+
+
+def test_leaves_are_folded_into_their_user():
+    assert select("t1 = x\nt2 = 5\nt3 = t1 + t2\nMOV y, t3") == ["t3 = x + 5", "MOV y, t3"]
+    assert select("t1 = i\nt2 = 5\nIF t1 < t2 GOTO L1") == ["IF i < 5 GOTO L1"]
+
+
+def test_temporaries_read_twice_are_kept():
+    assert select("t1 = x\nt2 = t1 * t1\nMOV y, t2") == ["t1 = x", "t2 = t1 * t1", "MOV y, t2"]
+
+
+def test_reads_are_not_moved_past_stores():
+    assert select("t1 = x\nMOV x, 3\nt2 = t1 + 1\nMOV y, t2") == ["t1 = x", "MOV x, 3", "t2 = t1 + 1", "MOV y, t2"]
+
+
+def test_leaves_do_not_cross_labels():
+    assert select("t1 = x\nL1:\nt2 = t1 + 1\nMOV y, t2") == ["t1 = x", "L1:", "t2 = t1 + 1", "MOV y, t2"]
+
+
+def test_updates_take_only_their_own_variable():
+    assert select("t1 = x\nADD x, t1, 1") == ["ADD x, x, 1"]
+    assert select("t1 = y\nADD x, x, t1") == ["t1 = y", "ADD x, x, t1"]
+
+
+def test_memory_and_immediate_operands_are_used():
+    lines = body(Compiler().compile("int x; int y; y = x + 5; if (x < 5) { y = y - x; }").asm)
+    assert "add eax, 5" in lines
+    assert "cmp dword [x], 5" in lines
+    assert "sub eax, [x]" in lines
+    # No register is loaded with a constant.
+    assert not any(line.startswith('mov') and line.split()[-1].isdigit() for line in lines), lines
+
+
+@pytest.mark.parametrize('text, form', [
+    ("t1 = x\nt2 = t1 + 1\nt3 = t2 * 5\nMOV y, t3", "lea eax, [eax + eax*4]"),
+    ("t1 = x\nt2 = t1 + 1\nt3 = t2 - 7\nMOV y, t3\nMOV z, t2", "lea ebx, [eax - 7]"),
+    ("t1 = x\nt2 = y\nt6 = t2 + 1\nt3 = t6 * 4\nt4 = t1 + t3\nt5 = t4 + t1\nMOV z, t5\nMOV w, t4\nMOV v, t6",
+     "lea ecx, [eax + ebx*4]"),
+])
+def test_address_arithmetic_uses_lea(text, form):
+    asm = generate(text)
+    assert form in body(asm)
+    assert emulator.run(asm) == emulator.run(generate_unselected(text))
+
+
+def generate_unselected(text):
+    # The code generated for every operand in a register of its own.
+    select = assembly_gen.select_operands
+    assembly_gen.select_operands = list
+    try:
+        return generate(text)
+    finally:
+        assembly_gen.select_operands = select
+
+
+@pytest.mark.parametrize('opt_level', (0, 1, 2))
+@pytest.mark.parametrize('target', sorted(TARGETS))
+@pytest.mark.parametrize('seed', range(30))
+def test_selection_keeps_program_results(seed, target, opt_level, monkeypatch):
+    code = random_program(seed)
+    result = Compiler(opt_level=opt_level, target=target).compile(code)
+    try:
+        selected = emulator.run(result.asm)
+    except (ZeroDivisionError, emulator.StepLimitExceeded):
+        pytest.skip("the program divides by zero or does not finish")
+    monkeypatch.setattr(assembly_gen, 'select_operands', list)
+    unselected = Compiler(opt_level=opt_level, target=target).compile(code)
+    assert emulator.run(unselected.asm) == selected
+
+
+@pytest.mark.parametrize('name, code', test_suite, ids=[case[0] for case in test_suite])
+def test_selection_saves_register_loads(name, code):
+    tac = Compiler().compile(code).tac
+    assert register_loads(generate(tac)) <= register_loads(generate_unselected(tac))
+
+
+def register_loads(asm):
+    return sum(line.startswith('mov') and not line.split()[1].startswith('[') for line in body(asm))
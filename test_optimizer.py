@@ -0,0 +1,274 @@
+import sys
+
+import pytest
+
+import emulator
+from assembly_gen import TARGETS
+from compiler import Compiler
+from optimizer import INT_MIN, Optimizer, evaluate
+from tac import Op, parse_tac
+from test_cases import random_program, test_suite
+
+
+# The values the test suite's comments give for each case.
+EXPECTED = {
+    "Assignment: Simple": {'x': 10},
+    "Assignment: Simple Expression": {'y': 8},
+    "Assignment: Negative Value": {'z': -100},
+    "Operators: Precedence 1": {'a': 20},
+    "Operators: Precedence 2 (Parens)": {'b': 30},
+    "Operators: Subtraction Order": {'c': 5},
+    "Operators: Division": {'d': 5},
+    "Operators: Modulo": {'e': 1},
+    "Operators: All": {'f': 58},
+    "Conditionals: Simple If (True)": {'g': 1},
+    "Conditionals: Simple If (False)": {'h': 10},
+    "Conditionals: If-Else (If path)": {'i': 100},
+    "Conditionals: If-Else (Else path)": {'j': 200},
+    "Conditionals: Negative Condition (True)": {'k': 99},
+    "Conditionals: Negative Condition (False)": {'l': -99},
+    "Loops: Simple For": {'m': 10},
+    "Loops: Nested For": {'n': 9},
+    "Loops: For with If": {'o': 6},
+    "Edge Case: Loop That Does Not Run": {'p': 100},
+    "Edge Case: Uninitialized Variable Use": {'r': 5},
+}
+
+LEVELS = (0, 1, 2)
+
+RANDOM_SEEDS = range(60)
+
+
+def run(code, opt_level=0, target='x86', **options):
+    result = Compiler(opt_level=opt_level, target=target, **options).compile(code)
+    assert result.ok, result.error
+    return emulator.run(result.asm)
+
+
+def reference(code):
+    # The variables the -O0 code leaves, or None when it divides by zero or
+    # does not finish, which the optimizer is free to change.
+    try:
+        values = run(code)
+    except (ZeroDivisionError, emulator.StepLimitExceeded):
+        return None
+    # Shadowing declarations are stored under renamed variables that are
+    # out of scope, and may be optimized away, once the program ends.
+    return {name: value for name, value in values.items() if '@' not in name}
+
+
+def optimize(text, level=1, **options):
+    return Optimizer(level, **options).optimize(parse_tac(text))
+
+
+@pytest.mark.parametrize('opt_level', LEVELS)
+@pytest.mark.parametrize('target', sorted(TARGETS))
+@pytest.mark.parametrize('name, code', test_suite, ids=[case[0] for case in test_suite])
+def test_suite_results(name, code, opt_level, target):
+    values = run(code, opt_level, target)
+    for variable, expected in EXPECTED[name].items():
+        assert values[variable] == expected
+
+
+@pytest.mark.parametrize('seed', RANDOM_SEEDS)
+def test_random_programs_match_unoptimized(seed):
+    code = random_program(seed)
+    expected = reference(code)
+    if expected is None:
+        pytest.skip("the unoptimized program divides by zero or does not finish")
+    for target in sorted(TARGETS):
+        for opt_level in LEVELS:
+            values = run(code, opt_level, target)
+            assert {name: values.get(name) for name in expected} == expected, (target, opt_level, code)
+
+
+def test_random_programs_compile():
+    compiler = Compiler(fast_startup=True)
+    for seed in range(1000):
+        result = compiler.compile(random_program(seed))
+        assert result.ok, (seed, result.error)
+
+
+def test_evaluate_wraps_and_truncates_like_c():
+    assert evaluate(Op.ADD, 2 ** 31 - 1, 1) == INT_MIN
+    assert evaluate(Op.MUL, 65536, 65536) == 0
+    assert evaluate(Op.DIV, -7, 2) == -3
+    assert evaluate(Op.MOD, -7, 2) == -1
+    assert evaluate(Op.MOD, 7, -2) == 1
+    assert evaluate(Op.DIV, INT_MIN, -1) == INT_MIN
+    assert evaluate(Op.DIV, 1, 0) is None
+    assert evaluate(Op.ADD, 'x', 1) is None
+
+
+def test_operators_fold_to_constants():
+    tac = Compiler(opt_level=1).compile("int f; f = (10 + (20 / 2)) * 3 - 5 % 3;").tac
+    assert tac == "MOV f, 58"
+
+
+def test_identities_are_simplified():
+    code = optimize("t1 = x * 1\nt2 = t1 + 0\nt3 = t2 - 0\nt4 = t3 / 1\nMOV y, t4\nt5 = x * 0\nMOV z, t5")
+    assert [instr.format() for instr in code] == ["t1 = x", "MOV y, t1", "MOV z, 0"]
+
+
+def test_division_by_zero_is_not_folded():
+    code = optimize("t1 = 1\nt2 = 0\nt3 = t1 / t2\nMOV y, t3")
+    assert any(instr.op == Op.DIV for instr in code)
+
+
+def tac_lines(code, opt_level=1):
+    return Compiler(opt_level=opt_level).compile(code).tac.split('\n')
+
+
+def test_branch_over_jump_is_inverted():
+    lines = tac_lines("int s; if (s > 3) { s = 1; } else { s = 2; } if (s == 1) { s = 5; }")
+    for line, following in zip(lines, lines[1:]):
+        assert not (line.startswith('IF') and following.startswith('GOTO')), lines
+
+
+def test_jumps_to_jumps_are_threaded():
+    code = Optimizer(1).optimize_jumps(parse_tac(
+        "IF x < 1 GOTO L1\nGOTO L2\nL1:\nMOV y, 1\nL2:\nGOTO L3\nL4:\nMOV y, 2\nL3:\nMOV z, y"))
+    lines = [instr.format() for instr in code]
+    assert lines[0] == "IF x >= 1 GOTO L3"
+    assert "L1:" not in lines and "L2:" not in lines
+
+
+def test_loops_are_tested_at_the_bottom():
+    lines = tac_lines("int n; int i; int s; for (i = 0; i < n; i++) { s = s + i; }")
+    assert not any(line.startswith('GOTO') for line in lines), lines
+    # One conditional jump before the loop skips it, and one at the bottom
+    # goes back to its first instruction.
+    branches = [line for line in lines if line.startswith('IF')]
+    assert len(branches) == 2
+    top = branches[1].split()[-1]
+    assert lines.index(top + ':') < lines.index(branches[1])
+
+
+def test_overwritten_stores_are_removed():
+    assert tac_lines("int x; int y; x = 1; x = 2; y = x;", 2) == ["MOV x, 2", "MOV y, 2"]
+
+
+def test_only_live_at_exit_variables_are_stored():
+    code = "int x; int y; x = 1; y = x + 1; x = 7;"
+    assert Compiler(opt_level=2, live_at_exit=['y']).compile(code).tac == "MOV y, 2"
+    assert run(code, 2, live_at_exit=['y'])['y'] == 2
+
+
+def test_unreachable_code_is_removed():
+    code = Optimizer(2).eliminate_dead_code(parse_tac("MOV x, 1\nGOTO L1\nMOV x, 2\nMOV y, 3\nL1:\nMOV z, x"))
+    assert [instr.format() for instr in code] == ["MOV x, 1", "GOTO L1", "L1:", "MOV z, x"]
+
+
+def test_report_counts_removed_instructions(capsys):
+    Compiler(opt_level=2, report_optimizations=True).compile("int x; int y; x = 1; x = 2; y = x;")
+    assert "Removed 4 of 6 TAC instructions" in capsys.readouterr().out
+
+
+def test_repeated_subexpressions_are_computed_once():
+    lines = tac_lines("int i; int a; int b; a = (i % 2) + 1; b = (i % 2) * 3;")
+    assert sum('%' in line for line in lines) == 1
+    assert sum(line.endswith('= i') for line in lines) == 1
+
+
+def test_repeated_loads_are_shared():
+    lines = tac_lines("int x; int a; a = x * x + x;")
+    assert lines == ["t1 = x", "t3 = t1 * t1", "t5 = t3 + t1", "MOV a, t5"]
+
+
+def test_a_store_invalidates_the_loaded_value():
+    lines = tac_lines("int x; int a; int b; a = x + 1; x = 5; b = x + 1;")
+    assert lines[-2:] == ["MOV x, 5", "MOV b, 6"]
+
+
+def calls_per_loop(monkeypatch, loops):
+    # The function calls reduce_strength makes on a program of many loops
+    # that share their counter, per loop. Counting calls rather than timing
+    # them keeps the measure the same from run to run.
+    calls = 0
+    reduce_strength = Optimizer.reduce_strength
+
+    def profile(frame, event, arg):
+        nonlocal calls
+        if event in ('call', 'c_call'):
+            calls += 1
+
+    def counted(self, code):
+        sys.setprofile(profile)
+        try:
+            return reduce_strength(self, code)
+        finally:
+            sys.setprofile(None)
+
+    monkeypatch.setattr(Optimizer, 'reduce_strength', counted)
+    code = "int i; int s;\n" + "for (i = 0; i < 10; i++) { s = s + i * 4; }\n" * loops
+    assert Compiler(opt_level=2, fast_startup=True).compile(code).ok
+    monkeypatch.undo()
+    return calls / loops
+
+
+def test_strength_reduction_work_grows_linearly(monkeypatch):
+    # Matching every step of a counter against every loop that reduced a
+    # product of it made the work per loop grow with the number of loops.
+    small = calls_per_loop(monkeypatch, 250)
+    large = calls_per_loop(monkeypatch, 2000)
+    assert large < 1.2 * small, f"{small:.0f} calls per loop at 250 loops, {large:.0f} at 2000"
+
+
+def loop_body(lines):
+    # The instructions of the last loop: from the label a backward branch
+    # goes to, up to and including the branch.
+    for end in range(len(lines) - 1, -1, -1):
+        if lines[end].startswith('IF'):
+            label = lines[end].split()[-1] + ':'
+            if label in lines[:end]:
+                return lines[lines.index(label):end + 1]
+    return []
+
+
+LOOP = "int n; int a; int b; int i; int s; for (i = 0; i < n; i++) { s = s + a * b + i * 4; }"
+
+
+def test_invariants_are_hoisted_out_of_loops():
+    lines = tac_lines(LOOP, 2)
+    body = loop_body(lines)
+    assert body
+    assert not any(line.endswith(('= a', '= b', '= n')) for line in body), body
+    assert sum('*' in line for line in lines) == 1
+
+
+def test_induction_variable_multiplication_is_reduced():
+    body = loop_body(tac_lines(LOOP, 2))
+    assert not any('*' in line for line in body), body
+
+
+@pytest.mark.parametrize('target', sorted(TARGETS))
+def test_nested_loop_results(target):
+    code = """
+        int n = 6; int m = 4; int i; int j; int s; int k = 3;
+        for (i = 0; i < n; i++) {
+            for (j = 1; j < m; j = j + 2) { s = s + i * 4 + j * k; }
+        }
+    """
+    expected = sum(i * 4 + j * 3 for i in range(6) for j in range(1, 4, 2))
+    for opt_level in LEVELS:
+        assert run(code, opt_level, target)['s'] == expected
+
+
+def asm_loop_body(asm):
+    lines = [line.strip() for line in asm.split('\n')]
+    for end in range(len(lines) - 1, -1, -1):
+        parts = lines[end].split()
+        if len(parts) == 2 and parts[0].startswith('j') and parts[1] + ':' in lines[:end]:
+            return lines[lines.index(parts[1] + ':'):end + 1]
+    return []
+
+
+@pytest.mark.parametrize('target', sorted(TARGETS))
+def test_loop_variables_stay_in_registers(target):
+    loop = "int i; int s; int t; for (i = 0; i < n; i++) { s = s + i; t = t + s; }"
+    body = asm_loop_body(Compiler(opt_level=2, target=target).compile("int n; " + loop).asm)
+    assert body
+    # lea only computes an address; every other bracket is a memory access.
+    assert not any('[' in line for line in body if not line.startswith('lea')), body
+    values = run("int n = 7; " + loop, 2, target)
+    assert (values['i'], values['s'], values['t']) == (7, 21, 56)
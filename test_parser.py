@@ -0,0 +1,35 @@
+from lexer import Lexer
+from parser import Parser
+
+
+def flat_program(statements):
+    return "int x;\n" + "x = x + 1;\n" * (statements - 1)
+
+
+def list_elements_built(statements):
+    # The elements put into new lists by the statement list reductions while
+    # parsing a flat program. Extending the list in place builds one list
+    # per program; copying it on every reduction builds a list per
+    # statement, each as long as the program so far. Counting them rather
+    # than timing the parse keeps the measure the same from run to run.
+    built = 0
+    template = Parser(None).build(optimize=True)
+    parser = Parser(None)
+    reduce = parser.p_statement_list
+
+    def counted(p):
+        nonlocal built
+        extended = p[1] if len(p) == 3 else None
+        reduce(p)
+        if p[0] is not extended:
+            built += len(p[0])
+
+    parser.p_statement_list = counted
+    lexer = Lexer().build(optimize=True)
+    program = parser.bind(template).parse(flat_program(statements), lexer=lexer)
+    assert len(program.statements) == statements
+    return built
+
+
+def test_statement_lists_are_built_in_linear_time():
+    assert list_elements_built(5000) == list_elements_built(40000) == 1
@@ -0,0 +1,69 @@
+import pytest
+
+import emulator
+from assembly_gen import AssemblyGenerator
+from compiler import Compiler
+from peephole import RULES, Peephole
+from tac import parse_tac
+from test_cases import random_program
+
+
+def listing(text):
+    return [f"    {line}" if not line.endswith(':') else line for line in text.split('\n')]
+
+
+REWRITES = [
+    ("self moves removed", "mov eax, eax\nadd ebx, 1", "add ebx, 1"),
+    ("move chains collapsed", "mov eax, [x]\nmov ebx, eax\nmov eax, 2", "mov ebx, [x]\nmov eax, 2"),
+    ("stores forwarded to loads", "mov [v], eax\nmov ebx, [v]", "mov [v], eax\nmov ebx, eax"),
+    ("zeroing moves replaced by xor", "mov ecx, 0\nadd ecx, ebx", "xor ecx, ecx\nadd ecx, ebx"),
+    ("multiplications replaced by shifts", "imul eax, 8\nmov [x], eax", "shl eax, 3\nmov [x], eax"),
+    ("jumps to the next instruction removed", "jmp L2\nL2:\nmov eax, 1", "L2:\nmov eax, 1"),
+]
+
+KEPT = [
+    # eax is read again, so the chain cannot skip it.
+    "mov eax, [x]\nmov ebx, eax\nadd ebx, eax",
+    # The comparison's flags are still to be read by the jump.
+    "cmp eax, 1\nmov ecx, 0\njl L1\nmov ecx, 2\nL1:",
+    # Not a power of two.
+    "imul eax, 6\nmov [x], eax",
+    # The store goes through a register that forms its own address.
+    "mov [eax], eax\nmov ebx, [eax]",
+]
+
+
+@pytest.mark.parametrize('name, before, after', REWRITES, ids=[case[0] for case in REWRITES])
+def test_rule_rewrites(name, before, after):
+    peephole = Peephole()
+    assert peephole.optimize(listing(before)) == listing(after)
+    assert peephole.stats == {name: 1}
+
+
+@pytest.mark.parametrize('text', KEPT)
+def test_rule_does_not_apply(text):
+    peephole = Peephole()
+    assert peephole.optimize(listing(text)) == listing(text)
+    assert peephole.stats == {}
+
+
+def test_rules_table_can_be_extended():
+    def drop_nops(out, code, j):
+        if out[-1][0] == 'nop':
+            out.pop()
+            return True
+        return False
+
+    peephole = Peephole(RULES + (('nops removed', drop_nops),))
+    assert peephole.optimize(listing("nop\nmov eax, eax\nnop")) == []
+    assert peephole.stats == {'self moves removed': 1, 'nops removed': 2}
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_peephole_keeps_program_results(seed):
+    tac = Compiler(opt_level=1).compile(random_program(seed)).tac
+    try:
+        expected = emulator.run(AssemblyGenerator().generate(parse_tac(tac)))
+    except (ZeroDivisionError, emulator.StepLimitExceeded):
+        pytest.skip("the program divides by zero or does not finish")
+    assert emulator.run(AssemblyGenerator(peephole=True).generate(parse_tac(tac))) == expected
@@ -0,0 +1,34 @@
+import pytest
+
+import emulator
+from assembly_gen import AssemblyGenerator, TARGETS
+from compiler import Compiler
+from tac import parse_tac
+from test_cases import pressure_suite, test_suite
+
+
+@pytest.mark.parametrize('opt_level', (0, 1, 2))
+@pytest.mark.parametrize('target', sorted(TARGETS))
+@pytest.mark.parametrize('fused', (True, False))
+@pytest.mark.parametrize('name, code, expected', pressure_suite, ids=[case[0] for case in pressure_suite])
+def test_pressure_results(name, code, expected, opt_level, target, fused):
+    result = Compiler(opt_level=opt_level, target=target, fused=fused).compile(code)
+    assert result.ok, result.error
+    assert emulator.run(result.asm)['s'] == expected
+
+
+@pytest.mark.parametrize('opt_level', (0, 1))
+@pytest.mark.parametrize('name, code', [(case[0], case[1]) for case in pressure_suite + test_suite],
+                         ids=[case[0] for case in pressure_suite + test_suite])
+def test_spill_slots_are_not_shared_by_overlapping_intervals(name, code, opt_level):
+    tac = Compiler(opt_level=opt_level).compile(code).tac
+    generator = AssemblyGenerator()
+    generator.generate(parse_tac(tac))
+    intervals = generator.allocator.intervals
+    owners = {}
+    for temp, slot in generator.allocator.spill_slots.items():
+        owners.setdefault(slot, []).append(intervals[temp])
+    for slot, lifetimes in owners.items():
+        lifetimes.sort()
+        for (_, end), (start, _) in zip(lifetimes, lifetimes[1:]):
+            assert end <= start, f"slot {slot} is shared by overlapping intervals {lifetimes}"
@@ -0,0 +1,138 @@
+import sys
+from functools import lru_cache
+
+import pytest
+
+import emulator
+from compiler import Compiler
+from nodes import Assign, BinOp, Const, Declaration, DeclarationAssign, For, Id, IfElse, Node, UMinus
+from semantic import NODE_TYPES, SemanticAnalyzer
+from test_cases import error_suite, pressure_suite, random_program, test_suite
+
+
+SOURCE = "int a;\nint b = 2;\na = b + -3;\nif (a < b) {\n  a++;\n} else { b--; }\nfor (a = 0; a < 2; a++) { b = (b); }"
+
+
+def parse(text):
+    compiler = Compiler(fast_startup=True)
+    context = compiler.acquire_context()
+    try:
+        return context.parser.parse(text, lexer=context.lexer)
+    finally:
+        compiler.release_context(context)
+
+
+def test_parser_builds_typed_nodes_with_lines():
+    statements = parse(SOURCE).statements
+    assert [type(node) for node in statements] == [Declaration, DeclarationAssign, Assign, IfElse, For]
+    assert [node.lineno for node in statements] == [1, 2, 3, 4, 7]
+    expr = statements[2].expr
+    assert type(expr) is BinOp and expr.op == '+'
+    assert type(expr.left) is Id and expr.left.name == 'b'
+    assert type(expr.right) is UMinus and type(expr.right.operand) is Const and expr.right.operand.value == 3
+
+
+def test_nodes_have_no_dictionary():
+    for node_type in NODE_TYPES:
+        assert '__dict__' not in dir(node_type), node_type
+    with pytest.raises(AttributeError):
+        Const(1).extra = 1
+
+
+def test_every_node_type_has_handlers():
+    analyzer = SemanticAnalyzer(None)
+    assert all(issubclass(node_type, Node) for node_type in NODE_TYPES)
+    assert set(analyzer.analyzers) == set(analyzer.generators) == set(analyzer.translators) == set(NODE_TYPES)
+    assert all(analyzer.translators.values())
+
+
+@pytest.mark.parametrize('fused', (True, False))
+@pytest.mark.parametrize('code, error', [
+    ("int a;\nint b;\nb = c + 1;", "Undeclared variable 'c' used in expression on line 3."),
+    ("int a;\n\nint a;", "Variable 'a' already declared in this scope on line 3."),
+    ("int a;\n\nfor (i = 0; i < 2; i++) { a = 1; }", "Undeclared variable 'i' used in assignment on line 3."),
+    ("int a;\nif (a < 1) {\n  a = 1;\n} else {\n  a = z;\n}", "Undeclared variable 'z' used in expression on line 5."),
+    ("int a;\na = 10\nb = 2;", "Syntax error at token ID ('b') on line 3"),
+    ("int a;\n/* two\nlines */\na = (5 + 3;", "Syntax error at token SEMICOLON (';') on line 4"),
+])
+def test_errors_carry_line_numbers(code, error, fused):
+    assert Compiler(fused=fused).compile(code).error == error
+
+
+UNSHADOWED = [case[1] for case in test_suite + error_suite + pressure_suite] + [random_program(seed) for seed in range(40)]
+
+
+@pytest.mark.parametrize('opt_level', (0, 2))
+@pytest.mark.parametrize('code', UNSHADOWED, ids=[str(i) for i in range(len(UNSHADOWED))])
+def test_fused_and_separate_walks_agree(code, opt_level):
+    fused = Compiler(opt_level=opt_level, fused=True).compile(code)
+    separate = Compiler(opt_level=opt_level, fused=False).compile(code)
+    assert (fused.tac, fused.asm, fused.error) == (separate.tac, separate.asm, separate.error)
+
+
+SHADOWING = """
+    int x = 1;
+    { int x = 2; x = x + 1; { int x = 5; x = x * 2; } }
+    x = x + 10;
+    int y;
+    { int y = 7; { y = y + 1; } }
+    y = x;
+"""
+
+
+def test_shadowed_variables_get_their_own_storage():
+    result = Compiler().compile(SHADOWING)
+    lines = result.tac.split('\n')
+    assert "MOV x@1, t2" in lines and "MOV x@2, t6" in lines and "t10 = x" in lines
+    # An inner block reaches the declaration of the block around it.
+    assert "t14 = y@3" in lines
+    values = emulator.run(result.asm)
+    assert (values['x'], values['x@1'], values['x@2'], values['y'], values['y@3']) == (11, 3, 10, 11, 8)
+
+
+DEEP = {
+    'expression chain': lambda depth: "int x = 1; int y; y = " + " + ".join(["x"] * depth) + ";",
+    'nested parentheses': lambda depth: "int x; " + "x = " + "(" * depth + "x" + " + 1)" * depth + ";",
+    'nested if': lambda depth: "int x; int y; " + "if (x < 1) " * depth + "y = 1;",
+    'nested blocks': lambda depth: "int x; " + "{ int y = 2; " * depth + "x = y + 1;" + " }" * depth,
+    'nested for': lambda depth: "int x; int y; " + "for (x = 0; x < 1; x++) " * depth + "y = y + 1;",
+}
+
+# The variable each program sets, and the value it ends with.
+DEEP_VALUES = {
+    'expression chain': lambda depth: ('y', depth),
+    'nested parentheses': lambda depth: ('x', depth),
+    'nested if': lambda depth: ('y', 1),
+    'nested blocks': lambda depth: ('x', 3),
+    'nested for': lambda depth: ('y', 1),
+}
+
+
+@lru_cache(maxsize=None)
+def parse_deep(name, depth):
+    return parse(DEEP[name](depth))
+
+
+@pytest.mark.parametrize('fused', (True, False))
+@pytest.mark.parametrize('name', sorted(DEEP))
+def test_deep_programs_are_analyzed_without_recursion(name, fused):
+    # Far past the recursion limit: a recursive walk raises RecursionError.
+    depth = 50000
+    assert depth > 10 * sys.getrecursionlimit()
+    compiler = Compiler(fast_startup=True, fused=fused)
+    context = compiler.acquire_context()
+    try:
+        context.semantic_analyzer.analyze(parse_deep(name, depth))
+        assert len(context.codegen.get_instructions()) >= 2
+    finally:
+        compiler.release_context(context)
+
+
+@pytest.mark.parametrize('opt_level', (0, 2))
+@pytest.mark.parametrize('name', sorted(DEEP))
+def test_deep_programs_compute_their_values(name, opt_level):
+    depth = 3000
+    result = Compiler(opt_level=opt_level).compile(DEEP[name](depth))
+    assert result.ok, result.error
+    variable, value = DEEP_VALUES[name](depth)
+    assert emulator.run(result.asm, limit=10 ** 7)[variable] == value
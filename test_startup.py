@@ -0,0 +1,75 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+from compiler import Compiler
+from lexer import Lexer
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+COMPILE = ("from compiler import Compiler; "
+           "result = Compiler(fast_startup=True).compile('int x; x = 2 + 3;'); "
+           "print(result.tac)")
+
+
+def copy_compiler(directory):
+    for name in os.listdir(HERE):
+        if name.endswith('.py') and not name.startswith('test_'):
+            shutil.copy(os.path.join(HERE, name), directory)
+
+
+def run_compile(directory):
+    done = subprocess.run([sys.executable, '-c', COMPILE], cwd=directory, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+    assert done.returncode == 0, done.stderr
+    return done.stdout
+
+
+def signature(path, name):
+    with open(path) as f:
+        return re.search(rf"^{name} = (.*)$", f.read(), re.M).group(1)
+
+
+def test_fast_startup_shares_the_tables():
+    first = Compiler(fast_startup=True)
+    second = Compiler(fast_startup=True)
+    assert first.parser.action is second.parser.action
+    # The compiled master regex is shared; only the rule bindings differ.
+    assert first.lexer.lexstatere['INITIAL'][0][0] is second.lexer.lexstatere['INITIAL'][0][0]
+    assert first.lexer is not second.lexer
+    assert first.compile("int x; x = 1;").asm == Compiler().compile("int x; x = 1;").asm
+
+
+def test_lexer_tables_carry_the_rules_signature():
+    assert signature(os.path.join(HERE, 'lextab.py'), '_lexsignature') == repr(Lexer.signature())
+
+
+def test_stale_tables_are_regenerated(tmp_path):
+    copy_compiler(tmp_path)
+    lextab = tmp_path / 'lextab.py'
+    parsetab = tmp_path / 'parsetab.py'
+    lexer_signature = signature(lextab, '_lexsignature')
+    parser_signature = signature(parsetab, '_lr_signature')
+    lextab.write_text(lextab.read_text().replace(lexer_signature, "'stale'"))
+    parsetab.write_text(parsetab.read_text().replace(parser_signature, "'stale'"))
+
+    expected = "t1 = 2\nt2 = 3\nt3 = t1 + t2\nMOV x, t3\n"
+    assert run_compile(tmp_path) == expected
+    assert signature(lextab, '_lexsignature') == lexer_signature
+    assert signature(parsetab, '_lr_signature') == parser_signature
+    # The optimized build skips the debug file.
+    assert not (tmp_path / 'parser.out').exists()
+    # The regenerated tables are used as they are by the next process.
+    assert run_compile(tmp_path) == expected
+
+
+def test_missing_tables_are_written(tmp_path):
+    copy_compiler(tmp_path)
+    os.remove(tmp_path / 'lextab.py')
+    os.remove(tmp_path / 'parsetab.py')
+    run_compile(tmp_path)
+    assert signature(tmp_path / 'lextab.py', '_lexsignature') == repr(Lexer.signature())
+    assert (tmp_path / 'parsetab.py').exists()
@@ -0,0 +1,111 @@
+import io
+import os
+import random
+
+import pytest
+
+import emulator
+import main
+from compiler import Compiler
+from streaming import StreamingCompiler
+from test_cases import error_suite, pressure_suite, random_program, test_suite
+
+
+CASES = [(case[0], case[1]) for case in test_suite + error_suite + pressure_suite]
+
+LEVELS = (0, 1, 2)
+
+
+def stream(code, source=None, **options):
+    output = io.StringIO()
+    tac = io.StringIO()
+    error = StreamingCompiler(**options).compile(code if source is None else source, output, tac)
+    return error, output.getvalue(), tac.getvalue()
+
+
+def sections(asm):
+    # The data section's lines, and the rest of the listing. The streaming
+    # compiler only knows every variable at the end, so it writes the data
+    # section last.
+    data = []
+    text = []
+    current = text
+    for line in asm.strip().split('\n'):
+        if line.startswith('section '):
+            current = data if line == 'section .data' else text
+        if line.strip():
+            current.append(line)
+    return sorted(data), text
+
+
+def results(asm):
+    try:
+        values = emulator.run(asm)
+    except (ZeroDivisionError, emulator.StepLimitExceeded):
+        return None
+    return {name: value for name, value in values.items() if '@' not in name}
+
+
+def pieces(rng, text):
+    # The text cut at random places, so tokens, comments and lines are
+    # split between the pieces.
+    cuts = sorted(rng.randrange(len(text) + 1) for _ in range(len(text) // 8))
+    return [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize('name, code', CASES, ids=[case[0] for case in CASES])
+def test_output_equals_full_compile(name, code):
+    full = Compiler().compile(code)
+    error, asm, tac = stream(code)
+    assert error == full.error
+    if full.error is None:
+        assert tac.strip() == full.tac
+        assert sections(asm) == sections(full.asm)
+
+
+@pytest.mark.parametrize('opt_level', LEVELS)
+@pytest.mark.parametrize('target', ('x86', 'x86-64'))
+@pytest.mark.parametrize('seed', range(20))
+def test_sources_and_batches_give_full_compile_results(seed, target, opt_level):
+    rng = random.Random(seed)
+    code = random_program(seed).replace('; ', ';\n')
+    full = Compiler(opt_level=opt_level, target=target).compile(code)
+    assert full.ok, full.error
+    expected = results(full.asm)
+    if expected is None:
+        pytest.skip("the program divides by zero or does not finish")
+    for source, batch in ((code, 512), (io.StringIO(code), 512), (iter(code.splitlines(True)), 512),
+                          (iter(pieces(rng, code)), 512), (code, 1), (code, 16)):
+        error, asm, _ = stream(code, source, opt_level=opt_level, target=target, batch=batch)
+        assert error is None
+        assert results(asm) == expected, batch
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_errors_equal_full_compile(seed):
+    rng = random.Random(seed)
+    code = random_program(seed).replace('; ', ';\n')
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(code) + 1)
+        piece = rng.choice(("/* c */", "/* open ", "*/", "// note\n", '"', "else", "}", ";", "x", ")", "int a;"))
+        code = code[:i] + piece + code[i:]
+    full = Compiler().compile(code)
+    assert stream(code, iter(pieces(rng, code)))[0] == full.error
+    if full.error is None and results(full.asm) is not None:
+        assert results(stream(code)[1]) == results(full.asm)
+
+
+@pytest.mark.parametrize('code', ["", "   \n", "int x;\nx = 1;\n} x = 2;", "int x;\nx = (1;\nx = 2;"])
+def test_errors_at_the_edges(code):
+    assert stream(code)[0] == Compiler().compile(code).error is not None
+
+
+def test_stream_option_removes_failed_outputs(tmp_path, capsys):
+    good = tmp_path / 'good.c'
+    bad = tmp_path / 'bad.c'
+    good.write_text("int x;\nx = 4 * 5;\n")
+    bad.write_text("int x;\nx = y;\n")
+    assert main.compile_files(['--stream', '-O', '2', str(good), str(bad)]) == 1
+    assert results((tmp_path / 'good.asm').read_text()) == {'x': 20}
+    assert not os.path.exists(tmp_path / 'bad.asm')
+    assert "1 of 2 files failed" in capsys.readouterr().err
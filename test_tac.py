@@ -0,0 +1,78 @@
+import io
+
+import pytest
+
+import compiler
+import streaming
+from assembly_gen import AssemblyGenerator
+from compiler import CompilationResult, Compiler
+from streaming import StreamingCompiler
+from tac import Instr, Op, format_tac, parse_tac
+from test_cases import pressure_suite, test_suite
+
+
+LINES = [
+    "t1 = x", "t2 = -5", "t3 = t1 + t2", "t4 = t3 - 1", "t5 = t4 * t1", "t6 = t5 / 3", "t7 = t6 % t2",
+    "MOV y, t7", "ADD i, i, 1", "SUB j, j, t1", "IF t1 <= 10 GOTO L1", "GOTO L2", "L1:", "L2:",
+]
+
+
+def test_instructions_format_and_parse_back():
+    code = parse_tac('\n'.join(LINES))
+    assert [instr.op for instr in code] == [Op.ASSIGN, Op.ASSIGN, Op.ADD, Op.SUB, Op.MUL, Op.DIV, Op.MOD,
+                                            Op.MOV, Op.INC, Op.DEC, Op.IF, Op.GOTO, Op.LABEL, Op.LABEL]
+    assert format_tac(code) == '\n'.join(LINES)
+    assert code[1].a == -5 and code[10].b == 10 and code[10].rel == '<='
+
+
+def test_instructions_have_no_dictionary():
+    instr = Instr(Op.ADD, 't1', 'x', 1)
+    with pytest.raises(AttributeError):
+        instr.extra = 1
+
+
+@pytest.mark.parametrize('name, code', [(case[0], case[1]) for case in test_suite + pressure_suite],
+                         ids=[case[0] for case in test_suite + pressure_suite])
+def test_dumped_tac_compiles_to_the_same_assembly(name, code):
+    # The text is only a dump: parsing it back gives the same program.
+    result = Compiler(opt_level=1).compile(code)
+    generator = AssemblyGenerator(peephole=True)
+    assert generator.generate(parse_tac(result.tac)) == result.asm
+
+
+def count_formatting(monkeypatch, module):
+    calls = []
+    format_code = module.format_tac
+
+    def counted(code):
+        calls.append(len(code))
+        return format_code(code)
+
+    monkeypatch.setattr(module, 'format_tac', counted)
+    return calls
+
+
+def test_tac_text_is_only_built_when_read(monkeypatch):
+    calls = count_formatting(monkeypatch, compiler)
+    result = Compiler(opt_level=1).compile("int x; int y; x = 3; y = x * 4 + x;")
+    assert result.ok and calls == []
+    assert result.tac == "MOV x, 3\nMOV y, 15"
+    assert result.tac == "MOV x, 3\nMOV y, 15"
+    assert len(calls) == 1
+
+
+def test_results_given_as_text():
+    result = CompilationResult("MOV x, 1", "asm")
+    assert result.tac == "MOV x, 1" and result.asm == "asm" and result.ok
+    assert CompilationResult(error="e").tac is None
+
+
+def test_streaming_formats_tac_only_when_written(monkeypatch):
+    calls = count_formatting(monkeypatch, streaming)
+    code = "int x; int y;\n" + "x = x + 1;\ny = y + x;\n" * 200
+    assert StreamingCompiler(batch=16).compile(code, io.StringIO()) is None
+    assert calls == []
+    tac = io.StringIO()
+    StreamingCompiler(batch=16).compile(code, io.StringIO(), tac)
+    assert len(calls) > 1
+    assert tac.getvalue().strip() == Compiler().compile(code).tac
@@ -0,0 +1,73 @@
+import re
+
+import pytest
+
+import emulator
+from assembly_gen import TARGETS
+from compiler import Compiler
+from test_cases import pressure_suite, random_program
+
+
+def compile_asm(code, target, opt_level=0):
+    result = Compiler(opt_level=opt_level, target=target).compile(code)
+    assert result.ok, result.error
+    return result.asm
+
+
+def lines(asm):
+    return [line.strip() for line in asm.split('\n')]
+
+
+def frame_accesses(asm):
+    return sum(bool(re.search(r'\[[er]bp', line)) for line in lines(asm))
+
+
+def test_program_start_and_exit():
+    code = "int x; x = 1;"
+    x86 = lines(compile_asm(code, 'x86'))
+    x86_64 = lines(compile_asm(code, 'x86-64'))
+    assert x86_64[0] == "default rel"
+    assert "default rel" not in x86
+    assert x86[-3:] == ["mov eax, 1", "xor ebx, ebx", "int 0x80"]
+    assert x86_64[-3:] == ["mov eax, 60", "xor edi, edi", "syscall"]
+
+
+@pytest.mark.parametrize('opt_level', (0, 1, 2))
+@pytest.mark.parametrize('name, code, expected', pressure_suite, ids=[case[0] for case in pressure_suite])
+def test_extra_registers_take_the_pressure(name, code, expected, opt_level):
+    x86 = compile_asm(code, 'x86', opt_level)
+    x86_64 = compile_asm(code, 'x86-64', opt_level)
+    assert re.search(r'\br(8|9|1[0-5])d\b', x86_64)
+    assert not re.search(r'\br(8|9|1[0-5])d?\b', x86)
+    assert frame_accesses(x86_64) <= frame_accesses(x86)
+    assert emulator.run(x86)['s'] == emulator.run(x86_64)['s'] == expected
+
+
+def test_long_lived_values_are_not_spilled_on_x86_64():
+    code = pressure_suite[1][1]
+    assert frame_accesses(compile_asm(code, 'x86', 2)) > 0
+    assert frame_accesses(compile_asm(code, 'x86-64', 2)) == 0
+
+
+@pytest.mark.parametrize('name, code, expected', pressure_suite, ids=[case[0] for case in pressure_suite])
+def test_addresses_use_64_bit_registers(name, code, expected):
+    for line in lines(compile_asm(code, 'x86-64', 2)):
+        for terms in re.findall(r'\[([^\]]*)\]', line):
+            assert not re.search(r'\be[a-z]{2}\b|\br\d+d\b', terms), line
+
+
+@pytest.mark.parametrize('opt_level', (0, 1, 2))
+@pytest.mark.parametrize('seed', range(30))
+def test_targets_agree(seed, opt_level):
+    code = random_program(seed)
+    try:
+        expected = emulator.run(compile_asm(code, 'x86', opt_level))
+    except (ZeroDivisionError, emulator.StepLimitExceeded):
+        pytest.skip("the program divides by zero or does not finish")
+    assert emulator.run(compile_asm(code, 'x86-64', opt_level)) == expected
+
+
+def test_unknown_target_is_rejected():
+    assert sorted(TARGETS) == ['x86', 'x86-64']
+    with pytest.raises(KeyError):
+        Compiler(target='arm')
@@ -0,0 +1,68 @@
+import io
+
+from compiler import Compiler
+from tracing import QUIET, REPORT, TRACE, EventLog, PrintSink
+
+
+CODE = "int x; int y; x = 1; if (x < 2) { y = x + 1; }"
+
+
+def test_quiet_prints_nothing(capsys):
+    compiler = Compiler(verbosity=QUIET)
+    assert compiler.trace is None
+    assert compiler.compile(CODE).ok
+    assert not compiler.compile("int x; x = y;").ok
+    assert not compiler.compile("int x x = 1;").ok
+    Compiler(opt_level=2).compile(CODE)
+    assert capsys.readouterr() == ("", "")
+
+
+def test_event_log_receives_the_events_of_every_phase(capsys):
+    log = EventLog()
+    result = Compiler(trace=log).compile(CODE)
+    assert result.asm == Compiler().compile(CODE).asm
+    phases = [event.phase for event in log.events]
+    assert {'lexer', 'parser', 'semantic', 'assembly'} <= set(phases)
+    messages = [event.format() for event in log.events]
+    assert "Identifier: x" in messages
+    assert "Parsing: declaration -> int x" in messages
+    assert "Semantic: Adding symbol 'y' of type 'int'" in messages
+    assert "Assembly: add eax, 1" in messages
+    # Nothing is printed when the events go to a log.
+    assert capsys.readouterr() == ("", "")
+
+
+def test_events_are_formatted_only_on_request():
+    log = EventLog()
+    Compiler(trace=log).compile(CODE)
+    lookup = next(event for event in log.events if event.format() == "Semantic: Looking up symbol 'x'")
+    assert '{' in lookup.message and lookup.args == ('x',)
+
+
+def test_events_are_filtered_by_phase():
+    log = EventLog(phases={'semantic'})
+    Compiler(trace=log).compile(CODE)
+    assert log.events and all(event.phase == 'semantic' for event in log.events)
+    log.clear()
+    assert log.events == []
+
+
+def test_trace_prints_the_events(capsys):
+    Compiler(verbosity=TRACE).compile(CODE)
+    out = capsys.readouterr().out
+    assert "Semantic: Looking up symbol 'x'" in out
+    assert "GENERATED ASSEMBLY CODE (x86)" in out
+
+
+def test_report_prints_the_listings_without_events(capsys):
+    Compiler(verbosity=REPORT).compile(CODE)
+    out = capsys.readouterr().out
+    assert "GENERATED INTERMEDIATE CODE (TAC)" in out and "MOV y, t" in out
+    assert "Semantic:" not in out
+
+
+def test_print_sink_writes_the_chosen_phases_to_its_stream(capsys):
+    stream = io.StringIO()
+    Compiler(trace=PrintSink(phases={'lexer'}, stream=stream)).compile("int x;")
+    assert stream.getvalue() == "Keyword: int\nIdentifier: x\n"
+    assert capsys.readouterr() == ("", "")
@@ -0,0 +1,48 @@
+import sys
+
+
+QUIET = 0
+REPORT = 1
+TRACE = 2
+
+
+class TraceEvent:
+    # The message is a format template; it is only rendered when a sink asks
+    # for the text, so recording events costs no string formatting.
+    __slots__ = ('phase', 'message', 'args')
+
+    def __init__(self, phase, message, args):
+        self.phase = phase
+        self.message = message
+        self.args = args
+
+    def format(self):
+        return self.message.format(*self.args)
+
+    def __repr__(self):
+        return f"TraceEvent({self.phase!r}, {self.format()!r})"
+
+
+class PrintSink:
+
+    def __init__(self, phases=None, stream=None):
+        self.phases = phases
+        self.stream = stream
+
+    def event(self, phase, message, *args):
+        if self.phases is None or phase in self.phases:
+            print(message.format(*args), file=self.stream or sys.stdout)
+
+
+class EventLog:
+
+    def __init__(self, phases=None):
+        self.phases = phases
+        self.events = []
+
+    def event(self, phase, message, *args):
+        if self.phases is None or phase in self.phases:
+            self.events.append(TraceEvent(phase, message, args))
+
+    def clear(self):
+        self.events = []